@@ -1,20 +1,24 @@
 """Main entrypoint for GamutRF"""
 
-from gamutrf.compress_dirs import main as compress_dirs_main
-from gamutrf.offline import main as offline_main
-from gamutrf.scan import main as scan_main
+# Entrypoints import their modules when called, so each only pays for its own imports.
 
 
 def compress_dirs():
     """Entrypoint for compress_dirs"""
+    from gamutrf.compress_dirs import main as compress_dirs_main
+
     compress_dirs_main()
 
 
 def offline():
     """Entrypoint for offline"""
+    from gamutrf.offline import main as offline_main
+
     offline_main()
 
 
 def scan():
     """Entrypoint for scan"""
+    from gamutrf.scan import main as scan_main
+
     scan_main()
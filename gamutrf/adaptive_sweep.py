@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+
+def parse_tuning_ranges(tuning_ranges):
+    return [
+        tuple(float(freq) for freq in tuning_range.split("-"))
+        for tuning_range in tuning_ranges.split(",")
+    ]
+
+
+def format_tuning_ranges(freq_ranges):
+    return ",".join(f"{int(start)}-{int(end)}" for start, end in freq_ranges)
+
+
+def get_segments(freq_ranges, segments):
+    """Divide frequency ranges into about segments segments, in proportion to width."""
+    total_width = sum(end - start for start, end in freq_ranges)
+    edges = []
+    for start, end in freq_ranges:
+        range_segments = max(1, int(round(segments * (end - start) / total_width)))
+        range_edges = np.linspace(start, end, range_segments + 1)
+        edges.extend(zip(range_edges[:-1], range_edges[1:]))
+    return edges
+
+
+class AdaptiveSweep:
+    """Choose tuning ranges so active segments are swept more often than quiet ones.
+
+    FFT records from retune_fft are passed to update(). A segment is active if
+    its peak was at least active_db above the record's median power when it was
+    last scanned. plan() returns tuning ranges for every active segment, plus
+    any quiet segment that would otherwise not be revisited within
+    max_revisit_secs.
+    """
+
+    def __init__(self, freq_ranges, segments, active_db, max_revisit_secs, plan_secs):
+        self.segments = get_segments(freq_ranges, segments)
+        self.segment_starts = np.array([start for start, _ in self.segments])
+        self.active_db = active_db
+        self.max_revisit_secs = max_revisit_secs
+        self.plan_secs = plan_secs
+        self.last_visit = np.zeros(len(self.segments))
+        self.peak_db = np.full(len(self.segments), np.inf)
+        self.lock = threading.Lock()
+
+    def update_record(self, record, _scanner=None):
+        try:
+            self.update(float(record["ts"]), record["buckets"])
+        except (ValueError, KeyError, TypeError) as err:
+            logging.error("adaptive sweep cannot use FFT record: %s", err)
+
+    def update(self, ts, buckets):
+        if not buckets:
+            return
+        freqs = np.fromiter(buckets.keys(), dtype=np.float64, count=len(buckets))
+        dbs = np.fromiter(buckets.values(), dtype=np.float64, count=len(buckets))
+        peak_dbs = dbs - np.median(dbs)
+        segments = np.searchsorted(self.segment_starts, freqs, side="right") - 1
+        valid = segments >= 0
+        segments = segments[valid]
+        peak_dbs = peak_dbs[valid]
+        if not len(segments):
+            return
+        visited = np.unique(segments)
+        segment_peaks = np.full(len(self.segments), -np.inf)
+        np.maximum.at(segment_peaks, segments, peak_dbs)
+        with self.lock:
+            self.peak_db[visited] = segment_peaks[visited]
+            self.last_visit[visited] = ts
+
+    def plan(self, now=None):
+        if now is None:
+            now = time.time()
+        with self.lock:
+            active = self.peak_db >= self.active_db
+            # include quiet segments that would be overdue before the next plan.
+            overdue = now - self.last_visit + self.plan_secs >= self.max_revisit_secs
+        selected = active | overdue
+        if not selected.any():
+            selected[np.argmin(self.last_visit)] = True
+        freq_ranges = []
+        for selected_segment, (start, end) in zip(selected, self.segments):
+            if not selected_segment:
+                continue
+            if freq_ranges and freq_ranges[-1][1] == start:
+                freq_ranges[-1] = (freq_ranges[-1][0], end)
+            else:
+                freq_ranges.append((start, end))
+        return format_tuning_ranges(freq_ranges)
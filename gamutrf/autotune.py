@@ -0,0 +1,228 @@
+import json
+import logging
+import os
+import socket
+import time
+
+from gamutrf.grscan import grscan, get_tune_step_fft
+
+AUTOTUNE_BATCH_SIZES = (16, 32, 64, 128, 256, 512)
+AUTOTUNE_HEADROOM = 1.5
+AUTOTUNE_WARMUP_SECS = 0.5
+
+
+def autotune_engines(iqtlabs, wavelearner):
+    engines = {
+        "software": {"vkfft": False, "cpufft": False, "wavelearner": None},
+        "cpufft": {"vkfft": False, "cpufft": True, "wavelearner": None},
+    }
+    if hasattr(iqtlabs, "vkfft"):
+        engines["vkfft"] = {"vkfft": True, "cpufft": False, "wavelearner": None}
+    if wavelearner is not None:
+        engines["wavelearner"] = {
+            "vkfft": False,
+            "cpufft": False,
+            "wavelearner": wavelearner,
+        }
+    return engines
+
+
+def autotune_key(scan_args, engine, fft_batch_size):
+    return ":".join(
+        (
+            socket.gethostname(),
+            engine,
+            str(int(scan_args["nfft"])),
+            str(int(fft_batch_size)),
+            str(bool(scan_args["pretune"])),
+            str(int(scan_args["samp_rate"])),
+            str(int(scan_args["dc_block_len"])),
+            str(bool(scan_args["dc_block_long"])),
+            str(bool(scan_args["correct_iq"])),
+            str(bool(scan_args["fused_db"])),
+            str(int(scan_args["fft_average"])),
+        )
+    )
+
+
+def autotune_batch_sizes(fft_average):
+    """Return candidate batch sizes, rounded up to multiples of fft_average."""
+    return sorted(
+        {
+            -(-fft_batch_size // fft_average) * fft_average
+            for fft_batch_size in AUTOTUNE_BATCH_SIZES
+        }
+    )
+
+
+def autotune_tune_step_fft(scan_args):
+    """Return the tune step, in FFTs, that the flowgraph derives from scan_args."""
+    samp_rate = scan_args["samp_rate"]
+    freq_start = scan_args["freq_start"]
+    freq_end = scan_args["freq_end"]
+    tune_step_hz = int(samp_rate * scan_args["tuneoverlap"])
+    if not freq_end:
+        freq_end = freq_start + (tune_step_hz - 1)
+    return get_tune_step_fft(
+        freq_end - freq_start,
+        samp_rate,
+        scan_args["nfft"],
+        tune_step_hz,
+        scan_args["sweep_sec"],
+        scan_args["tune_dwell_ms"],
+        scan_args["tune_step_fft"],
+    )
+
+
+def apply_autotune(scan_args, tuned_args):
+    """Return scan_args with the autotuned FFT engine and batch size applied.
+
+    With pretuning, and unless set by the user, tune_step_fft is derived from
+    scan_args and rounded to a multiple of the batch size. It is derived again
+    each time, so that it follows reconfigured sweep_sec and frequency range.
+    """
+    scan_args = dict(scan_args)
+    scan_args.update(tuned_args)
+    if scan_args["pretune"] and not scan_args["tune_step_fft"]:
+        fft_batch_size = scan_args["fft_batch_size"]
+        scan_args["tune_step_fft"] = max(
+            fft_batch_size,
+            int(autotune_tune_step_fft(scan_args) / fft_batch_size) * fft_batch_size,
+        )
+    return scan_args
+
+
+def read_autotune_cache(cache_path):
+    try:
+        with open(cache_path, encoding="utf8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        return {}
+
+
+def write_autotune_cache(cache_path, cache):
+    cache_dir = os.path.dirname(cache_path)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    tmpfile = cache_path + ".tmp"
+    with open(tmpfile, "w", encoding="utf8") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.rename(tmpfile, cache_path)
+
+
+def measure_fft_rate(scan_args, secs):
+    """Run the pipeline unthrottled against a test source, returning FFTs/s."""
+    measure_args = dict(scan_args)
+    measure_args.update(
+        {
+            "sdr": "tuneable_test_source",
+            "throttle": False,
+            "fft_zmq_addr": "127.0.0.1",
+            "fft_zmq_port": "*",
+            "iq_zmq_port": 0,
+            "inference_model_server": "",
+            "iq_inference_model_server": "",
+            "inference_output_dir": "",
+            "mqtt_server": "",
+            "write_samples": 0,
+            "write_fft_points": False,
+        }
+    )
+    tb = grscan(**measure_args)
+    tb.start()
+    try:
+        time.sleep(AUTOTUNE_WARMUP_SECS)
+        start_items = tb.retune_fft.nitems_read(0)
+        start_time = time.time()
+        time.sleep(secs)
+        items = tb.retune_fft.nitems_read(0) - start_items
+        # retune_fft follows the averager, so reads one frame per fft_average FFTs.
+        items *= measure_args["fft_average"]
+        return items / (time.time() - start_time)
+    finally:
+        tb.stop()
+        tb.wait()
+        del tb
+
+
+def select_autotune(measurements, required_fft_rate, max_fft_batch_size):
+    """Select the smallest batch meeting the required rate with headroom.
+
+    If no candidate has enough headroom, select the fastest.
+    """
+    candidates = [
+        m for m in measurements if m["fft_batch_size"] <= max_fft_batch_size
+    ] or measurements
+    sufficient = [
+        m for m in candidates if m["fft_rate"] >= required_fft_rate * AUTOTUNE_HEADROOM
+    ]
+    if sufficient:
+        return min(sufficient, key=lambda m: (m["fft_batch_size"], -m["fft_rate"]))
+    best = max(candidates, key=lambda m: m["fft_rate"])
+    logging.warning(
+        "autotune: no FFT configuration can sustain %.0f FFTs/s with %.1fx headroom",
+        required_fft_rate,
+        AUTOTUNE_HEADROOM,
+    )
+    return best
+
+
+def autotune(scan_args, cache_path, secs):
+    """Measure FFT throughput for candidate engines and batch sizes.
+
+    Returns a dict of scan arguments to override (fft_batch_size, vkfft,
+    cpufft and wavelearner), for apply_autotune(). Measurements are cached per
+    host.
+    """
+    cache = read_autotune_cache(cache_path)
+    required_fft_rate = scan_args["samp_rate"] / scan_args["nfft"]
+    # averages must not span batches.
+    batch_sizes = autotune_batch_sizes(scan_args["fft_average"])
+    max_fft_batch_size = max(batch_sizes)
+    if scan_args["pretune"]:
+        # pretuning can only retune between batches.
+        max_fft_batch_size = autotune_tune_step_fft(scan_args)
+
+    measurements = []
+    engines = autotune_engines(scan_args["iqtlabs"], scan_args["wavelearner"])
+    for engine, engine_args in engines.items():
+        for fft_batch_size in batch_sizes:
+            key = autotune_key(scan_args, engine, fft_batch_size)
+            fft_rate = cache.get(key, None)
+            if fft_rate is None:
+                measure_args = dict(scan_args)
+                measure_args.update(engine_args)
+                measure_args["fft_batch_size"] = fft_batch_size
+                try:
+                    fft_rate = measure_fft_rate(measure_args, secs)
+                except RuntimeError as err:
+                    logging.warning("autotune: %s unavailable: %s", engine, err)
+                    break
+                cache[key] = fft_rate
+            measurements.append(
+                {
+                    "engine": engine,
+                    "fft_batch_size": fft_batch_size,
+                    "fft_rate": fft_rate,
+                }
+            )
+            logging.info(
+                "autotune: %s FFT batch %u: %.0f FFTs/s (%.1fx required %.0f FFTs/s)",
+                engine,
+                fft_batch_size,
+                fft_rate,
+                fft_rate / required_fft_rate,
+                required_fft_rate,
+            )
+    write_autotune_cache(cache_path, cache)
+
+    best = select_autotune(measurements, required_fft_rate, max_fft_batch_size)
+    logging.info(
+        "autotune: selected %s FFT batch %u (%.0f FFTs/s)",
+        best["engine"],
+        best["fft_batch_size"],
+        best["fft_rate"],
+    )
+    tuned_args = {"fft_batch_size": best["fft_batch_size"]}
+    tuned_args.update(engines[best["engine"]])
+    return tuned_args
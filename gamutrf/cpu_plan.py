@@ -0,0 +1,77 @@
+import logging
+import os
+
+CPU_PLAN_ROLES = (
+    "source",
+    "retune",
+    "dc",
+    "fft",
+    "db",
+    "inference",
+    "samples",
+    "zmq",
+)
+
+
+def parse_cpus(cpus):
+    parsed = set()
+    for cpu_range in cpus.split("+"):
+        if "-" in cpu_range:
+            first, last = cpu_range.split("-")
+            parsed.update(range(int(first), int(last) + 1))
+        else:
+            parsed.add(int(cpu_range))
+    return sorted(parsed)
+
+
+def parse_cpu_plan(cpu_plan, available_cpus=None):
+    """Parse a plan of role:cpus[@priority], comma separated.
+
+    CPUs are a list of single CPUs or inclusive ranges joined by "+" (for example
+    "fft:1-2+5@99"). Raises ValueError if a role is unknown or a CPU is not
+    available to this process.
+    """
+    if available_cpus is None:
+        available_cpus = os.sched_getaffinity(0)
+    plan = {}
+    if not cpu_plan:
+        return plan
+    for role_plan in cpu_plan.split(","):
+        try:
+            role, cpus = role_plan.split(":")
+            priority = None
+            if "@" in cpus:
+                cpus, priority = cpus.split("@")
+                priority = int(priority)
+            cpus = parse_cpus(cpus)
+        except ValueError as err:
+            raise ValueError(f"invalid CPU plan {role_plan}: {err}") from err
+        if role not in CPU_PLAN_ROLES:
+            raise ValueError(
+                f"unknown CPU plan role {role} (must be one of {', '.join(CPU_PLAN_ROLES)})"
+            )
+        unavailable = set(cpus) - set(available_cpus)
+        if unavailable:
+            raise ValueError(
+                f"CPU plan {role} uses unavailable CPUs {sorted(unavailable)} (available: {sorted(available_cpus)})"
+            )
+        plan[role] = (cpus, priority)
+    return plan
+
+
+def apply_cpu_plan(plan, role_blocks):
+    for role, blocks in role_blocks.items():
+        if role not in plan or not blocks:
+            continue
+        cpus, priority = plan[role]
+        for block in blocks:
+            block.set_processor_affinity(cpus)
+            if priority is not None:
+                block.set_thread_priority(priority)
+        logging.info(
+            "CPU plan %s: %s on CPUs %s priority %s",
+            role,
+            ", ".join(block.name() for block in blocks),
+            cpus,
+            priority,
+        )
@@ -1,18 +1,33 @@
 import copy
 import json
 import threading
+import time
 from flask import Flask, request
 
 
 class FlaskHandler:
-    def __init__(self, options, check_options, banned_args):
+    def __init__(
+        self,
+        options,
+        check_options,
+        banned_args,
+        live_options=(),
+        live_reconf=None,
+    ):
         self.check_options = check_options
         self.options = options
         self.orig_options = copy.deepcopy(self.options)
         self.banned_args = banned_args
         self.reconfigures = 0
+        self.live_options = live_options
+        self.live_reconf = live_reconf
+        self.live_reconfigures = 0
+        # path and duration (downtime, if rebuilt) of the last reconfiguration.
+        self.last_reconf = {"path": None, "secs": None}
+        self.last_reconf_lock = threading.Lock()
         self.app = Flask(__name__)
         self.app.add_url_rule("/reconf", "reconf", self.reconf)
+        self.app.add_url_rule("/reconf_status", "reconf_status", self.reconf_status)
         self.app.add_url_rule("/getconf", "getconf", self.getconf)
         self.request = request
         self.thread = threading.Thread(
@@ -36,6 +51,20 @@ class FlaskHandler:
             200,
         )
 
+    def rebuilt(self, reconfigures, secs):
+        """Report that the flowgraph was rebuilt for reconfigures, with secs downtime."""
+        with self.last_reconf_lock:
+            # unless superseded by a later reconfiguration.
+            if (
+                reconfigures == self.reconfigures
+                and self.last_reconf["path"] == "rebuild"
+            ):
+                self.last_reconf["secs"] = secs
+
+    def reconf_status(self):
+        with self.last_reconf_lock:
+            return json.dumps(self.last_reconf), 200
+
     def reconf(self):
         new_options = copy.deepcopy(self.options)
         for arg, val in self.request.args.items():
@@ -56,6 +85,29 @@ class FlaskHandler:
         results = self.check_options(new_options)
         if results:
             return results, 400
+        changed = [
+            k
+            for k, v in vars(new_options).items()
+            if v != getattr(self.options, k, None)
+        ]
+        if (
+            self.live_reconf is not None
+            and changed
+            and not [k for k in changed if k not in self.live_options]
+        ):
+            reconf_start = time.time()
+            if self.live_reconf(new_options, changed):
+                self.options = new_options
+                self.live_reconfigures += 1
+                with self.last_reconf_lock:
+                    self.last_reconf = {
+                        "path": "live",
+                        "secs": time.time() - reconf_start,
+                    }
+                return "reconf", 200
         self.options = new_options
-        self.reconfigures += 1
+        with self.last_reconf_lock:
+            # secs are reported by rebuilt(), once the flowgraph is rebuilt.
+            self.last_reconf = {"path": "rebuild", "secs": None}
+            self.reconfigures += 1
         return "reconf", 200
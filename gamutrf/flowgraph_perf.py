@@ -0,0 +1,143 @@
+import logging
+import sys
+import threading
+import time
+
+from prometheus_client import Gauge, Histogram, REGISTRY
+
+try:
+    from gnuradio import gr  # pytype: disable=import-error
+except ModuleNotFoundError as err:  # pragma: no cover
+    print(
+        "Run from outside a supported environment, please run via Docker (https://github.com/IQTLabs/gamutRF#readme): %s"
+        % err
+    )
+    sys.exit(1)
+
+WORK_TIME_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1)
+
+
+def enable_perf_counters():
+    # Must be called before the flowgraph is started.
+    gr.prefs().set_bool("PerfCounters", "on", True)
+
+
+class FlowgraphPerfMonitor:
+    """Periodically sample GNU Radio performance counters and export them.
+
+    Blocks are supplied as a dict of stable label to block (see
+    grscan.perf_blocks()), and may be replaced when the flowgraph is rebuilt.
+    """
+
+    def __init__(self, sample_secs, registry=REGISTRY, ticks_per_sec=None):
+        self.sample_secs = sample_secs
+        if ticks_per_sec is None:
+            ticks_per_sec = gr.high_res_timer_tps()
+        self.ticks_per_sec = float(ticks_per_sec)
+        self.blocks = {}
+        self.last_work_time = {}
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.work_time = Gauge(
+            "gr_block_work_time_seconds",
+            "average time spent per call to work()",
+            ["block"],
+            registry=registry,
+        )
+        self.work_time_hist = Histogram(
+            "gr_block_work_time_sample_seconds",
+            "sampled average time spent per call to work()",
+            ["block"],
+            buckets=WORK_TIME_BUCKETS,
+            registry=registry,
+        )
+        self.busy = Gauge(
+            "gr_block_busy_ratio",
+            "proportion of time spent in work() since last sample",
+            ["block"],
+            registry=registry,
+        )
+        self.items_per_sec = Gauge(
+            "gr_block_items_per_sec",
+            "average items produced per second",
+            ["block"],
+            registry=registry,
+        )
+        self.input_buffers_full = Gauge(
+            "gr_block_input_buffer_full_ratio",
+            "average input buffer fullness",
+            ["block", "port"],
+            registry=registry,
+        )
+        self.output_buffers_full = Gauge(
+            "gr_block_output_buffer_full_ratio",
+            "average output buffer fullness",
+            ["block", "port"],
+            registry=registry,
+        )
+        self.metrics = (
+            self.work_time,
+            self.work_time_hist,
+            self.busy,
+            self.items_per_sec,
+            self.input_buffers_full,
+            self.output_buffers_full,
+        )
+
+    def set_blocks(self, blocks):
+        with self.lock:
+            self.blocks = blocks
+            self.last_work_time = {}
+            for metric in self.metrics:
+                metric.clear()
+
+    def sample(self, now=None):
+        if now is None:
+            now = time.time()
+        with self.lock:
+            for label, block in self.blocks.items():
+                self.sample_block(label, block, now)
+
+    def sample_block(self, label, block, now):
+        work_time = block.pc_work_time_avg() / self.ticks_per_sec
+        self.work_time.labels(block=label).set(work_time)
+        self.work_time_hist.labels(block=label).observe(work_time)
+        self.items_per_sec.labels(block=label).set(block.pc_throughput_avg())
+        work_time_total = block.pc_work_time_total() / self.ticks_per_sec
+        last = self.last_work_time.get(label, None)
+        if last is not None:
+            last_now, last_work_time_total = last
+            if now > last_now:
+                self.busy.labels(block=label).set(
+                    (work_time_total - last_work_time_total) / (now - last_now)
+                )
+        self.last_work_time[label] = (now, work_time_total)
+        for metric, buffers_full in (
+            (self.input_buffers_full, block.pc_input_buffers_full_avg()),
+            (self.output_buffers_full, block.pc_output_buffers_full_avg()),
+        ):
+            for port, full in enumerate(buffers_full):
+                metric.labels(block=label, port=str(port)).set(full)
+
+    def run(self):
+        while self.running:
+            time.sleep(self.sample_secs)
+            try:
+                self.sample()
+            except RuntimeError as err:
+                logging.error("could not sample performance counters: %s", err)
+
+    def start(self):
+        logging.info(
+            "sampling flowgraph performance counters every %.1fs", self.sample_secs
+        )
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import sys
+from abc import ABC, abstractmethod
+import numpy as np
+import pmt
+
+try:
+    from gnuradio import gr  # pytype: disable=import-error
+except ModuleNotFoundError as err:  # pragma: no cover
+    print(
+        "Run from outside a supported environment, please run via Docker (https://github.com/IQTLabs/gamutRF#readme): %s"
+        % err
+    )
+    sys.exit(1)
+
+# Largest decay applied in one step of single_pole_iir(), to bound the dynamic range
+# of the scaled cumulative sum.
+MAX_IIR_DECAY_LOG = 30
+
+
+def single_pole_iir(x, alpha, prev):
+    """Vectorized y[n] = alpha * x[n] + (1 - alpha) * y[n - 1], with y[-1] = prev.
+
+    Returns (y, y[-1]).
+    """
+    if alpha >= 1:
+        return x.copy(), x[-1]
+    y = np.empty(x.shape, dtype=np.result_type(x, np.float64))
+    chunk = max(1, int(MAX_IIR_DECAY_LOG / -np.log1p(-alpha)))
+    decay = np.power(1 - alpha, np.arange(1, min(chunk, len(x)) + 1, dtype=np.float64))
+    for i in range(0, len(x), chunk):
+        x_chunk = x[i : i + chunk]
+        chunk_decay = decay[: len(x_chunk)]
+        y[i : i + chunk] = chunk_decay * (
+            prev + alpha * np.cumsum(x_chunk / chunk_decay)
+        )
+        prev = y[i + len(x_chunk) - 1]
+    return y, prev
+
+
+def moving_sum(x, history):
+    """Sum of each sample of x with the len(history) samples before it.
+
+    Returns (sums, new history).
+    """
+    if not len(history):
+        return x.astype(np.complex128), history
+    ext = np.concatenate((history, x))
+    sums = np.concatenate(([0], np.cumsum(ext, dtype=np.complex128)))
+    return sums[len(history) + 1 :] - sums[: len(x)], ext[len(x) :]
+
+
+class batch_block(gr.sync_block, ABC):
+    """Base for blocks that process fft_batch_size * nfft vectors as one stream.
+
+    State is carried across vectors, and reset at each retune tag.
+    """
+
+    def __init__(self, name, vlen, tag="rx_freq"):
+        self.tag = pmt.intern(tag)
+        gr.sync_block.__init__(
+            self,
+            name=name,
+            in_sig=[(np.complex64, vlen)],
+            out_sig=[(np.complex64, vlen)],
+        )
+        self.reset()
+
+    @abstractmethod
+    def reset(self):
+        """Reset state, at startup and at each retune tag."""
+
+    @abstractmethod
+    def process(self, x, out):
+        """Process samples x (a flat view of whole vectors) into out."""
+
+    def work(self, input_items, output_items):
+        n = len(input_items[0])
+        start = self.nitems_read(0)
+        resets = sorted(
+            {tag.offset - start for tag in self.get_tags_in_window(0, 0, n, self.tag)}
+        )
+        last = 0
+        for i in resets + [n]:
+            if i > last:
+                self.process(
+                    input_items[0][last:i].reshape(-1),
+                    output_items[0][last:i].reshape(-1),
+                )
+            if i < n:
+                self.reset()
+            last = i
+        return n
+
+
+class batch_correctiq(batch_block):
+    """Batched equivalent of blocks.correctiq()."""
+
+    def __init__(self, vlen, ratio=1e-5):
+        self.ratio = ratio
+        batch_block.__init__(self, "batch_correctiq", vlen)
+
+    def reset(self):
+        self.avg = 0j
+
+    def process(self, x, out):
+        avg, self.avg = single_pole_iir(x, self.ratio, self.avg)
+        np.subtract(x, avg, out=out, casting="unsafe")
+
+
+class batch_dc_blocker(batch_block):
+    """Batched equivalent of filter.dc_blocker_cc()."""
+
+    def __init__(self, vlen, length, long_form):
+        if length < 2:
+            raise ValueError(f"DC blocker length must be at least 2, not {length}")
+        self.length = length
+        self.long_form = long_form
+        batch_block.__init__(self, "batch_dc_blocker", vlen)
+
+    def reset(self):
+        stages = 2
+        delay = self.length - 1
+        if self.long_form:
+            stages = 4
+            delay *= 2
+        self.ma_history = [
+            np.zeros(self.length - 2, dtype=np.complex128) for _ in range(stages)
+        ]
+        self.delay_line = np.zeros(delay, dtype=np.complex64)
+
+    def process(self, x, out):
+        y = x
+        for i, history in enumerate(self.ma_history):
+            y, self.ma_history[i] = moving_sum(y, history)
+            y /= self.length
+        delayed = np.concatenate((self.delay_line, x))
+        self.delay_line = delayed[len(x) :]
+        np.subtract(delayed[: len(x)], y, out=out, casting="unsafe")
+
+
+class batch_pwr_squelch(batch_block):
+    """Batched equivalent of analog.pwr_squelch_cc(db, alpha, 0, False)."""
+
+    def __init__(self, vlen, db, alpha):
+        self.threshold = 10 ** (db / 10)
+        self.alpha = alpha
+        batch_block.__init__(self, "batch_pwr_squelch", vlen)
+
+    def reset(self):
+        self.pwr = 0.0
+
+    def process(self, x, out):
+        pwr, self.pwr = single_pole_iir(
+            np.square(x.real, dtype=np.float64) + np.square(x.imag, dtype=np.float64),
+            self.alpha,
+            self.pwr,
+        )
+        np.multiply(x, pwr >= self.threshold, out=out)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import sys
+import numpy as np
+
+try:
+    import scipy.fft as scipy_fft
+except ModuleNotFoundError:  # pragma: no cover
+    scipy_fft = None
+
+try:
+    from gnuradio import gr  # pytype: disable=import-error
+except ModuleNotFoundError as err:  # pragma: no cover
+    print(
+        "Run from outside a supported environment, please run via Docker (https://github.com/IQTLabs/gamutRF#readme): %s"
+        % err
+    )
+    sys.exit(1)
+
+
+def get_shifted_window(nfft, fft_window):
+    # For even nfft, fftshift() of the output is equivalent to multiplying the input
+    # by (-1)^n, so the shift is folded into the window.
+    shifted_window = np.array(fft_window, dtype=np.complex64)
+    if nfft % 2 == 0:
+        shifted_window[1::2] *= -1
+    return shifted_window
+
+
+def cpufft_rows(x, shifted_window, out, workers=1):
+    """Windowed, shifted FFT of each row of x, written to out."""
+    np.multiply(x, shifted_window, out=out)
+    out[:] = scipy_fft.fft(out, axis=-1, overwrite_x=True, workers=workers)
+    if shifted_window.shape[0] % 2:
+        out[:] = scipy_fft.fftshift(out, axes=-1)
+    return out
+
+
+class cpufft(gr.sync_block):
+    """Multithreaded CPU FFT of a batch of nfft vectors, with a fused window.
+
+    Rows of each batch are transformed by scipy.fft's worker threads, from a
+    plan that scipy caches per FFT length. Rows are transformed
+    independently, so output does not depend on the number of workers.
+    """
+
+    def __init__(self, fft_batch_size, nfft, fft_window, workers=0):
+        if scipy_fft is None:
+            raise RuntimeError("cpufft requires scipy")
+        if not workers:
+            workers = os.cpu_count()
+        self.fft_batch_size = fft_batch_size
+        self.nfft = nfft
+        self.workers = workers
+        self.shifted_window = get_shifted_window(nfft, fft_window)
+        gr.sync_block.__init__(
+            self,
+            name="cpufft",
+            in_sig=[(np.complex64, fft_batch_size * nfft)],
+            out_sig=[(np.complex64, fft_batch_size * nfft)],
+        )
+        # Create and cache the FFT plan now rather than on the first batch.
+        batch = np.zeros((fft_batch_size, nfft), dtype=np.complex64)
+        self.fft_batch(batch, batch)
+
+    def fft_batch(self, x, out):
+        return cpufft_rows(
+            x.reshape(-1, self.nfft),
+            self.shifted_window,
+            out.reshape(-1, self.nfft),
+            self.workers,
+        )
+
+    def work(self, input_items, output_items):
+        n = len(input_items[0])
+        self.fft_batch(input_items[0][:n], output_items[0][:n])
+        return n
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import sys
+import numpy as np
+
+try:
+    from gnuradio import gr  # pytype: disable=import-error
+except ModuleNotFoundError as err:  # pragma: no cover
+    print(
+        "Run from outside a supported environment, please run via Docker (https://github.com/IQTLabs/gamutRF#readme): %s"
+        % err
+    )
+    sys.exit(1)
+
+
+def power_db(x, scale, db_clamp_floor, db_clamp_ceil, out):
+    """Compute clip(10 * log10(scale * |x|^2)) into out.
+
+    If x is real, it is already power and is not squared.
+    """
+    if np.iscomplexobj(x):
+        np.square(x.real, out=out)
+        out += np.square(x.imag)
+    else:
+        np.copyto(out, x)
+    with np.errstate(divide="ignore"):
+        np.log10(out, out=out)
+    # 10 * log10(scale * p) = 10 * log10(p) + 10 * log10(scale)
+    out *= 10
+    out += np.float32(10 * np.log10(scale))
+    np.clip(out, db_clamp_floor, db_clamp_ceil, out=out)
+    return out
+
+
+class db(gr.sync_block):
+    """Fused power spectrum in dB of nfft vectors.
+
+    Replaces complex_to_mag_squared, multiply_const_ff and nlog10_ff with one
+    pass over each buffer. With power_input, the input is already power (for
+    example from fftaverage).
+    """
+
+    def __init__(self, nfft, scale, db_clamp_floor, db_clamp_ceil, power_input=False):
+        self.scale = scale
+        self.db_clamp_floor = db_clamp_floor
+        self.db_clamp_ceil = db_clamp_ceil
+        in_type = np.complex64
+        if power_input:
+            in_type = np.float32
+        gr.sync_block.__init__(
+            self,
+            name="db",
+            in_sig=[(in_type, nfft)],
+            out_sig=[(np.float32, nfft)],
+        )
+
+    def work(self, input_items, output_items):
+        n = len(input_items[0])
+        power_db(
+            input_items[0][:n],
+            self.scale,
+            self.db_clamp_floor,
+            self.db_clamp_ceil,
+            output_items[0][:n],
+        )
+        return n
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import sys
+import numpy as np
+
+try:
+    from gnuradio import gr  # pytype: disable=import-error
+except ModuleNotFoundError as err:  # pragma: no cover
+    print(
+        "Run from outside a supported environment, please run via Docker (https://github.com/IQTLabs/gamutRF#readme): %s"
+        % err
+    )
+    sys.exit(1)
+
+FFT_AVERAGE_METHODS = ("mean", "max")
+
+
+def average_power(x, fft_average, method, out):
+    """Reduce each fft_average consecutive FFT frames to one power frame."""
+    x = x.reshape(out.shape[0], fft_average, out.shape[1])
+    power = np.square(x.real)
+    power += np.square(x.imag)
+    if method == "max":
+        np.max(power, axis=1, out=out)
+    else:
+        np.mean(power, axis=1, out=out)
+    return out
+
+
+class fftaverage(gr.decim_block):
+    """Average (mean of periodograms) or max-hold fft_average FFT frames.
+
+    Outputs power (not dB) frames at 1/fft_average of the input rate. With
+    pretune, fft_average must divide the FFT batch size so averages do not
+    cross a retune.
+    """
+
+    def __init__(self, nfft, fft_average, method="mean"):
+        if method not in FFT_AVERAGE_METHODS:
+            raise ValueError(f"FFT average method must be one of {FFT_AVERAGE_METHODS}")
+        self.fft_average = fft_average
+        self.method = method
+        gr.decim_block.__init__(
+            self,
+            name="fftaverage",
+            in_sig=[(np.complex64, nfft)],
+            out_sig=[(np.float32, nfft)],
+            decim=fft_average,
+        )
+
+    def work(self, input_items, output_items):
+        n = min(len(output_items[0]), len(input_items[0]) // self.fft_average)
+        average_power(
+            input_items[0][: n * self.fft_average],
+            self.fft_average,
+            self.method,
+            output_items[0][:n],
+        )
+        return n
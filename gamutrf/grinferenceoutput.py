@@ -36,7 +36,11 @@ class inferenceoutput(gr.basic_block):
         external_gps_server,
         external_gps_server_port,
         log_path,
+        scanners=None,
+        scan_metrics=None,
+        start_reporter=True,
     ):
+        self.scan_metrics = scan_metrics
         self.q = queue.Queue()
         self.running = True
         self.serialno = 0
@@ -55,22 +59,40 @@ class inferenceoutput(gr.basic_block):
                 log_path,
             ),
         )
-        self.reporter_thread.start()
+        if start_reporter:
+            self.start_reporter()
         gr.basic_block.__init__(
             self,
             name="inferenceoutput",
             in_sig=None,
             out_sig=None,
         )
-        self.message_port_register_in(pmt.intern("inference"))
-        self.set_msg_handler(pmt.intern("inference"), self.receive_pdu)
+        if scanners:
+            # one port per scanner, so results can be labeled with their scanner.
+            for scanner in scanners:
+                port = pmt.intern("_".join(("inference", scanner)))
+                self.message_port_register_in(port)
+                self.set_msg_handler(
+                    port,
+                    lambda pdu, scanner=scanner: self.receive_pdu(pdu, scanner),
+                )
+        else:
+            self.message_port_register_in(pmt.intern("inference"))
+            self.set_msg_handler(pmt.intern("inference"), self.receive_pdu)
+
+    def receive_pdu(self, pdu, scanner=None):
+        item = json.loads(bytes(pmt.to_python(pmt.cdr(pdu))).decode("utf8"))
+        if scanner:
+            item["scanner"] = scanner
+        self.q.put(item)
 
-    def receive_pdu(self, pdu):
-        self.q.put(json.loads(bytes(pmt.to_python(pmt.cdr(pdu))).decode("utf8")))
+    def start_reporter(self):
+        self.reporter_thread.start()
 
     def stop(self):
         self.running = False
-        self.reporter_thread.join()
+        if self.reporter_thread.is_alive():
+            self.reporter_thread.join()
 
     def run_reporter_thread(
         self,
@@ -118,4 +140,6 @@ class inferenceoutput(gr.basic_block):
             if mqtt_reporter is not None:
                 mqtt_reporter.publish("gamutrf/inference", item)
                 mqtt_reporter.log(log_path, "inference", start_time, item)
+            if self.scan_metrics:
+                self.scan_metrics.inference_item()
             self.q.task_done()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import json
 import logging
 import sys
 import time
@@ -17,6 +18,8 @@ except ModuleNotFoundError as err:  # pragma: no cover
     sys.exit(1)
 
 DELIM = "\n"
+BIND_RETRIES = 10
+BIND_RETRY_SECS = 0.1
 
 
 # It would be ideal to just use gnuradio's https://github.com/gnuradio/gnuradio/blob/main/gr-zeromq/lib/pub_msg_sink_impl.cc
@@ -26,6 +29,11 @@ class pduzmq(gr.basic_block):
     def __init__(
         self,
         zmq_addr,
+        scanners=None,
+        record_callback=None,
+        scan_config=None,
+        scan_metrics=None,
+        bind=True,
     ):
         gr.basic_block.__init__(
             self,
@@ -33,26 +41,79 @@ class pduzmq(gr.basic_block):
             in_sig=None,
             out_sig=None,
         )
+        self.zmq_addr = zmq_addr
         self.zmq_context = zmq.Context()
         self.zmq_pub = self.zmq_context.socket(zmq.PUB)
         self.zmq_pub.setsockopt(zmq.SNDHWM, 100)
         self.zmq_pub.setsockopt(zmq.SNDBUF, 65536)
-        self.zmq_pub.bind(zmq_addr)
-        self.message_port_register_in(pmt.intern("json"))
-        self.set_msg_handler(pmt.intern("json"), self.receive_pdu)
+        if bind:
+            self.bind()
+        if scanners:
+            # one port per scanner, so records can be labeled with their scanner.
+            for scanner in scanners:
+                port = pmt.intern("_".join(("json", scanner)))
+                self.message_port_register_in(port)
+                self.set_msg_handler(
+                    port,
+                    lambda pdu, scanner=scanner: self.receive_pdu(pdu, scanner),
+                )
+        else:
+            self.message_port_register_in(pmt.intern("json"))
+            self.set_msg_handler(pmt.intern("json"), self.receive_pdu)
+        self.record_callback = record_callback
+        self.scan_config = scan_config
+        self.scan_metrics = scan_metrics
         self.context = zstandard.ZstdCompressor()
         self.last_log = None
         self.item_counter = 0
 
+    def bind(self, retries=BIND_RETRIES):
+        # a previous flowgraph's socket on the same port may still be closing.
+        for _ in range(retries):
+            try:
+                self.zmq_pub.bind(self.zmq_addr)
+                return
+            except zmq.ZMQError as err:
+                if err.errno != zmq.EADDRINUSE:
+                    raise
+                time.sleep(BIND_RETRY_SECS)
+        self.zmq_pub.bind(self.zmq_addr)
+
     def stop(self):
         self.zmq_pub.close()
 
-    def receive_pdu(self, pdu):
+    def receive_pdu(self, pdu, scanner=None):
         item = pmt.to_python(pmt.cdr(pdu)).tobytes().decode("utf8").strip()
+        record = None
+        if self.record_callback or self.scan_config or self.scan_metrics or scanner:
+            # parsed once, for all users of the record.
+            try:
+                record = json.loads(item)
+            except ValueError as err:
+                logging.error("cannot parse FFT record: %s", err)
+        updated = False
+        if self.scan_config and record is not None:
+            # record grscan settings that retune_fft does not know about.
+            try:
+                record["config"].update(self.scan_config)
+                updated = True
+            except (AttributeError, KeyError, TypeError) as err:
+                logging.error("cannot add scan config to FFT record: %s", err)
+        if scanner and isinstance(record, dict):
+            record = {"scanner": scanner, **record}
+            updated = True
+        if updated:
+            item = json.dumps(record)
+        if self.record_callback and record is not None:
+            self.record_callback(record, scanner)
         try:
-            data = item + DELIM
-            data = self.context.compress(data.encode("utf8"))
-            self.zmq_pub.send(data, flags=zmq.NOBLOCK)
+            data = (item + DELIM).encode("utf8")
+            compressed_data = self.context.compress(data)
+            self.zmq_pub.send(compressed_data, flags=zmq.NOBLOCK)
+            if self.scan_metrics:
+                self.scan_metrics.fft_record(
+                    len(data), len(compressed_data), record, scanner
+                )
         except zmq.ZMQError as e:
             logging.error(str(e))
         now = time.time()
@@ -1,16 +1,15 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import functools
 import os
 import glob
 import logging
 import sys
 from pathlib import Path
-import pbr.version
-import webcolors
+from types import SimpleNamespace
+import pmt
 
 try:
-    from gnuradio import analog  # pytype: disable=import-error
-    from gnuradio import filter as grfilter  # pytype: disable=import-error
     from gnuradio import blocks  # pytype: disable=import-error
     from gnuradio import fft  # pytype: disable=import-error
     from gnuradio import gr  # pytype: disable=import-error
@@ -24,10 +23,113 @@ except ModuleNotFoundError as err:  # pragma: no cover
     sys.exit(1)
 
 from gamutrf.grsource import get_source
+from gamutrf.cpu_plan import apply_cpu_plan, parse_cpu_plan
+from gamutrf.grbatch import batch_correctiq, batch_dc_blocker, batch_pwr_squelch
+from gamutrf.grcpufft import cpufft
+from gamutrf.grdb import db
+from gamutrf.grfftaverage import fftaverage
 from gamutrf.grinferenceoutput import inferenceoutput
 from gamutrf.grpduzmq import pduzmq
+from gamutrf.startup_profile import NULL_STARTUP_PROFILE
 from gamutrf.utils import endianstr
 
+IQTLABS_LIB = "libgnuradio-iqtlabs.so"
+IQTLABS_LIB_DIRS = ("/usr/local/lib", "/usr/local/lib64", "/usr/local/lib/*-linux-gnu")
+
+
+@functools.lru_cache(maxsize=None)
+def get_iqtlabs_path():
+    # check the usual install locations before walking all of /usr/local.
+    for lib_dir in IQTLABS_LIB_DIRS:
+        libs = glob.glob(os.path.join(lib_dir, IQTLABS_LIB))
+        if libs:
+            return os.path.realpath(libs[0])
+    return os.path.realpath(
+        glob.glob(os.path.join("/usr/local/**", IQTLABS_LIB), recursive=True)[0]
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_gamutrf_version():
+    import pbr.version
+
+    return pbr.version.VersionInfo("gamutrf").version_string()
+
+
+def get_tune_step_fft(
+    freq_range, samp_rate, nfft, tune_step_hz, sweep_sec, tune_dwell_ms, tune_step_fft
+):
+    fft_rate = int(samp_rate / nfft)
+    if not tune_step_fft:
+        if tune_dwell_ms:
+            tune_step_fft = int(fft_rate * (tune_dwell_ms / 1e3))
+        else:
+            target_retune_hz = freq_range / sweep_sec / tune_step_hz
+            tune_step_fft = int(fft_rate / target_retune_hz)
+            logging.info(
+                f"retuning across {freq_range/1e6}MHz in {sweep_sec}s, requires retuning at {target_retune_hz}Hz in {tune_step_hz/1e6}MHz steps ({tune_step_fft} FFTs)"
+            )
+    if not tune_step_fft:
+        logging.info("tune_step_fft cannot be 0 - defaulting to nfft")
+        tune_step_fft = nfft
+    return tune_step_fft
+
+
+def get_radio_specs(sdr, sdrargs, freq_start, freq_end, sdr_freq_ranges):
+    """Return (sdr, sdrargs, freq_start, freq_end) for each SDR in a comma separated list.
+
+    sdrargs may be given per SDR separated by ";", and sdr_freq_ranges as
+    "start-end,start-end". Without sdr_freq_ranges, freq_start to freq_end is
+    divided evenly between SDRs.
+    """
+    sdrs = [radio_sdr.strip() for radio_sdr in sdr.split(",")]
+    if len(sdrs) == 1:
+        return [(sdr, sdrargs, freq_start, freq_end)]
+    all_sdrargs = [sdrargs] * len(sdrs)
+    if sdrargs and ";" in sdrargs:
+        all_sdrargs = sdrargs.split(";")
+        if len(all_sdrargs) != len(sdrs):
+            raise ValueError(f"need sdrargs for each of {len(sdrs)} SDRs")
+    if sdr_freq_ranges:
+        freq_ranges = [
+            [float(freq) for freq in freq_range.split("-")]
+            for freq_range in sdr_freq_ranges.split(",")
+        ]
+        if len(freq_ranges) != len(sdrs):
+            raise ValueError(f"need a frequency range for each of {len(sdrs)} SDRs")
+    elif freq_end:
+        step = (freq_end - freq_start) / len(sdrs)
+        freq_ranges = [
+            (freq_start + (i * step), freq_start + ((i + 1) * step))
+            for i in range(len(sdrs))
+        ]
+    else:
+        freq_ranges = [(freq_start, freq_end)] * len(sdrs)
+    return [
+        (radio_sdr, radio_sdrargs, radio_freq_start, radio_freq_end)
+        for radio_sdr, radio_sdrargs, (radio_freq_start, radio_freq_end) in zip(
+            sdrs, all_sdrargs, freq_ranges
+        )
+    ]
+
+
+def get_radio_cpus(radios):
+    """Divide the CPUs available to this process into a disjoint set per SDR."""
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) < radios:
+        logging.warning(
+            "only %u CPUs for %u SDRs, not pinning SDR pipelines", len(cpus), radios
+        )
+        return [None] * radios
+    per_radio = len(cpus) // radios
+    return [cpus[i * per_radio : (i + 1) * per_radio] for i in range(radios)]
+
+
+def scanner_port(port, scanner):
+    if scanner is None:
+        return port
+    return "_".join((port, scanner))
+
 
 class grscan(gr.top_block):
     def __init__(
@@ -36,6 +138,7 @@ class grscan(gr.top_block):
         colormap=16,
         compass=False,
         correct_iq=False,
+        cpu_plan="",
         db_clamp_ceil=50,
         db_clamp_floor=-200,
         dc_block_len=0,
@@ -44,8 +147,11 @@ class grscan(gr.top_block):
         description="",
         external_gps_server="",
         external_gps_server_port=8888,
+        fft_average=1,
+        fft_average_method="mean",
         fft_batch_size=256,
         fft_processor_affinity=0,
+        fused_db=False,
         iq_zmq_addr="0.0.0.0",
         iq_zmq_port=10002,
         freq_end=1e9,
@@ -68,6 +174,7 @@ class grscan(gr.top_block):
         iq_inference_squelch_alpha=1e-4,
         iq_power_inference=False,
         iqtlabs=None,
+        record_callback=None,
         fft_zmq_addr="0.0.0.0",  # nosec
         fft_zmq_port=10000,
         low_power_hold_down=False,
@@ -81,13 +188,18 @@ class grscan(gr.top_block):
         samp_rate=4.096e6,
         sample_dir="",
         scaling="spectrum",
+        scan_metrics=None,
         sdr="ettus",
         sdrargs=None,
+        sdr_freq_ranges="",
         sigmf=True,
         skip_tune_step=0,
+        standby=False,
+        startup_profile=None,
         slew_rx_time=True,
         sweep_sec=30,
         tag_now=False,
+        throttle=True,
         tune_dwell_ms=0,
         tune_jitter_hz=0,
         tune_step_fft=0,
@@ -96,6 +208,8 @@ class grscan(gr.top_block):
         use_external_gps=False,
         use_external_heading=False,
         vkfft=False,
+        cpufft=False,
+        cpufft_workers=0,
         wavelearner=None,
         write_fft_points=False,
         write_samples=0,
@@ -104,17 +218,6 @@ class grscan(gr.top_block):
 
         if description:
             description = description.strip('"')
-        tune_step_hz = int(samp_rate * tuneoverlap)
-        stare = False
-        initial_freq = freq_start
-
-        if freq_end == 0:
-            stare = True
-            freq_end = freq_start + (tune_step_hz - 1)
-            initial_freq += int((freq_end - freq_start) / 2)
-            logging.info(
-                f"using stare mode, scan from {freq_start/1e6}MHz to {freq_end/1e6}MHz"
-            )
 
         ##################################################
         # Parameters
@@ -124,68 +227,372 @@ class grscan(gr.top_block):
         self.sweep_sec = sweep_sec
         self.nfft = nfft
         self.wavelearner = wavelearner
+        self.cpufft = cpufft
+        self.cpufft_workers = cpufft_workers
+        self.fft_average = fft_average
+        self.fft_average_method = fft_average_method
         self.iqtlabs = iqtlabs
         self.samp_rate = samp_rate
         self.retune_pre_fft = None
         self.tag_now = tag_now
+        self.sdr = sdr
+        self.edges = []
+        self.msg_edges = []
 
         ##################################################
         # Blocks
         ##################################################
+        if startup_profile is None:
+            startup_profile = NULL_STARTUP_PROFILE
+        self.startup_profile = startup_profile
         if iqtlabs is not None:
-            griqtlabs_path = os.path.realpath(
-                glob.glob("/usr/local/**/libgnuradio-iqtlabs.so", recursive=True)[0]
-            )
-            pbr_version = pbr.version.VersionInfo("gamutrf").version_string()
+            with startup_profile.stage("gr-iqtlabs discovery"):
+                griqtlabs_path = get_iqtlabs_path()
+                pbr_version = get_gamutrf_version()
             logging.info(f"gamutrf {pbr_version} with gr-iqtlabs {griqtlabs_path}")
 
-        logging.info(f"will scan from {freq_start} to {freq_end}")
-        freq_range = freq_end - freq_start
-        fft_rate = int(samp_rate / nfft)
+        fft_dir = ""
+        if write_fft_points:
+            fft_dir = sample_dir
 
-        if not tune_step_fft:
-            if tune_dwell_ms:
-                tune_step_fft = int(fft_rate * (tune_dwell_ms / 1e3))
-            else:
-                target_retune_hz = freq_range / self.sweep_sec / tune_step_hz
-                tune_step_fft = int(fft_rate / target_retune_hz)
+        radio_specs = get_radio_specs(
+            sdr, sdrargs, freq_start, freq_end, sdr_freq_ranges
+        )
+        self.cpu_plan = parse_cpu_plan(cpu_plan)
+        scanners = None
+        radio_cpus = [None] * len(radio_specs)
+        if len(radio_specs) > 1:
+            scanners = [f"sdr{i}" for i in range(len(radio_specs))]
+            if not self.cpu_plan:
+                radio_cpus = get_radio_cpus(len(radio_specs))
+
+        fft_zmq_block_addr = f"tcp://{fft_zmq_addr}:{fft_zmq_port}"
+        scan_config = {}
+        if fft_average > 1:
+            scan_config = {
+                "fft_average": fft_average,
+                "fft_average_method": fft_average_method,
+            }
+        self.pduzmq_block = pduzmq(
+            fft_zmq_block_addr,
+            scanners,
+            record_callback,
+            scan_config,
+            scan_metrics,
+            bind=False,
+        )
+        apply_cpu_plan(self.cpu_plan, {"zmq": [self.pduzmq_block]})
+
+        if inference_output_dir:
+            Path(inference_output_dir).mkdir(parents=True, exist_ok=True)
+
+        if inference_text_color:
+            import webcolors
+
+            wc = webcolors.name_to_rgb(inference_text_color, "css3")
+            inference_text_color = ",".join(
+                [str(c) for c in [wc.blue, wc.green, wc.red]]
+            )
+
+        self.radios = []
+        for i, (
+            radio_sdr,
+            radio_sdrargs,
+            radio_freq_start,
+            radio_freq_end,
+        ) in enumerate(radio_specs):
+            scanner = None
+            radio_sample_dir = sample_dir
+            radio_fft_dir = fft_dir
+            radio_iq_zmq_port = iq_zmq_port
+            if scanners:
+                scanner = scanners[i]
                 logging.info(
-                    f"retuning across {freq_range/1e6}MHz in {self.sweep_sec}s, requires retuning at {target_retune_hz}Hz in {tune_step_hz/1e6}MHz steps ({tune_step_fft} FFTs)"
+                    "scanner %s using SDR %s from %s to %s",
+                    scanner,
+                    radio_sdr,
+                    radio_freq_start,
+                    radio_freq_end,
                 )
-        if not tune_step_fft:
-            logging.info("tune_step_fft cannot be 0 - defaulting to nfft")
-            tune_step_fft = nfft
-        tune_dwell_ms = tune_step_fft / fft_rate * 1e3
-        logging.info(
-            f"requested retuning across {freq_range/1e6}MHz every {tune_step_fft} FFTs, dwell time {tune_dwell_ms}ms"
-        )
-        if stare and tune_dwell_ms > 1e3:
-            logging.warn(">1s dwell time in stare mode, updates will be slow!")
-        peak_fft_range = min(peak_fft_range, tune_step_fft)
+                if sample_dir:
+                    radio_sample_dir = os.path.join(sample_dir, scanner)
+                if fft_dir:
+                    radio_fft_dir = radio_sample_dir
+                if iq_zmq_port:
+                    radio_iq_zmq_port = iq_zmq_port + i
+            with startup_profile.stage(f"build pipeline {i}"):
+                radio = self.get_radio(
+                    scanner,
+                    radio_sdr,
+                    radio_sdrargs,
+                    radio_freq_start,
+                    radio_freq_end,
+                    radio_sample_dir,
+                    radio_fft_dir,
+                    bucket_range,
+                    colormap,
+                    correct_iq,
+                    db_clamp_ceil,
+                    db_clamp_floor,
+                    dc_block_len,
+                    dc_block_long,
+                    dc_ettus_auto_offset,
+                    description,
+                    fft_batch_size,
+                    fft_processor_affinity,
+                    fused_db,
+                    igain,
+                    inference_batch,
+                    inference_min_confidence,
+                    inference_min_db,
+                    inference_model_name,
+                    inference_model_server,
+                    inference_output_dir,
+                    inference_text_color,
+                    iq_inference_background,
+                    iq_inference_model_name,
+                    iq_inference_model_server,
+                    iq_inference_squelch_db,
+                    iq_inference_squelch_alpha,
+                    iq_power_inference,
+                    low_power_hold_down,
+                    n_image,
+                    n_inference,
+                    nfft,
+                    peak_fft_range,
+                    pretune,
+                    rotate_secs,
+                    samp_rate,
+                    scaling,
+                    sigmf,
+                    skip_tune_step,
+                    slew_rx_time,
+                    sweep_sec,
+                    throttle,
+                    tune_dwell_ms,
+                    tune_jitter_hz,
+                    tune_step_fft,
+                    tuneoverlap,
+                    tuning_ranges,
+                    vkfft,
+                    write_samples,
+                )
+            radio.cpus = radio_cpus[i]
+            radio.iq_zmq_block_addr = None
+            if radio_iq_zmq_port:
+                radio.iq_zmq_block_addr = f"tcp://{iq_zmq_addr}:{radio_iq_zmq_port}"
+            if radio.cpus is not None:
+                logging.info("scanner %s using CPUs %s", scanner, radio.cpus)
+                for block in radio.pipeline_blocks:
+                    block.set_processor_affinity(radio.cpus)
+            apply_cpu_plan(self.cpu_plan, radio.roles)
+            self.radios.append(radio)
 
-        fft_dir = ""
-        if write_fft_points:
-            fft_dir = sample_dir
+        # Single SDR attributes, for live reconfiguration and autotuning.
+        radio = self.radios[0]
+        self.freq_end = radio.freq_end
+        self.stare = radio.stare
+        self.tune_step_fft = radio.tune_step_fft
+        self.peak_fft_range = peak_fft_range
+        self.retune_pre_fft = radio.retune_pre_fft
+        self.retune_fft = radio.retune_fft
+        self.db_block = radio.db_block
+        self.sample_block = radio.sample_block
+        self.pipeline_blocks = radio.pipeline_blocks
+        self.retune_args = radio.retune_args
+        self.samples_blocks = radio.samples_blocks
+        self.write_samples_block = radio.write_samples_block
+        self.image_inference_block = radio.image_inference_block
+        self.iq_inference_block = radio.iq_inference_block
+        self.inference_blocks = []
+        for radio in self.radios:
+            self.inference_blocks.extend(radio.inference_blocks)
+
+        # TODO: provide new block that receives JSON-over-PMT and outputs to MQTT/zmq.
+        self.inference_output_block = None
+        if self.inference_blocks:
+            inference_zmq_addr = f"tcp://{inference_addr}:{inference_port}"
+            with startup_profile.stage("build inference output"):
+                self.inference_output_block = inferenceoutput(
+                    "inferencemqtt",
+                    inference_zmq_addr,
+                    mqtt_server,
+                    compass,
+                    gps_server,
+                    use_external_gps,
+                    use_external_heading,
+                    external_gps_server,
+                    external_gps_server_port,
+                    inference_output_dir,
+                    scanners,
+                    scan_metrics,
+                    start_reporter=False,
+                )
+            apply_cpu_plan(self.cpu_plan, {"inference": [self.inference_output_block]})
+            for radio in self.radios:
+                for block in radio.inference_blocks:
+                    self.msg_connect(
+                        (block, "inference"),
+                        (
+                            self.inference_output_block,
+                            scanner_port("inference", radio.scanner),
+                        ),
+                    )
+
+        self.attached = False
+        if not standby:
+            self.attach()
+
+    def attach(self):
+        """Open the SDRs and bind the ZMQ publishers.
 
-        self.sources, cmd_port, self.workaround_start_hook = get_source(
-            sdr,
+        A flowgraph built with standby=True has everything else ready, so it can
+        be built while a previous flowgraph still owns the SDRs and ports, and
+        attached once that flowgraph has stopped.
+        """
+        for i, radio in enumerate(self.radios):
+            with self.startup_profile.stage(f"open SDR {i}"):
+                self.attach_radio(radio)
+        with self.startup_profile.stage("bind ZMQ"):
+            self.pduzmq_block.bind()
+        logging.info("serving FFT on %s", self.pduzmq_block.zmq_addr)
+        if self.inference_output_block:
+            self.inference_output_block.start_reporter()
+        radio = self.radios[0]
+        self.sources = radio.sources
+        self.cmd_port = radio.cmd_port
+        self.workaround_start_hook = radio.workaround_start_hook
+        self.attached = True
+
+    def attach_radio(self, radio):
+        sources, cmd_port, workaround_start_hook = get_source(**radio.source_args)
+        radio.sources = sources
+        radio.cmd_port = cmd_port
+        radio.workaround_start_hook = workaround_start_hook
+        roles = {"source": sources, "zmq": []}
+        if radio.iq_zmq_block_addr:
+            logging.info("serving I/Q samples and tags on %s", radio.iq_zmq_block_addr)
+            iq_zmq_block = zeromq.pub_sink(
+                gr.sizeof_gr_complex,
+                radio.retune_args["fft_batch_size"] * radio.retune_args["nfft"],
+                radio.iq_zmq_block_addr,
+                100,
+                True,
+                65536,
+                "",
+            )
+            self.connect((radio.sample_block, 0), (iq_zmq_block, 0))
+            roles["zmq"].append(iq_zmq_block)
+        if radio.retune_args["pretune"]:
+            self.msg_connect((radio.retune_pre_fft, "tune"), (sources[0], cmd_port))
+        else:
+            self.msg_connect((radio.retune_fft, "tune"), (sources[0], cmd_port))
+        self.connect_blocks(sources[0], sources[1:])
+        self.connect_blocks(sources[-1], radio.pipeline_blocks)
+        if radio.cpus is not None:
+            for block in sources:
+                block.set_processor_affinity(radio.cpus)
+        apply_cpu_plan(self.cpu_plan, roles)
+        radio.roles.update(roles)
+
+    def get_radio(
+        self,
+        scanner,
+        sdr,
+        sdrargs,
+        freq_start,
+        freq_end,
+        sample_dir,
+        fft_dir,
+        bucket_range,
+        colormap,
+        correct_iq,
+        db_clamp_ceil,
+        db_clamp_floor,
+        dc_block_len,
+        dc_block_long,
+        dc_ettus_auto_offset,
+        description,
+        fft_batch_size,
+        fft_processor_affinity,
+        fused_db,
+        igain,
+        inference_batch,
+        inference_min_confidence,
+        inference_min_db,
+        inference_model_name,
+        inference_model_server,
+        inference_output_dir,
+        inference_text_color,
+        iq_inference_background,
+        iq_inference_model_name,
+        iq_inference_model_server,
+        iq_inference_squelch_db,
+        iq_inference_squelch_alpha,
+        iq_power_inference,
+        low_power_hold_down,
+        n_image,
+        n_inference,
+        nfft,
+        peak_fft_range,
+        pretune,
+        rotate_secs,
+        samp_rate,
+        scaling,
+        sigmf,
+        skip_tune_step,
+        slew_rx_time,
+        sweep_sec,
+        throttle,
+        tune_dwell_ms,
+        tune_jitter_hz,
+        tune_step_fft,
+        tuneoverlap,
+        tuning_ranges,
+        vkfft,
+        write_samples,
+    ):
+        """Build the source and pipeline for one SDR, connected to the FFT publisher."""
+        (
+            freq_end,
+            initial_freq,
+            stare,
+            tune_step_hz,
+            tune_step_fft,
+        ) = self.get_scan_range(
+            freq_start,
+            freq_end,
             samp_rate,
-            igain,
             nfft,
+            tuneoverlap,
+            sweep_sec,
+            tune_dwell_ms,
             tune_step_fft,
-            agc=False,
-            center_freq=initial_freq,
-            sdrargs=sdrargs,
-            dc_ettus_auto_offset=dc_ettus_auto_offset,
         )
+        peak_fft_range = min(peak_fft_range, tune_step_fft)
+
+        # the SDR is opened by attach_radio().
+        source_args = {
+            "sdr": sdr,
+            "samp_rate": samp_rate,
+            "gain": igain,
+            "nfft": nfft,
+            "tune_step_fft": tune_step_fft,
+            "agc": False,
+            "center_freq": initial_freq,
+            "sdrargs": sdrargs,
+            "dc_ettus_auto_offset": dc_ettus_auto_offset,
+            "throttle": throttle,
+        }
 
         (
             fft_batch_size,
-            self.retune_pre_fft,
-            self.retune_fft,
-            self.db_block,
-            self.sample_block,
-            self.pipeline_blocks,
+            retune_pre_fft,
+            retune_fft,
+            db_block,
+            sample_block,
+            pipeline_blocks,
+            roles,
         ) = self.get_pipeline_blocks(
             samp_rate,
             tune_jitter_hz,
@@ -206,6 +613,7 @@ class grscan(gr.top_block):
             dc_block_long,
             correct_iq,
             scaling,
+            fused_db,
             db_clamp_floor,
             db_clamp_ceil,
             fft_dir,
@@ -215,30 +623,36 @@ class grscan(gr.top_block):
             rotate_secs,
             peak_fft_range,
         )
-        fft_zmq_block_addr = f"tcp://{fft_zmq_addr}:{fft_zmq_port}"
-        self.pduzmq_block = pduzmq(fft_zmq_block_addr)
-        logging.info("serving FFT on %s", fft_zmq_block_addr)
-
-        if iq_zmq_port:
-            iq_zmq_block_addr = f"tcp://{iq_zmq_addr}:{iq_zmq_port}"
-            logging.info("serving I/Q samples and tags on %s", iq_zmq_block_addr)
-            iq_zmq_block = zeromq.pub_sink(
-                gr.sizeof_gr_complex,
-                fft_batch_size * nfft,
-                iq_zmq_block_addr,
-                100,
-                True,
-                65536,
-                "",
-            )
-            self.connect((self.sample_block, 0), (iq_zmq_block, 0))
+        retune_args = {
+            "fft_batch_size": fft_batch_size,
+            "nfft": nfft,
+            "samp_rate": samp_rate,
+            "tune_jitter_hz": tune_jitter_hz,
+            "freq_start": freq_start,
+            "freq_end": freq_end,
+            "tune_step_hz": tune_step_hz,
+            "tune_step_fft": tune_step_fft,
+            "skip_tune_step": skip_tune_step,
+            "tuning_ranges": tuning_ranges,
+            "pretune": pretune,
+            "low_power_hold_down": low_power_hold_down,
+            "slew_rx_time": slew_rx_time,
+            "db_clamp_floor": db_clamp_floor,
+            "db_clamp_ceil": db_clamp_ceil,
+            "fft_dir": fft_dir,
+            "write_samples": write_samples,
+            "bucket_range": bucket_range,
+            "description": description,
+            "rotate_secs": rotate_secs,
+            "peak_fft_range": peak_fft_range,
+        }
 
-        self.samples_blocks = []
-        self.write_samples_block = None
+        samples_blocks = []
+        write_samples_block = None
         if write_samples:
             Path(sample_dir).mkdir(parents=True, exist_ok=True)
             samples_vlen = fft_batch_size * nfft
-            self.samples_blocks.extend(
+            samples_blocks.extend(
                 [
                     # blocks.vector_to_stream(
                     #    gr.sizeof_gr_complex, fft_batch_size * nfft
@@ -264,23 +678,14 @@ class grscan(gr.top_block):
                     ),
                 ]
             )
-            self.write_samples_block = self.samples_blocks[-1]
+            write_samples_block = samples_blocks[-1]
 
-        self.inference_blocks = []
-        self.inference_output_block = None
-        self.image_inference_block = None
-        self.iq_inference_block = None
-
-        if inference_output_dir:
-            Path(inference_output_dir).mkdir(parents=True, exist_ok=True)
+        inference_blocks = []
+        image_inference_block = None
+        iq_inference_block = None
 
         if (inference_model_server and inference_model_name) or inference_output_dir:
-            if inference_text_color:
-                wc = webcolors.name_to_rgb(inference_text_color, "css3")
-                inference_text_color = ",".join(
-                    [str(c) for c in [wc.blue, wc.green, wc.red]]
-                )
-            self.image_inference_block = self.iqtlabs.image_inference(
+            image_inference_block = self.iqtlabs.image_inference(
                 tag="rx_freq",
                 vlen=nfft,
                 x=640,
@@ -297,17 +702,17 @@ class grscan(gr.top_block):
                 model_server=inference_model_server,
                 model_names=inference_model_name,
                 confidence=inference_min_confidence,
-                max_rows=tune_step_fft,
+                max_rows=tune_step_fft // self.fft_average,
                 rotate_secs=rotate_secs,
                 n_image=n_image,
                 n_inference=n_inference,
                 samp_rate=int(samp_rate),
                 text_color=inference_text_color,
             )
-            self.inference_blocks.append(self.image_inference_block)
+            inference_blocks.append(image_inference_block)
 
         if iq_inference_model_server and iq_inference_model_name:
-            self.iq_inference_block = iqtlabs.iq_inference(
+            iq_inference_block = self.iqtlabs.iq_inference(
                 tag="rx_freq",
                 vlen=nfft,
                 n_vlen=1,
@@ -322,69 +727,280 @@ class grscan(gr.top_block):
                 background=iq_inference_background,
                 batch=inference_batch,
             )
-            self.inference_blocks.append(self.iq_inference_block)
-            if self.write_samples_block:
+            inference_blocks.append(iq_inference_block)
+            if write_samples_block:
                 self.msg_connect(
-                    (self.iq_inference_block, "inference"),
-                    (self.write_samples_block, "inference"),
+                    (iq_inference_block, "inference"),
+                    (write_samples_block, "inference"),
                 )
 
-        # TODO: provide new block that receives JSON-over-PMT and outputs to MQTT/zmq.
-        if self.inference_blocks:
-            inference_zmq_addr = f"tcp://{inference_addr}:{inference_port}"
-            self.inference_output_block = inferenceoutput(
-                "inferencemqtt",
-                inference_zmq_addr,
-                mqtt_server,
-                compass,
-                gps_server,
-                use_external_gps,
-                use_external_heading,
-                external_gps_server,
-                external_gps_server_port,
-                inference_output_dir,
-            )
-            if self.iq_inference_block:
-                iq_inference_blocks = [self.iq_inference_block]
-                if iq_inference_squelch_db is not None:
-                    iq_inference_blocks = (
-                        self.wrap_batch(
-                            [
-                                analog.pwr_squelch_cc(
-                                    iq_inference_squelch_db,
-                                    iq_inference_squelch_alpha,
-                                    0,
-                                    False,
-                                )
-                            ],
-                            fft_batch_size,
-                            nfft,
-                        )
-                        + iq_inference_blocks
+        if iq_inference_block:
+            iq_inference_blocks = [iq_inference_block]
+            if iq_inference_squelch_db is not None:
+                iq_inference_blocks = [
+                    batch_pwr_squelch(
+                        fft_batch_size * nfft,
+                        iq_inference_squelch_db,
+                        iq_inference_squelch_alpha,
                     )
-                self.connect_blocks(self.sample_block, iq_inference_blocks)
-                self.connect((self.db_block, 0), (self.iq_inference_block, 1))
-            if self.image_inference_block:
-                if stare:
-                    self.connect((self.db_block, 0), (self.image_inference_block, 0))
-                else:
-                    # need to pass samples through retune_fft if using image inference
-                    self.connect((self.retune_fft, 0), (self.image_inference_block, 0))
-            for block in self.inference_blocks:
-                self.msg_connect(
-                    (block, "inference"), (self.inference_output_block, "inference")
-                )
+                ] + iq_inference_blocks
+            self.connect_blocks(sample_block, iq_inference_blocks)
+            self.connect((db_block, 0), (iq_inference_block, 1))
+            roles["inference"] = iq_inference_blocks[:-1]
+        if image_inference_block:
+            if stare:
+                self.connect((db_block, 0), (image_inference_block, 0))
+            else:
+                # need to pass samples through retune_fft if using image inference
+                self.connect((retune_fft, 0), (image_inference_block, 0))
 
         if pretune:
-            self.msg_connect((self.retune_pre_fft, "tune"), (self.sources[0], cmd_port))
-            self.msg_connect((self.retune_pre_fft, "tune"), (self.retune_fft, "cmd"))
-        else:
-            self.msg_connect((self.retune_fft, "tune"), (self.sources[0], cmd_port))
-        self.msg_connect((self.retune_fft, "json"), (self.pduzmq_block, "json"))
+            self.msg_connect((retune_pre_fft, "tune"), (retune_fft, "cmd"))
+        self.msg_connect(
+            (retune_fft, "json"),
+            (self.pduzmq_block, scanner_port("json", scanner)),
+        )
+
+        self.connect_blocks(sample_block, samples_blocks)
+        roles["samples"] = samples_blocks
+        roles["inference"] = roles.get("inference", []) + inference_blocks
+
+        return SimpleNamespace(
+            scanner=scanner,
+            sdr=sdr,
+            samp_rate=samp_rate,
+            source_args=source_args,
+            sources=[],
+            cmd_port=None,
+            workaround_start_hook=None,
+            freq_end=freq_end,
+            stare=stare,
+            tune_step_fft=tune_step_fft,
+            retune_pre_fft=retune_pre_fft,
+            retune_fft=retune_fft,
+            db_block=db_block,
+            sample_block=sample_block,
+            pipeline_blocks=pipeline_blocks,
+            retune_args=retune_args,
+            samples_blocks=samples_blocks,
+            write_samples_block=write_samples_block,
+            image_inference_block=image_inference_block,
+            iq_inference_block=iq_inference_block,
+            inference_blocks=inference_blocks,
+            roles=roles,
+        )
 
-        self.connect_blocks(self.sources[0], self.sources[1:])
-        self.connect_blocks(self.sources[-1], self.pipeline_blocks)
-        self.connect_blocks(self.sample_block, self.samples_blocks)
+    def get_scan_range(
+        self,
+        freq_start,
+        freq_end,
+        samp_rate,
+        nfft,
+        tuneoverlap,
+        sweep_sec,
+        tune_dwell_ms,
+        tune_step_fft,
+    ):
+        tune_step_hz = int(samp_rate * tuneoverlap)
+        stare = False
+        initial_freq = freq_start
+
+        if freq_end == 0:
+            stare = True
+            freq_end = freq_start + (tune_step_hz - 1)
+            initial_freq += int((freq_end - freq_start) / 2)
+            logging.info(
+                f"using stare mode, scan from {freq_start/1e6}MHz to {freq_end/1e6}MHz"
+            )
+
+        logging.info(f"will scan from {freq_start} to {freq_end}")
+        freq_range = freq_end - freq_start
+        fft_rate = int(samp_rate / nfft)
+        tune_step_fft = get_tune_step_fft(
+            freq_range,
+            samp_rate,
+            nfft,
+            tune_step_hz,
+            sweep_sec,
+            tune_dwell_ms,
+            tune_step_fft,
+        )
+        if self.fft_average > 1:
+            tune_step_fft = max(
+                self.fft_average,
+                int(tune_step_fft / self.fft_average) * self.fft_average,
+            )
+        tune_dwell_ms = tune_step_fft / fft_rate * 1e3
+        logging.info(
+            f"requested retuning across {freq_range/1e6}MHz every {tune_step_fft} FFTs, dwell time {tune_dwell_ms}ms"
+        )
+        if stare and tune_dwell_ms > 1e3:
+            logging.warn(">1s dwell time in stare mode, updates will be slow!")
+        return freq_end, initial_freq, stare, tune_step_hz, tune_step_fft
+
+    def connect(self, *args):
+        # Record edges so blocks can be replaced while running (see replace_block()).
+        super().connect(*args)
+        self.edges.append(args)
+
+    def msg_connect(self, *args):
+        super().msg_connect(*args)
+        self.msg_edges.append(args)
+
+    def replace_block(self, old_block, new_block):
+        def replace_endpoint(endpoint):
+            if endpoint[0] is old_block:
+                return (new_block, endpoint[1])
+            return endpoint
+
+        for edges, disconnect, connect in (
+            (self.edges, self.disconnect, super().connect),
+            (self.msg_edges, self.msg_disconnect, super().msg_connect),
+        ):
+            for i, (src, dst) in enumerate(edges):
+                if src[0] is not old_block and dst[0] is not old_block:
+                    continue
+                disconnect(src, dst)
+                edges[i] = (replace_endpoint(src), replace_endpoint(dst))
+                connect(*edges[i])
+        for radio in [self] + self.radios:
+            radio.pipeline_blocks[:] = [
+                new_block if block is old_block else block
+                for block in radio.pipeline_blocks
+            ]
+            for attr in ("retune_pre_fft", "retune_fft", "db_block", "sample_block"):
+                if getattr(radio, attr) is old_block:
+                    setattr(radio, attr, new_block)
+
+    def live_reconf(
+        self,
+        changed,
+        description,
+        freq_end,
+        freq_start,
+        igain,
+        nfft,
+        samp_rate,
+        sweep_sec,
+        tune_dwell_ms,
+        tune_step_fft,
+        tuneoverlap,
+        tuning_ranges,
+        **_scan_args,
+    ):
+        """Apply option changes to the running flowgraph without rebuilding it.
+
+        Returns False if the changes require a rebuild.
+        """
+        if len(self.radios) > 1:
+            return False
+        if description:
+            description = description.strip('"')
+        (
+            freq_end,
+            _initial_freq,
+            stare,
+            tune_step_hz,
+            tune_step_fft,
+        ) = self.get_scan_range(
+            freq_start,
+            freq_end,
+            samp_rate,
+            nfft,
+            tuneoverlap,
+            sweep_sec,
+            tune_dwell_ms,
+            tune_step_fft,
+        )
+        if stare or self.stare:
+            # stare mode centers the SDR, and feeds image inference from the db block.
+            return False
+        if tune_step_fft != self.tune_step_fft and (
+            self.inference_blocks or self.sdr.startswith("file:")
+        ):
+            return False
+        if self.write_samples_block and (
+            "description" in changed or "igain" in changed
+        ):
+            return False
+
+        if "igain" in changed:
+            self.sources[0]._post(
+                pmt.intern(self.cmd_port), pmt.to_pmt({"gain": float(igain)})
+            )
+
+        retune_args = dict(self.retune_args)
+        retune_args.update(
+            {
+                "freq_start": freq_start,
+                "freq_end": freq_end,
+                "tune_step_hz": tune_step_hz,
+                "tune_step_fft": tune_step_fft,
+                "tuning_ranges": tuning_ranges,
+                "description": description,
+                "peak_fft_range": min(self.peak_fft_range, tune_step_fft),
+            }
+        )
+        if retune_args == self.retune_args:
+            return True
+
+        self.lock()
+        try:
+            if retune_args["pretune"]:
+                self.replace_block(
+                    self.retune_pre_fft,
+                    self.get_pretune_block(
+                        retune_args["fft_batch_size"],
+                        retune_args["nfft"],
+                        retune_args["samp_rate"],
+                        retune_args["tune_jitter_hz"],
+                        retune_args["freq_start"],
+                        retune_args["freq_end"],
+                        retune_args["tune_step_hz"],
+                        retune_args["tune_step_fft"],
+                        retune_args["skip_tune_step"],
+                        retune_args["tuning_ranges"],
+                        retune_args["pretune"],
+                        retune_args["low_power_hold_down"],
+                        retune_args["slew_rx_time"],
+                    ),
+                )
+            self.replace_block(
+                self.retune_fft,
+                self.get_retune_fft_block(
+                    retune_args["nfft"],
+                    retune_args["samp_rate"],
+                    retune_args["tune_jitter_hz"],
+                    retune_args["freq_start"],
+                    retune_args["freq_end"],
+                    retune_args["tune_step_hz"],
+                    retune_args["tune_step_fft"],
+                    retune_args["skip_tune_step"],
+                    retune_args["tuning_ranges"],
+                    retune_args["pretune"],
+                    retune_args["low_power_hold_down"],
+                    retune_args["slew_rx_time"],
+                    retune_args["db_clamp_floor"],
+                    retune_args["db_clamp_ceil"],
+                    retune_args["fft_dir"],
+                    retune_args["write_samples"],
+                    retune_args["bucket_range"],
+                    retune_args["description"],
+                    retune_args["rotate_secs"],
+                    retune_args["peak_fft_range"],
+                ),
+            )
+            apply_cpu_plan(self.cpu_plan, {"retune": [self.retune_fft]})
+            if retune_args["pretune"]:
+                apply_cpu_plan(self.cpu_plan, {"retune": [self.retune_pre_fft]})
+        finally:
+            self.unlock()
+        self.retune_args = retune_args
+        self.freq_start = freq_start
+        self.freq_end = freq_end
+        self.sweep_sec = sweep_sec
+        self.tune_step_fft = tune_step_fft
+        return True
 
     def connect_blocks(self, source, other_blocks, last_block_port=0):
         last_block = source
@@ -392,15 +1008,36 @@ class grscan(gr.top_block):
             self.connect((last_block, last_block_port), (block, 0))
             last_block = block
 
-    def get_db_blocks(self, nfft, samp_rate, scaling):
+    def get_db_blocks(
+        self, nfft, samp_rate, scaling, fused_db, db_clamp_floor, db_clamp_ceil
+    ):
         if scaling == "density":
             scale = 1.0 / (samp_rate * sum(([x**2 for x in self.get_window(nfft)])))
         elif scaling == "spectrum":
             scale = 1.0 / (sum(self.get_window(nfft)) ** 2)
         else:
             raise ValueError("scaling must be 'spectrum' or 'density'")
-        return [
-            blocks.complex_to_mag_squared(nfft),
+        average_blocks = []
+        if self.fft_average > 1:
+            logging.info(
+                "using %s of %u FFTs", self.fft_average_method, self.fft_average
+            )
+            average_blocks = [
+                fftaverage(nfft, self.fft_average, self.fft_average_method)
+            ]
+        if fused_db:
+            return average_blocks + [
+                db(
+                    nfft,
+                    scale,
+                    db_clamp_floor,
+                    db_clamp_ceil,
+                    power_input=bool(average_blocks),
+                )
+            ]
+        if not average_blocks:
+            average_blocks = [blocks.complex_to_mag_squared(nfft)]
+        return average_blocks + [
             blocks.multiply_const_ff(scale, nfft),
             blocks.nlog10_ff(10, nfft, 0),
         ]
@@ -447,6 +1084,58 @@ class grscan(gr.top_block):
             block = blocks.stream_to_vector(gr.sizeof_gr_complex, fft_batch_size * nfft)
         return block
 
+    def get_retune_fft_block(
+        self,
+        nfft,
+        samp_rate,
+        tune_jitter_hz,
+        freq_start,
+        freq_end,
+        tune_step_hz,
+        tune_step_fft,
+        skip_tune_step,
+        tuning_ranges,
+        pretune,
+        low_power_hold_down,
+        slew_rx_time,
+        db_clamp_floor,
+        db_clamp_ceil,
+        fft_dir,
+        write_samples,
+        bucket_range,
+        description,
+        rotate_secs,
+        peak_fft_range,
+    ):
+        # retune_fft counts averaged FFTs.
+        tune_step_fft //= self.fft_average
+        skip_tune_step //= self.fft_average
+        peak_fft_range //= self.fft_average
+        return self.iqtlabs.retune_fft(
+            tag="rx_freq",
+            nfft=nfft,
+            samp_rate=int(samp_rate),
+            tune_jitter_hz=int(tune_jitter_hz),
+            freq_start=int(freq_start),
+            freq_end=int(freq_end),
+            tune_step_hz=tune_step_hz,
+            tune_step_fft=tune_step_fft,
+            skip_tune_step_fft=skip_tune_step,
+            fft_min=db_clamp_floor,
+            fft_max=db_clamp_ceil,
+            sdir=fft_dir,
+            write_step_fft=write_samples,
+            bucket_range=bucket_range,
+            tuning_ranges=tuning_ranges,
+            description=description,
+            rotate_secs=rotate_secs,
+            pre_fft=pretune,
+            tag_now=self.tag_now,
+            low_power_hold_down=(not pretune and low_power_hold_down),
+            slew_rx_time=slew_rx_time,
+            peak_fft_range=peak_fft_range,
+        )
+
     def apply_window(self, nfft, fft_batch_size):
         window_constants = [val for val in self.get_window(nfft) for _ in range(2)]
         return blocks.multiply_const_vff(window_constants * fft_batch_size)
@@ -463,6 +1152,19 @@ class grscan(gr.top_block):
         if self.wavelearner:
             fft_block = self.wavelearner.fft(int(fft_batch_size * nfft), nfft, True)
             fft_roll = True
+        elif self.cpufft:
+            # cpufft fuses the window and transforms the whole batch.
+            fft_block = cpufft(
+                fft_batch_size, nfft, self.get_window(nfft), self.cpufft_workers
+            )
+            fft_block.set_thread_priority(99)
+            fft_block.set_processor_affinity([fft_processor_affinity])
+            fft_blocks = [fft_block]
+            if fft_batch_size > 1:
+                fft_blocks.append(
+                    blocks.vector_to_stream(gr.sizeof_gr_complex * nfft, fft_batch_size)
+                )
+            return fft_batch_size, fft_blocks
         elif vkfft:
             # VkFFT handles batches by using set_multiple_output(), so we do not need
             # to wrap it.
@@ -489,35 +1191,21 @@ class grscan(gr.top_block):
             fft_blocks.append(self.iqtlabs.vector_roll(nfft))
         return fft_batch_size, fft_blocks
 
-    def wrap_batch(self, wrap_blocks, fft_batch_size, nfft):
-        # We prefer to deal with vector batches for efficiency, but some blocks
-        # handle only single items. Wrap single-item blocks for batch compatibility
-        # for now until batch-friendly blocks are available.
-        return (
-            [blocks.vector_to_stream(gr.sizeof_gr_complex, fft_batch_size * nfft)]
-            + wrap_blocks
-            + [blocks.stream_to_vector(gr.sizeof_gr_complex, fft_batch_size * nfft)]
-        )
-
     def get_dc_blocks(
         self, correct_iq, dc_block_len, dc_block_long, fft_batch_size, nfft
     ):
         dc_blocks = []
         if correct_iq:
             logging.info("using correct I/Q")
-            dc_blocks.append(blocks.correctiq())
+            dc_blocks.append(batch_correctiq(fft_batch_size * nfft))
         if dc_block_len:
             logging.info(
                 "using DC block length %u long %s", dc_block_len, dc_block_long
             )
-            dc_blocks.append(grfilter.dc_blocker_cc(dc_block_len, dc_block_long))
-        if dc_blocks:
-            return self.wrap_batch(
-                dc_blocks,
-                fft_batch_size,
-                nfft,
+            dc_blocks.append(
+                batch_dc_blocker(fft_batch_size * nfft, dc_block_len, dc_block_long)
             )
-        return []
+        return dc_blocks
 
     def get_pipeline_blocks(
         self,
@@ -540,6 +1228,7 @@ class grscan(gr.top_block):
         dc_block_long,
         correct_iq,
         scaling,
+        fused_db,
         db_clamp_floor,
         db_clamp_ceil,
         fft_dir,
@@ -570,39 +1259,42 @@ class grscan(gr.top_block):
             low_power_hold_down,
             slew_rx_time,
         )
-        retune_fft = self.iqtlabs.retune_fft(
-            tag="rx_freq",
-            nfft=nfft,
-            samp_rate=int(samp_rate),
-            tune_jitter_hz=int(tune_jitter_hz),
-            freq_start=int(freq_start),
-            freq_end=int(freq_end),
-            tune_step_hz=tune_step_hz,
-            tune_step_fft=tune_step_fft,
-            skip_tune_step_fft=skip_tune_step,
-            fft_min=db_clamp_floor,
-            fft_max=db_clamp_ceil,
-            sdir=fft_dir,
-            write_step_fft=write_samples,
-            bucket_range=bucket_range,
-            tuning_ranges=tuning_ranges,
-            description=description,
-            rotate_secs=rotate_secs,
-            pre_fft=pretune,
-            tag_now=self.tag_now,
-            low_power_hold_down=(not pretune and low_power_hold_down),
-            slew_rx_time=slew_rx_time,
-            peak_fft_range=peak_fft_range,
+        retune_fft = self.get_retune_fft_block(
+            nfft,
+            samp_rate,
+            tune_jitter_hz,
+            freq_start,
+            freq_end,
+            tune_step_hz,
+            tune_step_fft,
+            skip_tune_step,
+            tuning_ranges,
+            pretune,
+            low_power_hold_down,
+            slew_rx_time,
+            db_clamp_floor,
+            db_clamp_ceil,
+            fft_dir,
+            write_samples,
+            bucket_range,
+            description,
+            rotate_secs,
+            peak_fft_range,
         )
-        sample_blocks = [retune_pre_fft] + self.get_dc_blocks(
+        dc_blocks = self.get_dc_blocks(
             correct_iq, dc_block_len, dc_block_long, fft_batch_size, nfft
         )
-        pipeline_blocks = (
-            sample_blocks
-            + fft_blocks
-            + self.get_db_blocks(nfft, samp_rate, scaling)
-            + [retune_fft]
+        db_blocks = self.get_db_blocks(
+            nfft, samp_rate, scaling, fused_db, db_clamp_floor, db_clamp_ceil
         )
+        sample_blocks = [retune_pre_fft] + dc_blocks
+        pipeline_blocks = sample_blocks + fft_blocks + db_blocks + [retune_fft]
+        pipeline_roles = {
+            "retune": [retune_pre_fft, retune_fft],
+            "dc": dc_blocks,
+            "fft": fft_blocks,
+            "db": db_blocks,
+        }
         return (
             fft_batch_size,
             retune_pre_fft,
@@ -610,11 +1302,27 @@ class grscan(gr.top_block):
             pipeline_blocks[-1],
             sample_blocks[-1],
             pipeline_blocks,
+            pipeline_roles,
         )
 
+    def perf_blocks(self):
+        blocks = {}
+        for radio in self.radios:
+            prefix = ""
+            if radio.scanner:
+                prefix = f"{radio.scanner}_"
+            for i, block in enumerate(radio.pipeline_blocks):
+                blocks[f"{prefix}pipeline{i}_{block.name()}"] = block
+            for i, block in enumerate(radio.inference_blocks):
+                blocks[f"{prefix}inference{i}_{block.name()}"] = block
+            if radio.write_samples_block:
+                blocks[f"{prefix}write_samples"] = radio.write_samples_block
+        return blocks
+
     def start(self):
         super().start()
-        self.workaround_start_hook(self)
+        for radio in self.radios:
+            radio.workaround_start_hook(radio)
         logging.info("raw edge and message edge lists follow")
         logging.info(self.edge_list())
         logging.info(self.msg_edge_list())
@@ -159,6 +159,7 @@ def get_source(
     soapy_lib=soapy,
     uhd_lib=uhd,
     dc_ettus_auto_offset=True,
+    throttle=True,
 ):
     logging.info(
         f"initializing SDR {sdr} with sample rate {samp_rate}, gain {gain}, agc {agc}"
@@ -179,10 +180,9 @@ def get_source(
     elif sdr == "tuneable_test_source":
         freq_divisor = 1e9
         cmd_port = "cmd"
-        sources = [
-            iqtlabs.tuneable_test_source(0, freq_divisor),
-            get_throttle(samp_rate, nfft),
-        ]
+        sources = [iqtlabs.tuneable_test_source(0, freq_divisor)]
+        if throttle:
+            sources.append(get_throttle(samp_rate, nfft))
     elif sdr == "ettus":
         sources = get_ettus_source(
             sdrargs, samp_rate, center_freq, agc, gain, uhd_lib, dc_ettus_auto_offset
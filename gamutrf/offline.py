@@ -2,37 +2,79 @@
 import glob
 import os
 import logging
+import shutil
+import time
+from argparse import BooleanOptionalAction
 
 from gnuradio import iqtlabs
-from gamutrf.scan import argument_parser, DYNAMIC_EXCLUDE_OPTIONS
+from gamutrf.scan import argument_parser, DYNAMIC_EXCLUDE_OPTIONS, IMPORT_START
 from gamutrf.grscan import grscan
+from gamutrf.startup_profile import StartupProfile
+from gamutrf.offline_cache import OfflineCache, cache_key, move_outputs, run_dir
 from gamutrf.sample_reader import get_samples
 
+OFFLINE_OPTIONS = ["filename", "offline_cache"]
+
 
 def main():
     logging.basicConfig(level=logging.DEBUG, format="%(asctime)s %(message)s")
     parser = argument_parser()
     parser.add_argument("filename", type=str, help="Recording filename (or glob)")
+    parser.add_argument(
+        "--offline-cache",
+        dest="offline_cache",
+        default=True,
+        action=BooleanOptionalAction,
+        help="skip recordings already processed with the same options",
+    )
     options = parser.parse_args()
     outputs = 0
+    skipped = 0
+    options_args = {
+        k: getattr(options, k)
+        for k in dir(options)
+        if not k.startswith("_")
+        and k not in OFFLINE_OPTIONS
+        and k not in DYNAMIC_EXCLUDE_OPTIONS
+    }
+    startup_profile = StartupProfile(
+        enabled=options.profile_startup, start=IMPORT_START
+    )
+    startup_profile.add("imports and options", time.perf_counter() - IMPORT_START)
     for filename in glob.glob(options.filename):
         out_dir = os.path.dirname(filename)
         if out_dir == "":
             out_dir = "."
-        _data_filename, _samples, meta = get_samples(filename)
+        cache = None
+        key = None
+        if options.offline_cache:
+            cache = OfflineCache(out_dir)
+            key = cache_key(filename, options_args)
+            if cache.lookup(key) is not None:
+                logging.info("%s already processed, skipping", filename)
+                skipped += 1
+                continue
+        with startup_profile.stage("read recording metadata"):
+            _data_filename, _samples, meta = get_samples(filename, read_samples=False)
         freq_start = int(meta["center_frequency"] - (meta["sample_rate"] / 2))
-        scan_args = {
-            k: getattr(options, k)
-            for k in dir(options)
-            if not k.startswith("_")
-            and k != "filename"
-            and k not in DYNAMIC_EXCLUDE_OPTIONS
-        }
+        scan_args = dict(options_args)
         for override_dir in ("inference_output_dir", "sample_dir"):
             override_val = getattr(options, override_dir)
             if not override_val:
                 override_val = out_dir
             scan_args[override_dir] = override_val
+        run_dirs = {}
+        if cache is not None:
+            # a cached run writes to its own directories, so that only its
+            # outputs are recorded. They are moved to the output directory
+            # when it completes.
+            for override_dir in ("inference_output_dir", "sample_dir"):
+                output_dir = scan_args[override_dir]
+                run_dirs[output_dir] = run_dir(output_dir, filename, key)
+                scan_args[override_dir] = run_dirs[output_dir]
+            for run_output_dir in run_dirs.values():
+                shutil.rmtree(run_output_dir, ignore_errors=True)
+                os.makedirs(run_output_dir)
         scan_args.update(
             {
                 "iqtlabs": iqtlabs,
@@ -46,9 +88,24 @@ def main():
                 "iq_inference_background": False,
             }
         )
-        tb = grscan(**scan_args)
-        tb.start()
+        with startup_profile.stage("build flowgraph"):
+            tb = grscan(startup_profile=startup_profile, **scan_args)
+        with startup_profile.stage("start flowgraph"):
+            tb.start()
+        if startup_profile.enabled:
+            print(startup_profile.report())
+            startup_profile = StartupProfile(enabled=True)
         tb.wait()
         tb.stop()
         outputs += 1
-    logging.info("%u filenames processed from %s", outputs, options.filename)
+        if cache is not None:
+            run_outputs = []
+            for output_dir, run_output_dir in sorted(run_dirs.items()):
+                run_outputs.extend(move_outputs(run_output_dir, output_dir))
+            cache.record(key, filename, sorted(run_outputs))
+    logging.info(
+        "%u filenames processed (%u already processed) from %s",
+        outputs,
+        skipped,
+        options.filename,
+    )
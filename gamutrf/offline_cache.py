@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+MANIFEST_FILE = ".gamutrf-offline-manifest.json"
+HASH_CHUNK_SIZE = 2**20
+
+
+def sigmf_meta_filename(filename):
+    for ext in (".sigmf-meta", ".sigmf-data"):
+        if filename.endswith(ext):
+            return filename[: -len(ext)] + ".sigmf-meta"
+    return None
+
+
+def sigmf_data_filename(filename):
+    for ext in (".sigmf-meta", ".sigmf-data"):
+        if filename.endswith(ext):
+            return filename[: -len(ext)] + ".sigmf-data"
+    return filename
+
+
+def file_sha256(filename):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def recording_key(filename):
+    """Return a content key for a recording.
+
+    If the recording is SigMF and its metadata carries core:sha512, the key is
+    made from the data file's size and mtime plus that hash, which avoids
+    rereading the samples. Otherwise the recording's contents are hashed.
+    """
+    data_filename = sigmf_data_filename(filename)
+    stat = os.stat(data_filename)
+    meta_filename = sigmf_meta_filename(filename)
+    if meta_filename and os.path.exists(meta_filename):
+        with open(meta_filename, encoding="utf8") as f:
+            sha512 = json.load(f).get("global", {}).get("core:sha512", None)
+        if sha512:
+            return ":".join(("sigmf", str(stat.st_size), str(stat.st_mtime_ns), sha512))
+    return ":".join(("sha256", file_sha256(data_filename)))
+
+
+def options_key(scan_args):
+    """Return a canonical hash of scan options (non-JSON values are ignored)."""
+    canonical_args = {}
+    for k, v in scan_args.items():
+        try:
+            json.dumps(v)
+        except TypeError:
+            continue
+        canonical_args[k] = v
+    return hashlib.sha256(
+        json.dumps(canonical_args, sort_keys=True).encode("utf8")
+    ).hexdigest()
+
+
+def cache_key(filename, scan_args):
+    return hashlib.sha256(
+        ":".join((recording_key(filename), options_key(scan_args))).encode("utf8")
+    ).hexdigest()
+
+
+def run_dir(output_dir, filename, key):
+    """Return a directory in output_dir for the outputs of one cached run."""
+    return os.path.join(output_dir, f".{os.path.basename(filename)}.{key[:12]}")
+
+
+def move_outputs(run_output_dir, output_dir):
+    """Move a run's outputs to output_dir, and return their paths."""
+    outputs = []
+    for root, _dirs, files in os.walk(run_output_dir):
+        dest_dir = os.path.join(output_dir, os.path.relpath(root, run_output_dir))
+        os.makedirs(dest_dir, exist_ok=True)
+        for name in files:
+            dest = os.path.join(dest_dir, name)
+            os.replace(os.path.join(root, name), dest)
+            outputs.append(os.path.realpath(dest))
+    shutil.rmtree(run_output_dir)
+    return sorted(outputs)
+
+
+class OfflineCache:
+    """Manifest of offline outputs, keyed by recording and scan options.
+
+    One manifest is kept per directory of recordings. Each entry records the
+    input recording and the outputs it produced, so a rerun with the same
+    options can be skipped while all of those outputs are still present.
+    Each run writes to its own directories (see run_dir()), so only outputs
+    of that run are recorded. Runs that produced no outputs are not recorded.
+    """
+
+    def __init__(self, manifest_dir):
+        self.manifest_path = os.path.join(manifest_dir, MANIFEST_FILE)
+        self.manifest = {}
+        try:
+            with open(self.manifest_path, encoding="utf8") as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            pass
+        except json.decoder.JSONDecodeError as err:
+            logging.error("ignoring invalid manifest %s: %s", self.manifest_path, err)
+
+    def lookup(self, key):
+        entry = self.manifest.get(key, None)
+        if entry is None:
+            return None
+        for output in entry["outputs"]:
+            if not os.path.exists(output):
+                logging.info("%s missing, cache entry invalid", output)
+                return None
+        return entry
+
+    def record(self, key, filename, outputs):
+        if not outputs:
+            logging.info("%s produced no outputs, not cached", filename)
+            return False
+        self.manifest[key] = {
+            "input": os.path.realpath(filename),
+            "outputs": outputs,
+            "ts": time.time(),
+        }
+        tmpfile = self.manifest_path + ".tmp"
+        with open(tmpfile, "w", encoding="utf8") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.rename(tmpfile, self.manifest_path)
+        return True
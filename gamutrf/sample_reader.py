@@ -146,11 +146,17 @@ def get_nosigmf_samples(filename):
     return filename, samples, meta
 
 
-def get_samples(filename):
+def get_samples(filename, read_samples=True):
+    """Return the data filename, samples and metadata of a recording.
+
+    If read_samples is False, only the metadata is read and samples is None.
+    """
     if not os.path.exists(filename):
         raise FileNotFoundError(filename)
     meta_ext = filename.find(".sigmf-meta")
     if meta_ext == -1:
+        if not read_samples:
+            return filename, None, parse_filename(filename)
         return get_nosigmf_samples(filename)
 
     meta = sigmf.sigmffile.fromfile(filename)
@@ -161,7 +167,12 @@ def get_samples(filename):
         raise FileNotFoundError(data_filename)
 
     meta.set_data_file(data_filename)
-    samples = meta.read_samples()
+    samples = None
+    # read_samples() always converts to host cf32.
+    sample_len = np.dtype(np.complex64).itemsize
+    if read_samples:
+        samples = meta.read_samples()
+        sample_len = samples[0].itemsize
     global_meta = meta.get_global_info()
     captures_meta = meta.get_captures()
     center_frequency = None
@@ -196,9 +207,7 @@ def get_samples(filename):
     meta = {
         "sample_rate": global_meta["core:sample_rate"],
         "sample_dtype": global_meta["core:datatype"],
-        "sample_len": samples[
-            0
-        ].itemsize,  # read_samples() always converts to host cf32.
+        "sample_len": sample_len,
         "center_frequency": center_frequency,
         "timestamp": timestamp,
     }
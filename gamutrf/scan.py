@@ -1,6 +1,11 @@
+import time
+
+IMPORT_START = time.perf_counter()
+
 import logging
+import os
 import signal
-import time
+import threading
 import sys
 from argparse import ArgumentParser, BooleanOptionalAction
 
@@ -17,18 +22,54 @@ except ModuleNotFoundError as err:  # pragma: no cover
     )
     sys.exit(1)
 
-from prometheus_client import Gauge
-from prometheus_client import start_http_server
-
-from gamutrf.grscan import grscan
-from gamutrf.flask_handler import FlaskHandler
+from gamutrf.adaptive_sweep import AdaptiveSweep, parse_tuning_ranges
+from gamutrf.autotune import apply_autotune, autotune
+from gamutrf.cpu_plan import CPU_PLAN_ROLES, parse_cpu_plan
+from gamutrf.grfftaverage import FFT_AVERAGE_METHODS
+from gamutrf.grscan import get_radio_specs, grscan
+from gamutrf.startup_profile import NULL_STARTUP_PROFILE, StartupProfile
 from gamutrf.utils import SAMP_RATE, MIN_FREQ, MAX_FREQ
 
+# flask and prometheus_client are imported when needed, so that gamutrf-offline
+# and argument parsing do not pay for them.
+IMPORT_SECS = time.perf_counter() - IMPORT_START
+
 running = True
-DYNAMIC_EXCLUDE_OPTIONS = ["apiport", "promport", "updatetimeout"]
+# Options for the adaptive sweep controller rather than grscan, that can be
+# reconfigured (by rebuilding).
+ADAPTIVE_OPTIONS = [
+    "adaptive_active_db",
+    "adaptive_max_revisit_secs",
+    "adaptive_segments",
+    "adaptive_sweep_secs",
+]
+DYNAMIC_EXCLUDE_OPTIONS = ADAPTIVE_OPTIONS + [
+    "apiport",
+    "autotune",
+    "autotune_cache",
+    "autotune_secs",
+    "promport",
+    "updatetimeout",
+    "perf_sample_secs",
+    "profile_startup",
+    "warm_standby",
+]
+# Options that can be changed without rebuilding the flowgraph (see grscan.live_reconf()).
+LIVE_RECONF_OPTIONS = [
+    "description",
+    "freq_end",
+    "freq_start",
+    "igain",
+    "sweep_sec",
+    "tune_dwell_ms",
+    "tune_step_fft",
+    "tuning_ranges",
+]
 
 
 def init_prom_vars():
+    from prometheus_client import Gauge
+
     prom_vars = {
         "freq_start": Gauge("freq_start", "start of scanning range in Hz"),
         "freq_end": Gauge("freq_end", "end of scanning range in Hz"),
@@ -216,14 +257,21 @@ def argument_parser():
         dest="sdr",
         type=str,
         default="ettus",
-        help="SDR to use (ettus, bladerf, or lime)",
+        help="SDR to use (ettus, bladerf, or lime), or a comma separated list of SDRs to scan with in parallel",
     )
     parser.add_argument(
         "--sdrargs",
         dest="sdrargs",
         type=str,
         default="",
-        help="extra args to pass to SDR driver",
+        help="extra args to pass to SDR driver (separated by ; for each of multiple SDRs)",
+    )
+    parser.add_argument(
+        "--sdr_freq_ranges",
+        dest="sdr_freq_ranges",
+        type=str,
+        default="",
+        help="scan range for each of multiple SDRs, as start-end,start-end (if empty, divide freq_start to freq_end between SDRs)",
     )
     parser.add_argument(
         "--updatetimeout",
@@ -246,6 +294,27 @@ def argument_parser():
         default=0.85,
         help="what proportion of FFT buckets to use",
     )
+    parser.add_argument(
+        "--fft_average",
+        dest="fft_average",
+        type=int,
+        default=1,
+        help="if > 1, average this many FFTs before converting to dB and publishing (requires --pretune, and must divide --fft_batch_size)",
+    )
+    parser.add_argument(
+        "--fft_average_method",
+        dest="fft_average_method",
+        type=str,
+        default="mean",
+        help="FFT average method, one of " + ", ".join(FFT_AVERAGE_METHODS),
+    )
+    parser.add_argument(
+        "--fused_db",
+        dest="fused_db",
+        default=False,
+        action=BooleanOptionalAction,
+        help="compute power in dB with one fused block, instead of separate mag^2, scale and log10 blocks",
+    )
     parser.add_argument(
         "--db_clamp_floor",
         dest="db_clamp_floor",
@@ -364,6 +433,34 @@ def argument_parser():
         default="",
         help="tuning ranges (overriding freq_start and freq_end)",
     )
+    parser.add_argument(
+        "--adaptive_sweep_secs",
+        dest="adaptive_sweep_secs",
+        type=float,
+        default=0,
+        help="if > 0, update tuning ranges every N seconds to sweep active segments more often than quiet ones",
+    )
+    parser.add_argument(
+        "--adaptive_segments",
+        dest="adaptive_segments",
+        type=int,
+        default=16,
+        help="number of segments to divide the scan range into for adaptive sweeping",
+    )
+    parser.add_argument(
+        "--adaptive_active_db",
+        dest="adaptive_active_db",
+        type=float,
+        default=10,
+        help="a segment is active if its peak is this many dB above median power",
+    )
+    parser.add_argument(
+        "--adaptive_max_revisit_secs",
+        dest="adaptive_max_revisit_secs",
+        type=float,
+        default=60,
+        help="maximum time between sweeps of a quiet segment",
+    )
     parser.add_argument(
         "--description",
         dest="description",
@@ -409,7 +506,30 @@ def argument_parser():
         dest="vkfft",
         default=True,
         action=BooleanOptionalAction,
-        help="use VkFFT (ignored if wavelearner available)",
+        help="use VkFFT (ignored if wavelearner available or --cpufft)",
+    )
+    parser.add_argument(
+        "--cpu-plan",
+        dest="cpu_plan",
+        type=str,
+        default="",
+        help="CPU affinity (and optional priority) per flowgraph role, for example source:0,fft:1-2@99,db:3,retune:3,inference:4-7 (roles: "
+        + ", ".join(CPU_PLAN_ROLES)
+        + ")",
+    )
+    parser.add_argument(
+        "--cpufft",
+        dest="cpufft",
+        default=False,
+        action=BooleanOptionalAction,
+        help="use multithreaded CPU FFT (ignored if wavelearner available)",
+    )
+    parser.add_argument(
+        "--cpufft_workers",
+        dest="cpufft_workers",
+        type=int,
+        default=0,
+        help="number of CPU FFT threads (0 is number of CPUs)",
     )
     parser.add_argument(
         "--pretune",
@@ -519,6 +639,48 @@ def argument_parser():
         default=0,
         help="If > 0, find peak of FFT averages over this many rows",
     )
+    parser.add_argument(
+        "--perf_sample_secs",
+        dest="perf_sample_secs",
+        type=float,
+        default=0,
+        help="if > 0, export flowgraph block performance counters to Prometheus every N seconds",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        dest="profile_startup",
+        default=False,
+        action=BooleanOptionalAction,
+        help="print a breakdown of import and flowgraph startup times",
+    )
+    parser.add_argument(
+        "--warm_standby",
+        dest="warm_standby",
+        default=True,
+        action=BooleanOptionalAction,
+        help="when reconfiguring, build the new flowgraph before stopping the old one",
+    )
+    parser.add_argument(
+        "--autotune",
+        dest="autotune",
+        default=False,
+        action=BooleanOptionalAction,
+        help="measure FFT throughput at startup and select FFT engine, fft_batch_size and tune_step_fft",
+    )
+    parser.add_argument(
+        "--autotune_cache",
+        dest="autotune_cache",
+        type=str,
+        default=os.path.expanduser("~/.cache/gamutrf/autotune.json"),
+        help="cache autotune measurements in this file",
+    )
+    parser.add_argument(
+        "--autotune_secs",
+        dest="autotune_secs",
+        type=float,
+        default=2,
+        help="seconds to measure each autotune candidate",
+    )
     return parser
 
 
@@ -546,10 +708,47 @@ def check_options(options):
     if iq_inference and not options.pretune:
         return "I/Q inference requires pretune"
 
+    if options.dc_block_len and options.dc_block_len < 2:
+        return "DC block length must be at least 2"
+
     dc_block = options.dc_block_len or options.correct_iq
     if dc_block and not options.pretune:
         return "DC blocking requires pretune"
 
+    if options.fft_average > 1:
+        if not options.pretune:
+            return "FFT averaging requires pretune"
+        if options.fft_batch_size % options.fft_average:
+            return "FFT average must divide FFT batch size"
+        if options.tune_step_fft % options.fft_average:
+            return "FFT average must divide tune step FFTs"
+        if iq_inference:
+            return "FFT averaging cannot be used with I/Q inference"
+    if options.fft_average_method not in FFT_AVERAGE_METHODS:
+        return "FFT average method must be one of " + ", ".join(FFT_AVERAGE_METHODS)
+
+    if options.adaptive_sweep_secs:
+        if not options.freq_end and not options.tuning_ranges:
+            return "adaptive sweeping requires a scan range"
+        if "," in options.sdr:
+            return "adaptive sweeping requires a single SDR"
+
+    try:
+        parse_cpu_plan(options.cpu_plan)
+    except ValueError as err:
+        return str(err)
+
+    try:
+        get_radio_specs(
+            options.sdr,
+            options.sdrargs,
+            options.freq_start,
+            options.freq_end,
+            options.sdr_freq_ranges,
+        )
+    except ValueError as err:
+        return str(err)
+
     return ""
 
 
@@ -558,7 +757,74 @@ def sig_handler(_sig=None, _frame=None):
     running = False
 
 
-def run_loop(options, prom_vars, wavelearner):
+def set_prom_vars(prom_vars, options):
+    for var in prom_vars.keys():
+        if hasattr(options, var):
+            prom_vars[var].set(getattr(options, var))
+
+
+def get_scan_args(options, wavelearner, tuned_args=None):
+    scan_args = {
+        "iqtlabs": iqtlabs,
+        "wavelearner": wavelearner,
+    }
+    scan_args.update(
+        {
+            k: getattr(options, k)
+            for k in dir(options)
+            if not k.startswith("_") and not k in DYNAMIC_EXCLUDE_OPTIONS
+        }
+    )
+    if tuned_args:
+        scan_args = apply_autotune(scan_args, tuned_args)
+    return scan_args
+
+
+def get_adaptive_sweep(options):
+    if not options.adaptive_sweep_secs:
+        return None
+    freq_ranges = [(options.freq_start, options.freq_end)]
+    if options.tuning_ranges:
+        freq_ranges = parse_tuning_ranges(options.tuning_ranges)
+    return AdaptiveSweep(
+        freq_ranges,
+        options.adaptive_segments,
+        options.adaptive_active_db,
+        options.adaptive_max_revisit_secs,
+        options.adaptive_sweep_secs,
+    )
+
+
+def adaptive_reconf(tb, adaptive_sweep, scan_args, tuning_ranges):
+    new_tuning_ranges = adaptive_sweep.plan()
+    if new_tuning_ranges == tuning_ranges:
+        return tuning_ranges
+    adaptive_args = dict(scan_args)
+    adaptive_args["tuning_ranges"] = new_tuning_ranges
+    if not tb.live_reconf(["tuning_ranges"], **adaptive_args):
+        logging.error("cannot apply adaptive tuning ranges %s", new_tuning_ranges)
+        return tuning_ranges
+    logging.info("adaptive tuning ranges %s", new_tuning_ranges)
+    return new_tuning_ranges
+
+
+def stop_flowgraph(tb, perf_monitor, scan_metrics):
+    if perf_monitor:
+        perf_monitor.set_blocks({})
+    tb.stop()
+    tb.wait()
+    if scan_metrics:
+        scan_metrics.reset_sweeps()
+
+
+def run_loop(
+    options,
+    prom_vars,
+    wavelearner,
+    scan_metrics=None,
+    startup_profile=NULL_STARTUP_PROFILE,
+    tuned_args=None,
+):
     reconfigures = 0
     global running
     running = True
@@ -566,42 +832,133 @@ def run_loop(options, prom_vars, wavelearner):
     signal.signal(signal.SIGINT, sig_handler)
     signal.signal(signal.SIGTERM, sig_handler)
 
-    handler = FlaskHandler(options, check_options, DYNAMIC_EXCLUDE_OPTIONS)
-    handler.start()
+    perf_monitor = None
+    if options.perf_sample_secs > 0:
+        from gamutrf.flowgraph_perf import FlowgraphPerfMonitor
+
+        perf_monitor = FlowgraphPerfMonitor(options.perf_sample_secs)
+        perf_monitor.start()
+
+    tb = None
+    tb_lock = threading.Lock()
+    adaptive_sweep = None
+
+    def live_reconf(new_options, changed):
+        with tb_lock:
+            if tb is None or adaptive_sweep is not None:
+                return False
+            reconf_start = time.time()
+            if not tb.live_reconf(
+                changed, **get_scan_args(new_options, wavelearner, tuned_args)
+            ):
+                return False
+            if scan_metrics:
+                scan_metrics.reconfigured(time.time() - reconf_start, live=True)
+                scan_metrics.set_sweep_sec(new_options.sweep_sec)
+            if perf_monitor:
+                perf_monitor.set_blocks(tb.perf_blocks())
+        set_prom_vars(prom_vars, new_options)
+        logging.info("reconfigured %s without restarting flowgraph", changed)
+        return True
+
+    with startup_profile.stage("start API"):
+        from gamutrf.flask_handler import FlaskHandler
+
+        handler = FlaskHandler(
+            options,
+            check_options,
+            [k for k in DYNAMIC_EXCLUDE_OPTIONS if k not in ADAPTIVE_OPTIONS],
+            live_options=LIVE_RECONF_OPTIONS,
+            live_reconf=live_reconf,
+        )
+        handler.start()
 
+    downtime_start = None
     while running:
-        for var in prom_vars.keys():
-            if hasattr(handler.options, var):
-                prom_vars[var].set(getattr(handler.options, var))
-        scan_args = {
-            "iqtlabs": iqtlabs,
-            "wavelearner": wavelearner,
-        }
-        scan_args.update(
-            {
-                k: getattr(handler.options, k)
-                for k in dir(handler.options)
-                if not k.startswith("_") and not k in DYNAMIC_EXCLUDE_OPTIONS
-            }
-        )
-        tb = grscan(**scan_args)
-        tb.start()
+        set_prom_vars(prom_vars, handler.options)
+        scan_args = get_scan_args(handler.options, wavelearner, tuned_args)
+        if scan_metrics:
+            scan_metrics.set_sweep_sec(handler.options.sweep_sec)
+            scan_args["scan_metrics"] = scan_metrics
+        adaptive_sweep = get_adaptive_sweep(handler.options)
+        if adaptive_sweep:
+            scan_args["record_callback"] = adaptive_sweep.update_record
+        tuning_ranges = scan_args["tuning_ranges"]
+        standby = tb is not None and handler.options.warm_standby
+        if standby:
+            # build the new flowgraph while the old one is still scanning.
+            new_tb = grscan(standby=True, **scan_args)
+        with tb_lock:
+            if tb is not None:
+                downtime_start = time.time()
+                stop_flowgraph(tb, perf_monitor, scan_metrics)
+                tb = None
+            if standby:
+                new_tb.attach()
+            else:
+                with startup_profile.stage("build flowgraph"):
+                    new_tb = grscan(startup_profile=startup_profile, **scan_args)
+            tb = new_tb
+            new_tb = None
+            with startup_profile.stage("start flowgraph"):
+                tb.start()
+        if startup_profile.enabled:
+            print(startup_profile.report())
+            startup_profile = NULL_STARTUP_PROFILE
+        if downtime_start is not None:
+            downtime = time.time() - downtime_start
+            logging.info(
+                "flowgraph rebuilt with %.3fs downtime (warm standby %s)",
+                downtime,
+                standby,
+            )
+            if scan_metrics:
+                scan_metrics.reconfigured(downtime)
+            handler.rebuilt(reconfigures, downtime)
+        if perf_monitor:
+            perf_monitor.set_blocks(tb.perf_blocks())
+        last_adaptive = time.time()
         while running and reconfigures == handler.reconfigures:
             idle_time = 1
             prom_vars["run_timestamp"].set(time.time()),
             time.sleep(idle_time)
+            if scan_metrics:
+                scan_metrics.sample()
+            # handler.options, as the interval can be reconfigured.
+            if (
+                adaptive_sweep
+                and time.time() - last_adaptive >= handler.options.adaptive_sweep_secs
+            ):
+                reconf_start = time.time()
+                with tb_lock:
+                    new_tuning_ranges = adaptive_reconf(
+                        tb, adaptive_sweep, scan_args, tuning_ranges
+                    )
+                    if perf_monitor:
+                        perf_monitor.set_blocks(tb.perf_blocks())
+                if scan_metrics and new_tuning_ranges != tuning_ranges:
+                    scan_metrics.reconfigured(time.time() - reconf_start, live=True)
+                tuning_ranges = new_tuning_ranges
+                last_adaptive = time.time()
 
         while reconfigures != handler.reconfigures:
             reconfigures = handler.reconfigures
 
-        tb.stop()
-        tb.wait()
-        del tb
+    with tb_lock:
+        if tb is not None:
+            stop_flowgraph(tb, perf_monitor, scan_metrics)
+            tb = None
+    if perf_monitor:
+        perf_monitor.stop()
 
 
 def main():
     logging.basicConfig(level=logging.DEBUG, format="%(asctime)s %(message)s")
     options = argument_parser().parse_args()
+    startup_profile = StartupProfile(
+        enabled=options.profile_startup, start=IMPORT_START
+    )
+    startup_profile.add("import gamutrf.scan", IMPORT_SECS)
     if gr.enable_realtime_scheduling() != gr.RT_OK:
         print("Warning: failed to enable real-time scheduling.")
     results = check_options(options)
@@ -609,16 +966,44 @@ def main():
         print(results)
         sys.exit(1)
 
-    wavelearner = None
-    try:
-        import wavelearner as wavelearner_lib  # pytype: disable=import-error
-
-        wavelearner = wavelearner_lib
-        print("using wavelearner")
-    except ModuleNotFoundError:
-        print("wavelearner not available")
+    if options.perf_sample_secs > 0:
+        from gamutrf.flowgraph_perf import enable_perf_counters
 
-    prom_vars = init_prom_vars()
-    start_http_server(options.promport)
+        enable_perf_counters()
 
-    run_loop(options, prom_vars, wavelearner)
+    wavelearner = None
+    with startup_profile.stage("import wavelearner"):
+        try:
+            import wavelearner as wavelearner_lib  # pytype: disable=import-error
+
+            wavelearner = wavelearner_lib
+            print("using wavelearner")
+        except ModuleNotFoundError:
+            print("wavelearner not available")
+
+    tuned_args = None
+    if options.autotune:
+        with startup_profile.stage("autotune"):
+            tuned_args = autotune(
+                get_scan_args(options, wavelearner),
+                options.autotune_cache,
+                options.autotune_secs,
+            )
+        wavelearner = tuned_args.pop("wavelearner")
+
+    with startup_profile.stage("start prometheus"):
+        from prometheus_client import start_http_server
+        from gamutrf.scan_metrics import ScanMetrics
+
+        prom_vars = init_prom_vars()
+        scan_metrics = ScanMetrics()
+        start_http_server(options.promport)
+
+    run_loop(
+        options,
+        prom_vars,
+        wavelearner,
+        scan_metrics,
+        startup_profile,
+        tuned_args=tuned_args,
+    )
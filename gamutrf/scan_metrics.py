@@ -0,0 +1,151 @@
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+
+DOWNTIME_BUCKETS = (0.01, 0.1, 0.5, 1, 2, 5, 10, 30)
+
+
+class ScanMetrics:
+    """Throughput metrics for the blocks gamutrf owns and for the scan run loop.
+
+    pduzmq reports each FFT record (fft_record()), inferenceoutput each
+    inference result (inference_item()), and the run loop its reconfigure
+    downtime (reconfigured()) and calls sample() periodically to update rates.
+    Per scanner metrics are labeled with the scanner ("" for a single SDR).
+    """
+
+    def __init__(self, registry=REGISTRY):
+        self.lock = threading.Lock()
+        self.target_sweep_sec = 0
+        self.sweeps = {}
+        self.inference_items = 0
+        self.last_sample = None
+        self.fft_messages = Counter(
+            "gamutrf_fft_messages",
+            "FFT JSON messages published",
+            ["scanner"],
+            registry=registry,
+        )
+        self.fft_bytes = Counter(
+            "gamutrf_fft_bytes",
+            "FFT JSON bytes published, before compression",
+            ["scanner"],
+            registry=registry,
+        )
+        self.fft_compressed_bytes = Counter(
+            "gamutrf_fft_compressed_bytes",
+            "FFT JSON bytes published, after compression",
+            ["scanner"],
+            registry=registry,
+        )
+        self.fft_compression_ratio = Gauge(
+            "gamutrf_fft_compression_ratio",
+            "ratio of FFT JSON bytes before and after compression",
+            ["scanner"],
+            registry=registry,
+        )
+        self.inference_items_total = Counter(
+            "gamutrf_inference_items",
+            "inference results output",
+            registry=registry,
+        )
+        self.inference_items_per_sec = Gauge(
+            "gamutrf_inference_items_per_sec",
+            "inference results output per second since last sample",
+            registry=registry,
+        )
+        self.sweeps_total = Counter(
+            "gamutrf_sweeps",
+            "sweeps completed",
+            ["scanner"],
+            registry=registry,
+        )
+        self.sweep_seconds = Gauge(
+            "gamutrf_sweep_seconds",
+            "duration of last completed sweep",
+            ["scanner"],
+            registry=registry,
+        )
+        self.sweep_time_ratio = Gauge(
+            "gamutrf_sweep_time_ratio",
+            "duration of last completed sweep relative to sweep_sec",
+            ["scanner"],
+            registry=registry,
+        )
+        self.tune_rate = Gauge(
+            "gamutrf_tune_rate_hz",
+            "retunes per second during last completed sweep",
+            ["scanner"],
+            registry=registry,
+        )
+        self.reconfigure_downtime = Histogram(
+            "gamutrf_reconfigure_downtime_seconds",
+            "time the flowgraph was not scanning while being reconfigured",
+            ["live"],
+            buckets=DOWNTIME_BUCKETS,
+            registry=registry,
+        )
+
+    def set_sweep_sec(self, sweep_sec):
+        self.target_sweep_sec = sweep_sec
+
+    def fft_record(self, item_bytes, compressed_bytes, record=None, scanner=None):
+        scanner = scanner or ""
+        self.fft_messages.labels(scanner).inc()
+        self.fft_bytes.labels(scanner).inc(item_bytes)
+        self.fft_compressed_bytes.labels(scanner).inc(compressed_bytes)
+        if compressed_bytes:
+            self.fft_compression_ratio.labels(scanner).set(
+                item_bytes / compressed_bytes
+            )
+        if record is None:
+            return
+        try:
+            sweep_start = float(record["sweep_start"])
+            tune_count = int(record["total_tune_count"])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self.lock:
+            last_sweep = self.sweeps.get(scanner, None)
+            if last_sweep is not None and sweep_start <= last_sweep[0]:
+                # still in the same sweep.
+                return
+            self.sweeps[scanner] = (sweep_start, tune_count)
+        if last_sweep is None:
+            return
+        last_sweep_start, last_tune_count = last_sweep
+        sweep_seconds = sweep_start - last_sweep_start
+        self.sweeps_total.labels(scanner).inc()
+        self.sweep_seconds.labels(scanner).set(sweep_seconds)
+        if self.target_sweep_sec:
+            self.sweep_time_ratio.labels(scanner).set(
+                sweep_seconds / self.target_sweep_sec
+            )
+        if tune_count >= last_tune_count:
+            self.tune_rate.labels(scanner).set(
+                (tune_count - last_tune_count) / sweep_seconds
+            )
+
+    def inference_item(self):
+        self.inference_items_total.inc()
+        with self.lock:
+            self.inference_items += 1
+
+    def reconfigured(self, downtime, live=False):
+        self.reconfigure_downtime.labels(str(live).lower()).observe(downtime)
+
+    def reset_sweeps(self):
+        # the next flowgraph restarts sweep and tune counts.
+        with self.lock:
+            self.sweeps = {}
+
+    def sample(self, now=None):
+        if now is None:
+            now = time.time()
+        with self.lock:
+            inference_items = self.inference_items
+            self.inference_items = 0
+        if self.last_sample is not None and now > self.last_sample:
+            self.inference_items_per_sec.set(inference_items / (now - self.last_sample))
+        self.last_sample = now
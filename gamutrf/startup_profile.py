@@ -0,0 +1,43 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    """Time named startup stages, for --profile-startup.
+
+    A disabled profile records nothing, so callers can always use stage().
+    """
+
+    def __init__(self, enabled=True, start=None):
+        self.enabled = enabled
+        self.start = start
+        if self.start is None:
+            self.start = time.perf_counter()
+        self.stages = []
+
+    def add(self, name, secs):
+        if self.enabled:
+            self.stages.append((name, secs))
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        stage_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - stage_start)
+
+    def report(self):
+        if not self.enabled:
+            return ""
+        width = max([len(name) for name, _ in self.stages] + [len("total")])
+        lines = ["startup profile:"]
+        lines.extend(f"  {name:<{width}} {secs:8.3f}s" for name, secs in self.stages)
+        lines.append(f"  {'total':<{width}} {time.perf_counter() - self.start:8.3f}s")
+        return "\n".join(lines)
+
+
+NULL_STARTUP_PROFILE = StartupProfile(enabled=False)
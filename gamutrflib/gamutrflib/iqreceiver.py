@@ -0,0 +1,262 @@
+"""
+Receive raw I/Q samples and tags from a gamutRF scanner's iq_zmq_port.
+
+Example usage:
+
+    from gamutrflib.iqreceiver import IqReceiver
+    iqr = IqReceiver("127.0.0.1", 10002, vlen=fft_batch_size * nfft)
+
+    for msg in iqr:
+        if msg.dropped:
+            # msg.dropped vectors were not received before this message
+            ...
+        for tag in msg.tags:
+            if tag.key == "rx_freq":
+                # tag.offset is the index into msg.samples where the tag applies
+                ...
+        ...
+
+    iqr.stop()
+
+or, from asyncio:
+
+    iqr = AsyncIqReceiver("127.0.0.1", 10002, vlen=fft_batch_size * nfft)
+    async for msg in iqr:
+        ...
+
+msg.samples is a complex64 numpy array that is a view over the received ZMQ
+message (it is not copied), so it is read only and remains valid as long as the
+array is referenced. The scanner's pub_sink drops messages when a subscriber
+cannot keep up, which is detected from the item offset in each message header.
+
+Messages are decoded without gnuradio (see decode_iq_message() and
+deserialize_pmt()), so gnuradio does not need to be installed.
+"""
+
+import struct
+from collections import namedtuple
+
+import numpy as np
+import zmq
+import zmq.asyncio
+
+# gr-zeromq tag header (gr-zeromq/lib/tag_headers.cc), in host (little endian) order.
+GR_HEADER_MAGIC = 0x5FF0
+GR_HEADER_VERSION = 0x01
+GR_HEADER = struct.Struct("<HBQQ")
+GR_TAG_OFFSET = struct.Struct("<Q")
+
+# pmt serialization tags (gnuradio-runtime/lib/pmt/pmt_serialize.cc), big endian.
+PST_TRUE = 0x00
+PST_FALSE = 0x01
+PST_SYMBOL = 0x02
+PST_INT32 = 0x03
+PST_DOUBLE = 0x04
+PST_COMPLEX = 0x05
+PST_NULL = 0x06
+PST_PAIR = 0x07
+PST_VECTOR = 0x08
+PST_UNIFORM_VECTOR = 0x0A
+PST_UINT64 = 0x0B
+PST_TUPLE = 0x0C
+PST_INT64 = 0x0D
+
+PST_STRUCTS = {
+    PST_INT32: struct.Struct(">i"),
+    PST_DOUBLE: struct.Struct(">d"),
+    PST_COMPLEX: struct.Struct(">dd"),
+    PST_UINT64: struct.Struct(">Q"),
+    PST_INT64: struct.Struct(">q"),
+}
+PST_U8 = struct.Struct(">B")
+PST_U16 = struct.Struct(">H")
+PST_U32 = struct.Struct(">I")
+
+# uniform vector element types, in big endian order.
+UVI_DTYPES = (
+    ">u1",
+    ">i1",
+    ">u2",
+    ">i2",
+    ">u4",
+    ">i4",
+    ">u8",
+    ">i8",
+    ">f4",
+    ">f8",
+    ">c8",
+    ">c16",
+)
+
+IqTag = namedtuple("IqTag", ["offset", "key", "value", "srcid"])
+IqMessage = namedtuple("IqMessage", ["offset", "samples", "tags", "dropped"])
+
+
+def deserialize_pmt(buf, pos=0):
+    """Deserialize a serialized pmt from buf at pos.
+
+    Returns (value, next pos). Symbols are returned as str, pairs as (car, cdr),
+    tuples and vectors as tuples, and uniform vectors as numpy arrays.
+    """
+    pst = buf[pos]
+    pos += 1
+    if pst == PST_TRUE:
+        return True, pos
+    if pst == PST_FALSE:
+        return False, pos
+    if pst == PST_NULL:
+        return None, pos
+    if pst == PST_SYMBOL:
+        (size,) = PST_U16.unpack_from(buf, pos)
+        pos += PST_U16.size
+        return bytes(buf[pos : pos + size]).decode("utf8"), pos + size
+    if pst in PST_STRUCTS:
+        pst_struct = PST_STRUCTS[pst]
+        values = pst_struct.unpack_from(buf, pos)
+        pos += pst_struct.size
+        if pst == PST_COMPLEX:
+            return complex(*values), pos
+        return values[0], pos
+    if pst == PST_PAIR:
+        car, pos = deserialize_pmt(buf, pos)
+        cdr, pos = deserialize_pmt(buf, pos)
+        return (car, cdr), pos
+    if pst in (PST_VECTOR, PST_TUPLE):
+        (size,) = PST_U32.unpack_from(buf, pos)
+        pos += PST_U32.size
+        items = []
+        for _ in range(size):
+            item, pos = deserialize_pmt(buf, pos)
+            items.append(item)
+        return tuple(items), pos
+    if pst == PST_UNIFORM_VECTOR:
+        (uvi,) = PST_U8.unpack_from(buf, pos)
+        (size,) = PST_U32.unpack_from(buf, pos + PST_U8.size)
+        pos += PST_U8.size + PST_U32.size
+        (npad,) = PST_U8.unpack_from(buf, pos)
+        pos += PST_U8.size + npad
+        try:
+            dtype = np.dtype(UVI_DTYPES[uvi])
+        except IndexError as err:
+            raise ValueError(f"unknown pmt uniform vector type {uvi}") from err
+        value = np.frombuffer(buf, dtype=dtype, count=size, offset=pos)
+        return value.astype(dtype.newbyteorder("=")), pos + size * dtype.itemsize
+    raise ValueError(f"unsupported pmt serialization type {pst}")
+
+
+def decode_iq_message(buf, vlen):
+    """Decode a pub_sink message with tags into an IqMessage.
+
+    offset is the index of the first vector of vlen samples in the message, in
+    the scanner's stream. Tag offsets are converted to sample indexes into
+    samples, which is a read only view over buf.
+    """
+    buf = memoryview(buf)
+    if len(buf) < GR_HEADER.size:
+        raise ValueError(f"I/Q message too short ({len(buf)} bytes)")
+    magic, version, offset, ntags = GR_HEADER.unpack_from(buf)
+    if magic != GR_HEADER_MAGIC or version != GR_HEADER_VERSION:
+        raise ValueError(f"not a gr-zeromq tagged message ({magic:x}, {version})")
+    pos = GR_HEADER.size
+    tags = []
+    for _ in range(ntags):
+        (tag_offset,) = GR_TAG_OFFSET.unpack_from(buf, pos)
+        pos += GR_TAG_OFFSET.size
+        key, pos = deserialize_pmt(buf, pos)
+        value, pos = deserialize_pmt(buf, pos)
+        srcid, pos = deserialize_pmt(buf, pos)
+        tags.append(IqTag((tag_offset - offset) * vlen, key, value, srcid))
+    samples = np.frombuffer(buf, dtype=np.complex64, offset=pos)
+    if samples.size % vlen:
+        raise ValueError(
+            f"I/Q message has {samples.size} samples, not a multiple of {vlen}"
+        )
+    return IqMessage(offset, samples, tags, 0)
+
+
+class IqGapDetector:
+    """Count vectors dropped between messages, from their header offsets."""
+
+    def __init__(self, vlen):
+        self.vlen = vlen
+        self.next_offset = None
+        self.dropped = 0
+        self.gaps = 0
+        self.restarts = 0
+
+    def check(self, msg):
+        dropped = 0
+        if self.next_offset is not None:
+            if msg.offset > self.next_offset:
+                dropped = msg.offset - self.next_offset
+                self.dropped += dropped
+                self.gaps += 1
+            elif msg.offset < self.next_offset:
+                # the scanner's flowgraph was restarted.
+                self.restarts += 1
+        self.next_offset = msg.offset + msg.samples.size // self.vlen
+        return msg._replace(dropped=dropped)
+
+
+class IqReceiver:
+    def __init__(self, addr, port, vlen, zmq_context=None, rcvhwm=100):
+        self.zmq_addr = f"tcp://{addr}:{port}"
+        self.vlen = vlen
+        if zmq_context is None:
+            zmq_context = self.get_context()
+        self.socket = zmq_context.socket(zmq.SUB)
+        self.socket.setsockopt(zmq.RCVHWM, rcvhwm)
+        self.socket.connect(self.zmq_addr)
+        self.socket.setsockopt_string(zmq.SUBSCRIBE, "")
+        self.gap_detector = IqGapDetector(vlen)
+        self.running = True
+
+    def get_context(self):
+        return zmq.Context.instance()
+
+    @property
+    def dropped(self):
+        return self.gap_detector.dropped
+
+    @property
+    def gaps(self):
+        return self.gap_detector.gaps
+
+    def decode(self, frame):
+        return self.gap_detector.check(decode_iq_message(frame.buffer, self.vlen))
+
+    def recv(self, timeout=None):
+        """Return the next IqMessage, or None if none arrives within timeout secs."""
+        if timeout is not None and not self.socket.poll(int(timeout * 1e3)):
+            return None
+        return self.decode(self.socket.recv(copy=False))
+
+    def __iter__(self):
+        while self.running:
+            msg = self.recv(timeout=0.1)
+            if msg is not None:
+                yield msg
+
+    def stop(self):
+        self.running = False
+        self.socket.close(linger=0)
+
+
+class AsyncIqReceiver(IqReceiver):
+    def get_context(self):
+        return zmq.asyncio.Context.instance()
+
+    async def recv(self, timeout=None):
+        """Return the next IqMessage, or None if none arrives within timeout secs."""
+        if timeout is not None and not await self.socket.poll(int(timeout * 1e3)):
+            return None
+        return self.decode(await self.socket.recv(copy=False))
+
+    def __iter__(self):
+        raise TypeError("use async for with AsyncIqReceiver")
+
+    async def __aiter__(self):
+        while self.running:
+            msg = await self.recv(timeout=0.1)
+            if msg is not None:
+                yield msg
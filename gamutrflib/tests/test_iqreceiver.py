@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+import asyncio
+import struct
+import time
+import unittest
+
+import numpy as np
+import zmq
+from gamutrflib.iqreceiver import (
+    AsyncIqReceiver,
+    IqReceiver,
+    decode_iq_message,
+    deserialize_pmt,
+)
+
+VLEN = 8
+
+
+def pmt_symbol(symbol):
+    return struct.pack(">BH", 0x02, len(symbol)) + symbol.encode("utf8")
+
+
+def pmt_double(value):
+    return struct.pack(">Bd", 0x04, value)
+
+
+def pmt_rx_time(secs, frac):
+    return struct.pack(">BIBQBd", 0x0C, 2, 0x0B, secs, 0x04, frac)
+
+
+def iq_message(offset, samples, tags):
+    header = struct.pack("<HBQQ", 0x5FF0, 0x01, offset, len(tags))
+    for tag_offset, key, value in tags:
+        header += struct.pack("<Q", tag_offset)
+        header += pmt_symbol(key) + value + pmt_symbol("src")
+    return header + samples.astype(np.complex64).tobytes()
+
+
+class IqReceiverTestCase(unittest.TestCase):
+    def test_deserialize_pmt(self):
+        self.assertEqual(("rx_freq", 10), deserialize_pmt(pmt_symbol("rx_freq")))
+        self.assertEqual((100, 1.5), deserialize_pmt(pmt_rx_time(100, 1.5))[0])
+        pair = struct.pack(">BBiB", 0x07, 0x03, 1, 0x07) + pmt_symbol("a") + b"\x06"
+        self.assertEqual((1, ("a", None)), deserialize_pmt(pair)[0])
+        uvector = struct.pack(">BBIBB", 0x0A, 0x08, 2, 1, 0) + struct.pack(
+            ">ff", 1.5, -2
+        )
+        value, pos = deserialize_pmt(uvector)
+        self.assertEqual([1.5, -2], value.tolist())
+        self.assertEqual(len(uvector), pos)
+        self.assertRaises(ValueError, deserialize_pmt, b"\x30")
+
+    def test_decode_iq_message(self):
+        samples = np.arange(VLEN * 2) + 1j
+        buf = bytearray(
+            iq_message(
+                10,
+                samples,
+                [
+                    (11, "rx_freq", pmt_double(1e9)),
+                    (11, "rx_time", pmt_rx_time(5, 0.25)),
+                ],
+            )
+        )
+        msg = decode_iq_message(buf, VLEN)
+        self.assertEqual(10, msg.offset)
+        self.assertTrue(np.array_equal(samples.astype(np.complex64), msg.samples))
+        self.assertEqual(
+            [(VLEN, "rx_freq", 1e9, "src"), (VLEN, "rx_time", (5, 0.25), "src")],
+            list(msg.tags),
+        )
+        # samples is a view over the message.
+        buf[-8:] = np.array([7j], dtype=np.complex64).tobytes()
+        self.assertEqual(7j, msg.samples[-1])
+        self.assertRaises(ValueError, decode_iq_message, buf[:-8], VLEN)
+        self.assertRaises(ValueError, decode_iq_message, b"\x00" * 19, VLEN)
+
+    def test_iq_receiver(self):
+        context = zmq.Context()
+        pub = context.socket(zmq.PUB)
+        port = pub.bind_to_random_port("tcp://127.0.0.1")
+        iqr = IqReceiver("127.0.0.1", port, VLEN, zmq_context=context)
+        samples = np.ones(VLEN, dtype=np.complex64)
+        msgs = []
+        for _ in range(50):
+            if iqr.recv(timeout=0.1) is not None:
+                break
+            pub.send(iq_message(0, samples, []))
+        while iqr.recv(timeout=0.1) is not None:
+            continue
+        for offset in (1, 2, 6):
+            pub.send(iq_message(offset, samples, []))
+            msgs.append(iqr.recv(timeout=5))
+        self.assertEqual([0, 0, 3], [msg.dropped for msg in msgs])
+        self.assertEqual(1, iqr.gaps)
+        iqr.stop()
+        self.assertEqual([], list(iqr))
+        pub.close(linger=0)
+        context.term()
+
+    def test_async_iq_receiver(self):
+        async def receive():
+            context = zmq.Context()
+            pub = context.socket(zmq.PUB)
+            port = pub.bind_to_random_port("tcp://127.0.0.1")
+            iqr = AsyncIqReceiver("127.0.0.1", port, VLEN)
+            samples = np.ones(VLEN, dtype=np.complex64)
+            msg = None
+            start_time = time.time()
+            while msg is None and time.time() - start_time < 5:
+                pub.send(iq_message(0, samples, []))
+                msg = await iqr.recv(timeout=0.1)
+            pub.send(iq_message(1, samples, []))
+            async for msg in iqr:
+                if msg.offset == 1:
+                    iqr.stop()
+            pub.close(linger=0)
+            context.term()
+            return msg
+
+        msg = asyncio.run(receive())
+        self.assertEqual(1, msg.offset)
+        self.assertEqual(VLEN, msg.samples.size)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
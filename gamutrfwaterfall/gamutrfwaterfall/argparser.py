@@ -48,6 +48,32 @@ def argument_parser():
         type=int,
         help="If set, serve waterfall on this port.",
     )
+    parser.add_argument(
+        "--headless",
+        dest="headless",
+        default=False,
+        action=argparse.BooleanOptionalAction,
+        help="If serving on --port, render the waterfall image without matplotlib (faster).",
+    )
+    parser.add_argument(
+        "--record_mp4",
+        default="",
+        type=str,
+        help="If serving on --port, also record the waterfall to this fragmented MP4 file (requires ffmpeg).",
+    )
+    parser.add_argument(
+        "--ingest_process",
+        dest="ingest_process",
+        default=True,
+        action=argparse.BooleanOptionalAction,
+        help="Receive scan results in a separate process from drawing.",
+    )
+    parser.add_argument(
+        "--ingest_buffer_mb",
+        default=32,
+        type=int,
+        help="Shared memory for scan results not yet drawn, with --ingest_process.",
+    )
     parser.add_argument(
         "--rotate_secs",
         default=900,
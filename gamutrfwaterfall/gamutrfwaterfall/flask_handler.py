@@ -8,12 +8,15 @@ import requests
 import zmq
 from flask import (
     Flask,
+    Response,
     send_file,
     render_template,
     send_from_directory,
     request,
     redirect,
 )
+from gamutrfwaterfall.frame_stream import FRAME_BOUNDARY, mjpeg_frames
+from gamutrfwaterfall.row_stream import row_events
 
 
 def get_scanner_args(api_endpoint, config_vars):
@@ -74,6 +77,17 @@ class FlaskHandler:
         self.app.add_url_rule(
             "/waterfall_img", "serve_waterfall_img", self.serve_waterfall_img
         )
+        self.app.add_url_rule(
+            "/waterfall_stream",
+            "serve_waterfall_stream_page",
+            self.serve_waterfall_stream_page,
+        )
+        self.app.add_url_rule(
+            "/waterfall_rows", "serve_waterfall_rows", self.serve_waterfall_rows
+        )
+        self.app.add_url_rule(
+            "/waterfall_mjpeg", "serve_waterfall_mjpeg", self.serve_waterfall_mjpeg
+        )
         self.app.add_url_rule(
             "/config_form", "config_form", self.config_form, methods=["POST", "GET"]
         )
@@ -215,6 +229,23 @@ class FlaskHandler:
     def serve_waterfall_img(self):
         return send_from_directory(self.tempdir, self.savefig_file)
 
+    def serve_waterfall_stream_page(self):
+        return render_template("waterfall_stream.html")
+
+    def serve_waterfall_rows(self):
+        return Response(
+            row_events(self.tempdir),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+
+    def serve_waterfall_mjpeg(self):
+        return Response(
+            mjpeg_frames(self.tempdir),
+            mimetype=f"multipart/x-mixed-replace; boundary={FRAME_BOUNDARY}",
+            headers={"Cache-Control": "no-cache"},
+        )
+
     def config_form(self):
         for var in self.config_vars:
             self.config_vars[var] = request.form.get(var, self.config_vars[var])
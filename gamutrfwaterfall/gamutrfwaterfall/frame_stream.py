@@ -0,0 +1,189 @@
+"""
+Stream rendered waterfall frames as MJPEG, and optionally record them to MP4.
+
+The plotting process encodes each rendered frame to JPEG once, and publishes
+it on a ZMQ socket in the serving directory (FramePublisher). The web server
+relays frames to each viewer as multipart/x-mixed-replace (mjpeg_frames()).
+Each viewer's socket only keeps the latest frame, so a slow viewer skips
+frames rather than backing up the renderer or other viewers.
+
+Frames can also be recorded to a fragmented MP4 by ffmpeg (Mp4Recorder),
+which stays playable if recording is interrupted.
+"""
+
+import io
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+import zmq
+
+FRAMES_SOCK = "waterfall_frames.sock"
+FRAME_BOUNDARY = "frame"
+JPEG_QUALITY = 80
+KEEPALIVE_SECS = 5
+RECORD_QUEUE = 8
+RECORD_STOP_SECS = 10
+RECORD_POLL_SECS = 0.1
+
+
+def frames_addr(path):
+    return "ipc://" + os.path.join(path, FRAMES_SOCK)
+
+
+def encode_jpeg(image, quality=JPEG_QUALITY):
+    buf = io.BytesIO()
+    image.convert("RGB").save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def mjpeg_part(jpeg):
+    return (
+        (
+            f"--{FRAME_BOUNDARY}\r\n"
+            "Content-Type: image/jpeg\r\n"
+            f"Content-Length: {len(jpeg)}\r\n\r\n"
+        ).encode("ascii")
+        + jpeg
+        + b"\r\n"
+    )
+
+
+class Mp4Recorder:
+    """Record JPEG frames to a fragmented MP4 with ffmpeg.
+
+    Frames are timestamped on arrival, and written to ffmpeg from a thread.
+    If ffmpeg falls behind, frames are dropped rather than delaying the caller.
+    """
+
+    def __init__(self, path, ffmpeg="ffmpeg"):
+        ffmpeg_path = shutil.which(ffmpeg)
+        if ffmpeg_path is None:
+            raise FileNotFoundError(f"{ffmpeg} not found, cannot record {path}")
+        self.path = path
+        self.dropped = 0
+        self.frames = queue.Queue(maxsize=RECORD_QUEUE)
+        # set once ffmpeg has exited, or recording is stopping.
+        self.stopped = threading.Event()
+        self.process = subprocess.Popen(
+            [
+                ffmpeg_path,
+                "-loglevel",
+                "error",
+                "-use_wallclock_as_timestamps",
+                "1",
+                "-f",
+                "image2pipe",
+                "-c:v",
+                "mjpeg",
+                "-i",
+                "-",
+                "-vf",
+                "scale=trunc(iw/2)*2:trunc(ih/2)*2",
+                "-c:v",
+                "libx264",
+                "-pix_fmt",
+                "yuv420p",
+                "-movflags",
+                "frag_keyframe+empty_moov+default_base_moof",
+                "-y",
+                path,
+            ],
+            stdin=subprocess.PIPE,
+        )
+        self.thread = threading.Thread(target=self.write_frames, daemon=True)
+        self.thread.start()
+
+    def write_frames(self):
+        while True:
+            jpeg = self.frames.get()
+            if jpeg is None:
+                break
+            try:
+                self.process.stdin.write(jpeg)
+                self.process.stdin.flush()
+            except BrokenPipeError:
+                logging.error("ffmpeg exited, stopped recording %s", self.path)
+                self.stopped.set()
+                break
+
+    def record(self, jpeg):
+        if self.stopped.is_set():
+            return
+        try:
+            self.frames.put_nowait(jpeg)
+        except queue.Full:
+            self.dropped += 1
+            logging.warning("recorder behind, dropped %u frames", self.dropped)
+
+    def stop(self):
+        self.stopped.set()
+        # the writer has already exited if ffmpeg has, so do not wait on it.
+        deadline = time.monotonic() + RECORD_STOP_SECS
+        while self.thread.is_alive() and time.monotonic() < deadline:
+            try:
+                self.frames.put(None, timeout=RECORD_POLL_SECS)
+                break
+            except queue.Full:
+                continue
+        self.thread.join(max(deadline - time.monotonic(), 0))
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            self.process.wait(RECORD_STOP_SECS)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class FramePublisher:
+    def __init__(self, path, record_path=None, zmq_context=None):
+        if zmq_context is None:
+            zmq_context = zmq.Context.instance()
+        self.socket = zmq_context.socket(zmq.PUB)
+        # frames for viewers that cannot keep up are dropped.
+        self.socket.setsockopt(zmq.SNDHWM, 1)
+        self.socket.bind(frames_addr(path))
+        self.recorder = None
+        if record_path:
+            self.recorder = Mp4Recorder(record_path)
+
+    def publish(self, image):
+        """Encode a rendered PIL image once, for all viewers and the recorder."""
+        jpeg = encode_jpeg(image)
+        self.socket.send(jpeg, flags=zmq.NOBLOCK)
+        if self.recorder is not None:
+            self.recorder.record(jpeg)
+        return jpeg
+
+    def stop(self):
+        self.socket.close(linger=0)
+        if self.recorder is not None:
+            self.recorder.stop()
+
+
+def mjpeg_frames(path, zmq_context=None, keepalive_secs=KEEPALIVE_SECS):
+    """Generate multipart/x-mixed-replace parts for a viewer."""
+    if zmq_context is None:
+        zmq_context = zmq.Context.instance()
+    socket = zmq_context.socket(zmq.SUB)
+    # keep only the latest frame, if the viewer is behind.
+    socket.setsockopt(zmq.CONFLATE, 1)
+    socket.connect(frames_addr(path))
+    socket.setsockopt_string(zmq.SUBSCRIBE, "")
+    jpeg = None
+    try:
+        while True:
+            if socket.poll(int(keepalive_secs * 1e3)):
+                jpeg = socket.recv()
+            elif jpeg is None:
+                continue
+            # resending the last frame detects viewers that have gone away.
+            yield mjpeg_part(jpeg)
+    finally:
+        socket.close(linger=0)
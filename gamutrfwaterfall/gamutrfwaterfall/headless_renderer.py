@@ -0,0 +1,299 @@
+import logging
+import os
+
+import matplotlib
+import matplotlib.colors
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+DPI = 100
+BACKGROUND = "#1e1e1e"
+FOREGROUND = "#cdcdcd"
+MARGIN_LEFT = 150
+MARGIN_RIGHT = 90
+MARGIN_TOP = 40
+MARGIN_BOTTOM = 40
+PANEL_GAP = 30
+DB_TICKS = 5
+COLORBAR_GAP = 15
+COLORBAR_WIDTH = 15
+PSD_LINES = (
+    ("max", "red"),
+    ("min", "pink"),
+    ("mean", "cyan"),
+    ("current", "white"),
+)
+
+
+def make_lut(cmap_name, bad_color, levels=None):
+    """Return a uint8 RGB LUT of levels colors, plus a last entry for NaN."""
+    cmap = matplotlib.colormaps[cmap_name]
+    colors = np.arange(cmap.N)
+    if levels is not None:
+        colors = np.linspace(0, 1, levels)
+    lut = np.zeros((len(colors) + 1, 3), dtype=np.uint8)
+    lut[:-1] = cmap(colors, bytes=True)[:, :3]
+    lut[-1] = (np.array(matplotlib.colors.to_rgb(bad_color)) * 255).astype(np.uint8)
+    return lut
+
+
+def polyline_segments(x, y):
+    """Split a line into segments of points, at NaN values."""
+    edges = np.diff(np.concatenate(([0], ~np.isnan(y), [0])).astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return [
+        list(zip(x[start:end].tolist(), y[start:end].tolist()))
+        for start, end in zip(starts, ends)
+    ]
+
+
+class HeadlessRenderer:
+    """Render the waterfall directly from numpy to an image, without matplotlib.
+
+    The waterfall and PSD heatmap are colored through precomputed colormap
+    LUTs, and the PSD lines, peaks, axes, colorbar and labels are drawn as a
+    minimal overlay with PIL.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.size = (int(config.width * DPI), int(config.height * DPI))
+        self.lut = make_lut("viridis", FOREGROUND)
+        self.psd_lut = make_lut("turbo", BACKGROUND)
+        self.font = ImageFont.load_default()
+        plot_width = max(1, self.size[0] - MARGIN_LEFT - MARGIN_RIGHT)
+        plot_height = max(3, self.size[1] - MARGIN_TOP - MARGIN_BOTTOM - PANEL_GAP)
+        psd_height = plot_height // 3
+        psd_top = MARGIN_TOP
+        waterfall_top = psd_top + psd_height + PANEL_GAP
+        self.psd_box = (
+            MARGIN_LEFT,
+            psd_top,
+            MARGIN_LEFT + plot_width,
+            psd_top + psd_height,
+        )
+        self.waterfall_box = (
+            MARGIN_LEFT,
+            waterfall_top,
+            MARGIN_LEFT + plot_width,
+            waterfall_top + plot_height - psd_height,
+        )
+        colorbar_left = self.waterfall_box[2] + COLORBAR_GAP
+        self.colorbar_box = (
+            colorbar_left,
+            self.waterfall_box[1],
+            colorbar_left + COLORBAR_WIDTH,
+            self.waterfall_box[3],
+        )
+        self.image = None
+
+    def colorize(self, norm_data, lut=None):
+        """Map data normalized to [0, 1] (or NaN) to RGB through a LUT."""
+        if lut is None:
+            lut = self.lut
+        levels = lut.shape[0] - 1
+        idx = np.clip(np.nan_to_num(norm_data * levels), 0, levels - 1).astype(np.intp)
+        idx[np.isnan(norm_data)] = levels
+        return lut[idx]
+
+    def freq_x(self, freqs):
+        left, _, right, _ = self.psd_box
+        return left + (np.asarray(freqs) - self.config.min_freq) / (
+            self.config.freq_range
+        ) * (right - left)
+
+    def db_y(self, dbs, db_min, db_max):
+        _, top, _, bottom = self.psd_box
+        return bottom - (np.asarray(dbs, dtype=float) - db_min) / (db_max - db_min) * (
+            bottom - top
+        )
+
+    def draw_axes(self, draw, db_min, db_max, y_ticks, y_labels):
+        for box in (self.psd_box, self.waterfall_box):
+            draw.rectangle(box, outline=FOREGROUND)
+        _, _, _, waterfall_bottom = self.waterfall_box
+        tick_step = self.config.freq_range / self.config.n_ticks
+        decimals = max(0, -int(np.floor(np.log10(tick_step)))) if tick_step > 0 else 0
+        for freq in np.linspace(
+            self.config.min_freq, self.config.max_freq, self.config.n_ticks + 1
+        ):
+            x = float(self.freq_x(freq))
+            for _, _, _, bottom in (self.psd_box, self.waterfall_box):
+                draw.line([(x, bottom), (x, bottom + 4)], fill=FOREGROUND)
+            draw.text(
+                (x, waterfall_bottom + 6),
+                f"{freq:.{decimals}f}",
+                fill=FOREGROUND,
+                font=self.font,
+                anchor="mt",
+            )
+        draw.text(
+            (self.waterfall_box[2], self.size[1] - 4),
+            "MHz",
+            fill=FOREGROUND,
+            font=self.font,
+            anchor="rb",
+        )
+        left, _, _, _ = self.psd_box
+        for db in np.linspace(db_min, db_max, DB_TICKS):
+            y = float(self.db_y(db, db_min, db_max))
+            draw.line([(left - 4, y), (left, y)], fill=FOREGROUND)
+            draw.text(
+                (left - 6, y), f"{db:.0f}", fill=FOREGROUND, font=self.font, anchor="rm"
+            )
+        _, top, _, bottom = self.waterfall_box
+        row_height = (bottom - top) / self.config.waterfall_height
+        for y_tick, y_label in zip(y_ticks, y_labels):
+            if not y_label:
+                continue
+            # row waterfall_height (the newest) is at the top.
+            y = top + (self.config.waterfall_height - y_tick + 0.5) * row_height
+            draw.text(
+                (left - 6, y), y_label, fill=FOREGROUND, font=self.font, anchor="rm"
+            )
+
+    def draw_psd_heatmap(self, image, heatmap, db_edges, db_min, db_max):
+        """Draw a frequency x dB histogram, normalized to [0, 1], as the PSD background."""
+        left, top, right, bottom = self.psd_box
+        # the histogram dB bin of each row of pixels, highest dB at the top.
+        dbs = db_max - (np.arange(bottom - top) + 0.5) / (bottom - top) * (
+            db_max - db_min
+        )
+        db_bins = np.clip(
+            np.searchsorted(db_edges, dbs, side="right") - 1, 0, len(db_edges) - 2
+        )
+        heatmap_image = Image.fromarray(self.colorize(heatmap.T[db_bins], self.psd_lut))
+        image.paste(
+            heatmap_image.resize(
+                (right - left, bottom - top), Image.Resampling.NEAREST
+            ),
+            (left, top),
+        )
+
+    def draw_colorbar(self, image, draw, scale_min, scale_max):
+        """Draw the waterfall's color scale, from scale_min to scale_max dB."""
+        left, top, right, bottom = self.colorbar_box
+        levels = np.linspace(1, 0, bottom - top)[:, np.newaxis]
+        image.paste(
+            Image.fromarray(self.colorize(np.repeat(levels, right - left, axis=1))),
+            (left, top),
+        )
+        draw.rectangle(self.colorbar_box, outline=FOREGROUND)
+        for value in np.linspace(scale_min, scale_max, DB_TICKS):
+            y = bottom - (value - scale_min) / (scale_max - scale_min) * (bottom - top)
+            draw.line([(right, y), (right + 4, y)], fill=FOREGROUND)
+            draw.text(
+                (right + 6, y),
+                f"{value:.0f}",
+                fill=FOREGROUND,
+                font=self.font,
+                anchor="lm",
+            )
+        draw.text(
+            ((left + right) / 2, top - 4),
+            "dB",
+            fill=FOREGROUND,
+            font=self.font,
+            anchor="mb",
+        )
+
+    def draw_psd(self, draw, freqs, psd_lines, db_min, db_max):
+        x = self.freq_x(freqs)
+        legend_x = self.psd_box[2] - 4
+        for name, color in PSD_LINES[::-1]:
+            y = self.db_y(np.clip(psd_lines[name], db_min, db_max), db_min, db_max)
+            for segment in polyline_segments(x, y):
+                if len(segment) == 1:
+                    draw.point(segment, fill=color)
+                else:
+                    draw.line(segment, fill=color)
+            draw.text(
+                (legend_x, self.psd_box[1] + 4),
+                name,
+                fill=color,
+                font=self.font,
+                anchor="ra",
+            )
+            legend_x -= draw.textlength(name, font=self.font) + 8
+
+    def draw_peaks(self, draw, freqs, peaks, properties, db_min, db_max):
+        if peaks is None or not len(peaks):
+            return
+        left_ips = properties["left_ips"].astype(int)
+        right_ips = properties["right_ips"].astype(int)
+        heights = self.db_y(
+            np.clip(properties["width_heights"], db_min, db_max), db_min, db_max
+        )
+        for peak, left, right, y in zip(peaks, left_ips, right_ips, heights):
+            peak_x, left_x, right_x = self.freq_x(freqs[[peak, left, right]])
+            draw.line([(left_x, y), (right_x, y)], fill="white")
+            draw.polygon(
+                [(peak_x, y - 8), (peak_x - 5, y), (peak_x + 5, y)], fill="white"
+            )
+
+    def render(
+        self,
+        waterfall,
+        freqs,
+        psd_lines,
+        db_min,
+        db_max,
+        y_ticks,
+        y_labels,
+        title,
+        peaks=None,
+        properties=None,
+        psd_heatmap=None,
+        psd_db_edges=None,
+        scale_range=None,
+    ):
+        """Render an image.
+
+        waterfall is the history normalized to [0, 1], oldest row first, and
+        psd_lines maps PSD line names to dB values per frequency bin.
+        psd_heatmap is a frequency x dB histogram normalized to [0, 1], with dB
+        bin edges psd_db_edges, and scale_range is the (min, max) of the
+        waterfall's color scale, if it is to be drawn.
+        """
+        image = Image.new("RGB", self.size, BACKGROUND)
+        left, top, right, bottom = self.waterfall_box
+        # the newest row is drawn at the top.
+        waterfall_image = Image.fromarray(self.colorize(waterfall[::-1]))
+        image.paste(
+            waterfall_image.resize(
+                (right - left, bottom - top), Image.Resampling.NEAREST
+            ),
+            (left, top),
+        )
+        if psd_heatmap is not None:
+            self.draw_psd_heatmap(image, psd_heatmap, psd_db_edges, db_min, db_max)
+        draw = ImageDraw.Draw(image)
+        if scale_range is not None:
+            self.draw_colorbar(image, draw, *scale_range)
+        self.draw_psd(draw, freqs, psd_lines, db_min, db_max)
+        self.draw_peaks(draw, freqs, peaks, properties, db_min, db_max)
+        self.draw_axes(draw, db_min, db_max, y_ticks, y_labels)
+        draw.text(
+            ((self.psd_box[0] + self.psd_box[2]) / 2, MARGIN_TOP / 2),
+            title,
+            fill=FOREGROUND,
+            font=self.font,
+            anchor="mm",
+        )
+        self.image = image
+        return image
+
+    def save(self, path):
+        """Encode the last rendered image to path (PNG, or WebP by extension)."""
+        basename = os.path.basename(path)
+        dirname = os.path.dirname(path)
+        tmp_path = os.path.join(dirname, "." + basename)
+        if path.lower().endswith(".webp"):
+            self.image.save(tmp_path, format="WEBP", quality=80, method=0)
+        else:
+            # favor encoding speed over size.
+            self.image.save(tmp_path, format="PNG", compress_level=1)
+        os.rename(tmp_path, path)
+        logging.debug("wrote %s", path)
+        return path
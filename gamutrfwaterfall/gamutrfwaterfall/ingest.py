@@ -0,0 +1,150 @@
+"""
+Receive scan results in a separate ingest process, so that drawing never delays ingest.
+
+IngestReceiver is a drop in replacement for ZmqReceiver. The ingest process
+receives and parses scan results and assembles sweeps, and writes each scan
+result into a ring in shared memory. read_buff() in the rendering process
+then returns results from the ring at the renderer's own pace. If the
+renderer falls so far behind that a result is overwritten before it is read,
+or the queue of results to read is full, that result is dropped rather than
+delaying ingest. Both processes count dropped results in shared memory, and
+each drop is logged, as it leaves a gap in the waterfall history.
+
+Resampling and appending rows to the waterfall history stay in the renderer.
+They only happen for results that are drawn, so they cannot delay ingest.
+"""
+
+import logging
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from gamutrflib.zmqbucket import ZmqReceiver, frame_resample
+
+BUFFER_BYTES = 32 * 2**20
+FRAMES_QUEUE = 256
+POLL_SECS = 0.1
+STOP_SECS = 10
+
+
+class IngestReceiver:
+    def __init__(
+        self,
+        scanners,
+        buffer_bytes=BUFFER_BYTES,
+        frames_queue=FRAMES_QUEUE,
+        receiver=ZmqReceiver,
+    ):
+        # spawned rather than forked, as the parent has threads and ZMQ sockets.
+        mp_context = multiprocessing.get_context("spawn")
+        self.shm = shared_memory.SharedMemory(create=True, size=buffer_bytes)
+        self.buffer_bytes = buffer_bytes
+        # total bytes written to the ring, only accessed with lock held.
+        self.written = mp_context.Value("Q", 0, lock=False)
+        self.lock = mp_context.Lock()
+        # bounded, so that results the renderer is not reading are dropped.
+        self.frames = mp_context.Queue(maxsize=frames_queue)
+        self.running = mp_context.Event()
+        self.running.set()
+        # results dropped by either process.
+        self.dropped = mp_context.Value("Q", 0)
+        # not a daemon, as the receiver has its own processes.
+        self.process = mp_context.Process(target=self.ingest, args=(scanners, receiver))
+        self.process.start()
+
+    def __getstate__(self):
+        # the ingest process needs the ring and queue, but not itself.
+        state = self.__dict__.copy()
+        del state["process"]
+        return state
+
+    def ingest(self, scanners, receiver):
+        zmqr = receiver(scanners=scanners)
+        try:
+            while self.running.is_set() and zmqr.healthy():
+                scan_configs, df = zmqr.read_buff()
+                if df is None:
+                    time.sleep(POLL_SECS)
+                    continue
+                frame = df.to_records(index=False)
+                start = self.write_frame(frame)
+                if start is None:
+                    continue
+                try:
+                    self.frames.put_nowait(
+                        (scan_configs, start, len(frame), frame.dtype)
+                    )
+                except queue.Full:
+                    self.drop()
+        finally:
+            zmqr.stop()
+            # exit without waiting for the renderer to read queued results.
+            self.frames.cancel_join_thread()
+
+    def write_frame(self, frame):
+        size = frame.nbytes
+        if size > self.buffer_bytes:
+            logging.warning(
+                "dropping scan result of %u bytes, larger than ingest buffer of %u bytes",
+                size,
+                self.buffer_bytes,
+            )
+            return None
+        with self.lock:
+            start = self.written.value
+            offset = start % self.buffer_bytes
+            if offset + size > self.buffer_bytes:
+                # frames are contiguous, so wrap to the start of the ring.
+                start += self.buffer_bytes - offset
+                offset = 0
+            self.shm.buf[offset : offset + size] = frame.tobytes()
+            self.written.value = start + size
+        return start
+
+    def read_frame(self, start, count, dtype):
+        with self.lock:
+            # the frame is overwritten once the ring has wrapped past its start.
+            if self.written.value > start + self.buffer_bytes:
+                return None
+            frame = np.frombuffer(
+                self.shm.buf,
+                dtype=dtype,
+                count=count,
+                offset=start % self.buffer_bytes,
+            ).copy()
+        return pd.DataFrame(frame)
+
+    def drop(self):
+        with self.dropped.get_lock():
+            self.dropped.value += 1
+            dropped = self.dropped.value
+        logging.warning("renderer behind, dropped %u scan results", dropped)
+
+    def healthy(self):
+        return self.process.is_alive()
+
+    def read_buff(self, scan_fres=0):
+        while True:
+            try:
+                scan_configs, start, count, dtype = self.frames.get_nowait()
+            except queue.Empty:
+                return (None, None)
+            df = self.read_frame(start, count, dtype)
+            if df is not None:
+                break
+            self.drop()
+        if scan_fres:
+            df = frame_resample(df, scan_fres)
+        return (scan_configs, df)
+
+    def stop(self):
+        self.running.clear()
+        self.process.join(STOP_SECS)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.frames.cancel_join_thread()
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,121 @@
+"""
+Stream new waterfall rows to browsers, rather than a rendered image per viewer.
+
+The plotting process publishes each new row, quantized to uint8, on a ZMQ
+socket in the serving directory (RowPublisher). The web server relays rows to
+each viewer as server-sent events (row_events()), and the viewer colors and
+scrolls rows locally on a canvas.
+"""
+
+import base64
+import json
+import os
+import struct
+
+import numpy as np
+import zmq
+
+from gamutrfwaterfall.headless_renderer import FOREGROUND, make_lut
+
+ROWS_SOCK = "waterfall_rows.sock"
+ROWS_CONFIG = "waterfall_rows.json"
+# row timestamp, dB range, number of bins.
+ROW_HEADER = struct.Struct("<dffH")
+# quantized levels are 0 to ROW_LEVELS - 1, and ROW_LEVELS is NaN.
+ROW_LEVELS = 255
+KEEPALIVE_SECS = 1
+
+
+def rows_addr(path):
+    return "ipc://" + os.path.join(path, ROWS_SOCK)
+
+
+def quantize_row(dbs, db_min, db_max):
+    db_range = max(db_max - db_min, 1e-9)
+    levels = np.nan_to_num((dbs - db_min) / db_range * (ROW_LEVELS - 1))
+    row = np.clip(np.rint(levels), 0, ROW_LEVELS - 1).astype(np.uint8)
+    row[np.isnan(dbs)] = ROW_LEVELS
+    return row
+
+
+def encode_row(ts, db_min, db_max, row):
+    return ROW_HEADER.pack(ts, db_min, db_max, len(row)) + row.tobytes()
+
+
+def decode_row(buf):
+    ts, db_min, db_max, width = ROW_HEADER.unpack_from(buf)
+    row = np.frombuffer(buf, dtype=np.uint8, count=width, offset=ROW_HEADER.size)
+    return ts, db_min, db_max, row
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+class RowPublisher:
+    def __init__(self, path, zmq_context=None):
+        self.path = path
+        if zmq_context is None:
+            zmq_context = zmq.Context.instance()
+        self.socket = zmq_context.socket(zmq.PUB)
+        self.socket.bind(rows_addr(path))
+
+    def set_config(self, config):
+        """Describe rows to viewers, which reset when this changes."""
+        stream_config = json.dumps(
+            {
+                "min_freq": config.min_freq,
+                "max_freq": config.max_freq,
+                "width": config.waterfall_width,
+                "height": config.waterfall_height,
+                "lut": base64.b64encode(
+                    make_lut("viridis", FOREGROUND, ROW_LEVELS).tobytes()
+                ).decode("ascii"),
+            }
+        )
+        # viewers that connect later read the config from a file.
+        config_path = os.path.join(self.path, ROWS_CONFIG)
+        tmpfile = os.path.join(self.path, "." + ROWS_CONFIG)
+        with open(tmpfile, "w", encoding="utf8") as f:
+            f.write(stream_config)
+        os.rename(tmpfile, config_path)
+        self.socket.send_multipart([b"config", stream_config.encode("utf8")])
+
+    def publish_rows(self, rows, row_times, db_min, db_max):
+        for ts, dbs in zip(row_times, rows):
+            self.socket.send_multipart(
+                [
+                    b"row",
+                    encode_row(ts, db_min, db_max, quantize_row(dbs, db_min, db_max)),
+                ]
+            )
+
+    def stop(self):
+        self.socket.close(linger=0)
+
+
+def row_events(path, zmq_context=None, keepalive_secs=KEEPALIVE_SECS):
+    """Generate server-sent events for a viewer, starting with the config."""
+    if zmq_context is None:
+        zmq_context = zmq.Context.instance()
+    socket = zmq_context.socket(zmq.SUB)
+    socket.connect(rows_addr(path))
+    socket.setsockopt_string(zmq.SUBSCRIBE, "")
+    try:
+        try:
+            with open(os.path.join(path, ROWS_CONFIG), encoding="utf8") as f:
+                yield sse("config", f.read())
+        except FileNotFoundError:
+            pass
+        while True:
+            if not socket.poll(int(keepalive_secs * 1e3)):
+                # detects viewers that have gone away.
+                yield ": keepalive\n\n"
+                continue
+            event, data = socket.recv_multipart()
+            if event == b"row":
+                yield sse("row", base64.b64encode(data).decode("ascii"))
+            else:
+                yield sse(event.decode("utf8"), data.decode("utf8"))
+    finally:
+        socket.close(linger=0)
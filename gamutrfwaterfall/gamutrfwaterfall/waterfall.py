@@ -13,6 +13,9 @@ from gamutrfwaterfall.flask_handler import (
     get_scanner_args,
     write_scanner_args,
 )
+from gamutrfwaterfall.frame_stream import FramePublisher
+from gamutrfwaterfall.ingest import IngestReceiver
+from gamutrfwaterfall.row_stream import RowPublisher
 from gamutrfwaterfall.waterfall_plot import (
     make_config,
     WaterfallPlotManager,
@@ -57,6 +60,9 @@ def serve_waterfall(
     api_endpoint,
     config_vars,
     config_vars_path,
+    headless=False,
+    row_publisher=None,
+    frame_publisher=None,
 ):
     global need_reset_fig
     need_reset_fig = True
@@ -92,7 +98,9 @@ def serve_waterfall(
     if not scan_configs:
         return
 
-    plot_manager = WaterfallPlotManager(peak_finder)
+    plot_manager = WaterfallPlotManager(
+        peak_finder, row_publisher=row_publisher, frame_publisher=frame_publisher
+    )
 
     while zmqr.healthy() and running:
         if need_reconfig:
@@ -112,6 +120,7 @@ def serve_waterfall(
                 batch,
                 rotate_secs,
                 save_time,
+                headless=headless,
             )
             logging.info(
                 "scanning %fMHz to %fMHz at %fMsps with %u FFT points at %fMHz resolution",
@@ -152,6 +161,7 @@ def serve_waterfall(
                         batch,
                         rotate_secs,
                         save_time,
+                        headless=headless,
                     )
                     plot_manager.add_plot(plot_config, i)
 
@@ -197,6 +207,7 @@ def serve_waterfall(
                 batch,
                 rotate_secs,
                 save_time,
+                headless=headless,
             )
             if plot_manager.config_changed(last_config):
                 logging.info("scanner config change detected")
@@ -233,10 +244,14 @@ def main():
         batch = False
         config_vars_path = None
         config_vars = CONFIG_VARS
+        headless = False
+        row_publisher = None
+        frame_publisher = None
 
         if args.port:
             engine = "agg"
             batch = True
+            headless = args.headless
             savefig_path = os.path.join(tempdir, "waterfall.png")
             config_vars_path = os.path.join(tempdir, "config_vars.json")
             flask = FlaskHandler(
@@ -252,10 +267,18 @@ def main():
                 config_vars_path,
             )
             flask.start()
+            row_publisher = RowPublisher(tempdir)
+            frame_publisher = FramePublisher(tempdir, record_path=args.record_mp4)
 
-        zmqr = ZmqReceiver(
-            scanners=parse_scanners(args.scanners),
-        )
+        if args.ingest_process:
+            zmqr = IngestReceiver(
+                scanners=parse_scanners(args.scanners),
+                buffer_bytes=args.ingest_buffer_mb * 2**20,
+            )
+        else:
+            zmqr = ZmqReceiver(
+                scanners=parse_scanners(args.scanners),
+            )
 
         serve_waterfall(
             args.min_freq,
@@ -278,7 +301,14 @@ def main():
             args.api_endpoint,
             config_vars,
             config_vars_path,
+            headless=headless,
+            row_publisher=row_publisher,
+            frame_publisher=frame_publisher,
         )
+        if row_publisher is not None:
+            row_publisher.stop()
+        if frame_publisher is not None:
+            frame_publisher.stop()
 
 
 if __name__ == "__main__":
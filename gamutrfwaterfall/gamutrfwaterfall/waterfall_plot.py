@@ -2,6 +2,7 @@ import csv
 import datetime
 import json
 import logging
+import multiprocessing
 import os
 import shutil
 import time
@@ -14,6 +15,12 @@ import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator, AutoMinorLocator
 from scipy.ndimage import gaussian_filter
 from gamutrflib.zmqbucket import frame_resample
+from PIL import Image
+from gamutrfwaterfall.headless_renderer import HeadlessRenderer
+
+# the PSD histogram covers this fraction of the dB range beyond each end, so
+# that it is not rebuilt each time the range grows slightly.
+PSD_HIST_MARGIN = 0.1
 
 
 class WaterfallConfig:
@@ -35,6 +42,7 @@ class WaterfallConfig:
         batch,
         rotate_secs,
         save_time,
+        headless=False,
     ):
         self.engine = engine
         self.plot_snr = plot_snr
@@ -66,6 +74,7 @@ class WaterfallConfig:
         self.n_ticks = 20
         self.rotate_secs = rotate_secs
         self.save_time = save_time
+        self.headless = headless
 
     def __eq__(self, other):
         for attr in ("fft_len", "sampling_rate", "min_freq", "max_freq"):
@@ -74,6 +83,101 @@ class WaterfallConfig:
         return True
 
 
+class BinStats:
+    """Per frequency bin min, max, mean and variance of waterfall history.
+
+    Statistics are updated as history values are replaced, rather than
+    recomputed over all of history. Mean and variance are updated by removing
+    and adding the replaced and new values' batch statistics (Chan's parallel
+    form of Welford's algorithm). The min or max of a bin is recomputed from
+    history only when a value equal to it is replaced. Removing values
+    accumulates rounding error, so recompute() resets the statistics from
+    history periodically.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.count = np.zeros(width)
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.min = np.full(width, np.nan)
+        self.max = np.full(width, np.nan)
+
+    def batch(self, cols, values):
+        valid = ~np.isnan(values)
+        cols = cols[valid]
+        values = values[valid]
+        count = np.bincount(cols, minlength=self.width)
+        mean = np.bincount(cols, weights=values, minlength=self.width) / np.maximum(
+            count, 1
+        )
+        m2 = np.bincount(cols, weights=(values - mean[cols]) ** 2, minlength=self.width)
+        return count, mean, m2
+
+    def recompute(self, history):
+        """Reset statistics from history, without updating incrementally."""
+        cols = np.tile(np.arange(self.width), history.shape[0])
+        self.count, self.mean, self.m2 = self.batch(cols, history.ravel())
+        self.min = np.fmin.reduce(history, axis=0)
+        self.max = np.fmax.reduce(history, axis=0)
+
+    def merge(self, cols, values, sign):
+        batch_count, batch_mean, batch_m2 = self.batch(cols, values)
+        if sign < 0:
+            count = self.count - batch_count
+            mean = (self.count * self.mean - batch_count * batch_mean) / np.maximum(
+                count, 1
+            )
+            delta = batch_mean - mean
+            m2 = (
+                self.m2
+                - batch_m2
+                - delta**2 * count * batch_count / np.maximum(self.count, 1)
+            )
+        else:
+            count = self.count + batch_count
+            delta = batch_mean - self.mean
+            mean = self.mean + delta * batch_count / np.maximum(count, 1)
+            m2 = (
+                self.m2
+                + batch_m2
+                + delta**2 * self.count * batch_count / np.maximum(count, 1)
+            )
+        empty = count == 0
+        mean[empty] = 0
+        self.count = count
+        self.mean = mean
+        self.m2 = np.where(empty, 0, np.maximum(m2, 0))
+
+    def replace(self, cols, old_values, new_values, history):
+        """Replace old_values with new_values in bins cols (unique per history row).
+
+        history is the history after the values have been replaced.
+        """
+        self.merge(cols, old_values, -1)
+        self.merge(cols, new_values, 1)
+        for stat, stat_func in ((self.min, np.fmin), (self.max, np.fmax)):
+            stale = np.zeros(self.width, dtype=bool)
+            stale[cols[old_values == stat[cols]]] = True
+            stat_func.at(stat, cols, new_values)
+            stat[stale] = stat_func.reduce(history[:, stale], axis=0)
+
+    def nanmean(self):
+        return np.where(self.count, self.mean, np.nan)
+
+    def nanvar(self):
+        return np.where(self.count, self.m2 / np.maximum(self.count, 1), np.nan)
+
+    def top_n(self, n):
+        """Return the indexes of the n bins with the highest variance, highest first."""
+        var = np.nan_to_num(self.nanvar(), nan=-np.inf)
+        n = min(n, self.width)
+        if n < 1:
+            return np.array([], dtype=int)
+        top = np.argpartition(var, self.width - n)[self.width - n :]
+        return top[np.argsort(var[top])[::-1]]
+
+
 class WaterfallState:
     def __init__(self, save_path, peak_finder, X, Y):
         self.X = X
@@ -96,6 +200,9 @@ class WaterfallState:
         self.top_n_lns = None
         self.background = None
         self.mesh = None
+        self.mesh_rgba = None
+        self.mesh_db_range = None
+        self.mesh_new_rows = 0
         self.psd_title = None
         self.cbar_ax = None
         self.cbar = None
@@ -112,13 +219,107 @@ class WaterfallState:
         self.peak_finder = peak_finder
         self.last_plot = 0
         self.freq_bins = self.X[0]
-        self.db_data = np.empty(self.X.shape)
-        self.db_data.fill(np.nan)
-        self.freq_data = np.empty(self.X.shape)
-        self.freq_data.fill(np.nan)
+        # history is stored as rings, where ring_head is the oldest row, and
+        # db_data and freq_data are ordered oldest to newest by order_history().
+        self.db_ring = np.full(self.X.shape, np.nan)
+        self.freq_ring = np.full(self.X.shape, np.nan)
+        self.ring_head = 0
+        self.bin_stats = BinStats(self.X.shape[1])
+        # rows added since bin_stats were recomputed from history.
+        self.bin_stats_rows = 0
+        self.db_data = None
+        self.freq_data = None
+        self.order_history()
+        # 2D frequency x dB histogram of history, updated as rows are replaced.
+        self.psd_hist = None
+        self.psd_hist_db_edges = None
         self.sm = None
         self.peak_lns = None
 
+    def add_rows(self, rows):
+        """Write rows of (bin indexes, freqs, dbs) over the oldest rows of history.
+
+        As with scrolling the history, bins not in a new row keep the values of
+        the row it replaces. Rows are written with one assignment per ring
+        height of rows, so that a backlog is not written row by row.
+        """
+        height, width = self.db_ring.shape
+        for i in range(0, len(rows), height):
+            chunk = rows[i : i + height]
+            ring_rows = (self.ring_head + np.arange(len(chunk))) % height
+            ring_rows = np.repeat(ring_rows, [len(idx) for idx, _, _ in chunk])
+            ring_cols = np.concatenate([idx for idx, _, _ in chunk])
+            freqs = np.concatenate([freqs for _, freqs, _ in chunk])
+            dbs = np.concatenate([dbs for _, _, dbs in chunk])
+            # where a row has more than one value for a bin, the last is kept.
+            _, last = np.unique(
+                (ring_rows * width + ring_cols)[::-1], return_index=True
+            )
+            keep = len(ring_cols) - 1 - last
+            ring_idx = (ring_rows[keep], ring_cols[keep])
+            old_dbs = self.db_ring[ring_idx]
+            if self.psd_hist is not None:
+                self.add_psd_hist(self.freq_ring[ring_idx], old_dbs, -1)
+                self.add_psd_hist(freqs[keep], dbs[keep], 1)
+            self.freq_ring[ring_idx] = freqs[keep]
+            self.db_ring[ring_idx] = dbs[keep]
+            self.bin_stats_rows += len(chunk)
+            if self.bin_stats_rows >= height:
+                # once per ring of rows, so that rounding error does not accumulate.
+                self.bin_stats.recompute(self.db_ring)
+                self.bin_stats_rows = 0
+            else:
+                self.bin_stats.replace(ring_idx[1], old_dbs, dbs[keep], self.db_ring)
+            self.ring_head = (self.ring_head + len(chunk)) % height
+
+    def psd_hist_cells(self, freqs, dbs):
+        """Return the flat psd_hist indexes of points, as np.histogram2d bins them.
+
+        Points outside the histogram (including NaN) are dropped.
+        """
+        bins = []
+        for edges, values in ((self.freq_bins, freqs), (self.psd_hist_db_edges, dbs)):
+            value_bins = np.searchsorted(edges, values, side="right") - 1
+            value_bins[values == edges[-1]] = len(edges) - 2
+            value_bins[~((values >= edges[0]) & (values <= edges[-1]))] = -1
+            bins.append(value_bins)
+        freq_bins, db_bins = bins
+        valid = (freq_bins >= 0) & (db_bins >= 0)
+        return freq_bins[valid] * self.psd_hist.shape[1] + db_bins[valid]
+
+    def add_psd_hist(self, freqs, dbs, count):
+        np.add.at(self.psd_hist.ravel(), self.psd_hist_cells(freqs, dbs), count)
+
+    def psd_hist_stale(self, db_min, db_max):
+        if self.psd_hist is None:
+            return True
+        hist_db_min = self.psd_hist_db_edges[0]
+        hist_db_max = self.psd_hist_db_edges[-1]
+        return (
+            db_min < hist_db_min
+            or db_max > hist_db_max
+            or (db_max - db_min) < (hist_db_max - hist_db_min) / 2
+        )
+
+    def reset_psd_hist(self, db_min, db_max, resolution):
+        margin = (db_max - db_min) * PSD_HIST_MARGIN
+        self.psd_hist_db_edges = np.linspace(
+            db_min - margin, db_max + margin, resolution
+        )
+        self.psd_hist = np.zeros((len(self.freq_bins) - 1, resolution - 1))
+        self.add_psd_hist(self.freq_ring.ravel(), self.db_ring.ravel(), 1)
+
+    def newest_rows(self, n_rows):
+        """Return the dB values of the n_rows most recently written rows, oldest first."""
+        height = self.db_ring.shape[0]
+        n_rows = min(n_rows, height)
+        return self.db_ring[(self.ring_head - n_rows + np.arange(n_rows)) % height]
+
+    def order_history(self):
+        order = np.roll(np.arange(self.db_ring.shape[0]), -self.ring_head)
+        self.db_data = self.db_ring[order]
+        self.freq_data = self.freq_ring[order]
+
 
 def make_config(
     scan_configs,
@@ -136,6 +337,7 @@ def make_config(
     batch,
     rotate_secs,
     save_time,
+    headless=False,
 ):
     sampling_rate = max([scan_config["sample_rate"] for scan_config in scan_configs])
     fft_len = max([scan_config["nfft"] for scan_config in scan_configs])
@@ -161,6 +363,7 @@ def make_config(
         batch,
         rotate_secs,
         save_time,
+        headless=headless,
     )
     return config
 
@@ -171,6 +374,9 @@ class WaterfallPlot:
         self.num = num
         X, Y = self.meshgrid(1, config.waterfall_height, config.waterfall_height)
         self.state = WaterfallState(config.base_save_path, peak_finder, X, Y)
+        self.renderer = None
+        self.row_publisher = None
+        self.frame_publisher = None
         matplotlib.use(self.config.engine)
         style.use("fast")
 
@@ -192,6 +398,11 @@ class WaterfallPlot:
     def init_fig(self, onresize):
         logging.info("initializing figure")
 
+        if self.config.headless:
+            self.renderer = HeadlessRenderer(self.config)
+            self.state.psd_x_edges = self.state.X[0]
+            return
+
         self.state.cmap = plt.get_cmap("viridis")
         self.state.cmap_psd = plt.get_cmap("turbo")
         self.state.minor_tick_separator = AutoMinorLocator()
@@ -220,37 +431,101 @@ class WaterfallPlot:
             self.state.fig.canvas.mpl_connect("resize_event", onresize)
 
     def close(self):
+        self.renderer = None
         if self.state.fig:
             plt.close(self.state.fig)
             self.state.fig = None
 
-    def reset_mesh_psd(self, data=None):
-        if self.state.mesh_psd:
-            self.state.mesh_psd.remove()
-
-        X, Y = self.meshgrid(
-            self.state.db_min,
-            self.state.db_max,
-            self.config.psd_db_resolution,
-        )
+    def reset_mesh_psd(self, data=None, db_range=None):
+        if db_range is None:
+            db_range = (self.state.db_min, self.state.db_max)
+        X, Y = self.meshgrid(*db_range, self.config.psd_db_resolution)
         self.state.psd_x_edges = X[0]
         self.state.psd_y_edges = Y[:, 0]
+        extent = (X[0][0], X[0][-1], Y[0][0], Y[-1][0])
 
         if data is None:
-            data = np.zeros(X[:-1, :-1].shape)
-        self.state.mesh_psd = self.state.ax_psd.pcolormesh(X, Y, data, shading="flat")
-
-    def reset_mesh(self, data):
-        if self.state.mesh:
-            self.state.mesh.remove()
-        self.state.mesh = self.state.ax.pcolormesh(
-            self.state.X, self.state.Y, data, shading="nearest"
+            data = self.state.cmap_psd(np.zeros(X[:-1, :-1].shape), bytes=True)
+        if self.state.mesh_psd is None:
+            self.state.mesh_psd = self.state.ax_psd.imshow(
+                data,
+                aspect="auto",
+                origin="lower",
+                interpolation="nearest",
+                extent=extent,
+            )
+        else:
+            self.state.mesh_psd.set_data(data)
+            self.state.mesh_psd.set_extent(extent)
+
+    def db_norm(self, db_data):
+        if self.config.plot_snr:
+            return ((db_data - self.state.bin_stats.min) - self.config.snr_min) / (
+                self.config.snr_max - self.config.snr_min
+            )
+        return (db_data - self.state.db_min) / (self.state.db_max - self.state.db_min)
+
+    def mesh_stale(self):
+        # SNR is relative to the minimum of each column over all rows, so any new
+        # row can change the color of every row.
+        if self.config.plot_snr or self.state.mesh_db_range is None:
+            return True
+        # otherwise, rows are recolored only when the dB range changes by more
+        # than one colormap level.
+        mesh_db_min, mesh_db_max = self.state.mesh_db_range
+        level = (self.state.db_max - self.state.db_min) / self.state.cmap.N
+        return (
+            abs(self.state.db_min - mesh_db_min) > level
+            or abs(self.state.db_max - mesh_db_max) > level
         )
 
+    def update_mesh(self):
+        """Color new waterfall rows into the RGBA image, scrolling older rows up."""
+        rgba = self.state.mesh_rgba
+        new_rows = min(self.state.mesh_new_rows, rgba.shape[0])
+        self.state.mesh_new_rows = 0
+        if self.mesh_stale():
+            new_rows = rgba.shape[0]
+            self.state.mesh_db_range = (self.state.db_min, self.state.db_max)
+        elif new_rows:
+            rgba[:-new_rows] = rgba[new_rows:]
+        if new_rows:
+            rgba[-new_rows:] = self.state.cmap(
+                self.db_norm(self.state.db_data[-new_rows:]), bytes=True
+            )
+        self.state.mesh.set_data(rgba)
+
+    def reset_mesh(self):
+        # one image artist, updated in place by update_mesh().
+        self.state.mesh_rgba = np.zeros(self.state.db_data.shape + (4,), dtype=np.uint8)
+        self.state.mesh_db_range = None
+        freqs = self.state.X[0]
+        rows = self.state.Y[:, 0]
+        freq_step = (freqs[-1] - freqs[0]) / max(1, len(freqs) - 1) / 2
+        row_step = (rows[-1] - rows[0]) / max(1, len(rows) - 1) / 2
+        self.state.mesh = self.state.ax.imshow(
+            self.state.mesh_rgba,
+            aspect="auto",
+            origin="lower",
+            interpolation="nearest",
+            extent=(
+                freqs[0] - freq_step,
+                freqs[-1] + freq_step,
+                rows[0] - row_step,
+                rows[-1] + row_step,
+            ),
+        )
+        self.update_mesh()
+
     def reset_fig(self):
+        if self.renderer is not None:
+            return
+
         logging.info("resetting figure")
 
         self.state.fig.clf()
+        self.state.mesh = None
+        self.state.mesh_psd = None
         self.state.fig.tight_layout()
         self.state.fig.subplots_adjust(hspace=0.15)
         self.state.fig.subplots_adjust(left=0.20)
@@ -314,7 +589,7 @@ class WaterfallPlot:
         self.state.ax_psd.set_ylabel("dB")
 
         # SPECTROGRAM
-        self.reset_mesh(self.state.db_data)
+        self.reset_mesh()
         self.state.top_n_lns = []
         for _ in range(self.config.top_n):
             (ln,) = self.state.ax.plot(
@@ -372,8 +647,12 @@ class WaterfallPlot:
             if self.config.savefig_path:
                 self.safe_savefig(self.config.savefig_path)
 
-    def update_fig(self, results):
-        if not self.state.fig or not self.state.ax:
+    def update_fig(self, results, resample=True):
+        """Add results to the plot, and draw.
+
+        If resample is False, results are already resampled to freq_resolution.
+        """
+        if self.renderer is None and (not self.state.fig or not self.state.ax):
             raise NotImplementedError
 
         if self.config.base_save_path and self.config.rotate_secs:
@@ -391,11 +670,15 @@ class WaterfallPlot:
 
         scan_duration = 0
         row_time = None
+        rows = []
+        row_times = []
 
         for scan_configs, orig_scan_df in results:
-            scan_df = frame_resample(
-                orig_scan_df.copy(), self.config.freq_resolution * 1e6
-            )
+            scan_df = orig_scan_df
+            if resample:
+                scan_df = frame_resample(
+                    orig_scan_df.copy(), self.config.freq_resolution * 1e6
+                )
             scan_df = scan_df[
                 (scan_df.freq >= self.config.min_freq)
                 & (scan_df.freq <= self.config.max_freq)
@@ -420,18 +703,16 @@ class WaterfallPlot:
             idx = (
                 ((scan_df.freq - self.config.min_freq) / self.config.freq_resolution)
                 .round()
-                .clip(lower=0, upper=(self.state.db_data.shape[1] - 1))
+                .clip(lower=0, upper=(self.state.db_ring.shape[1] - 1))
                 .values.flatten()
                 .astype(int)
             )
-
-            self.state.freq_data = np.roll(self.state.freq_data, -1, axis=0)
-            self.state.freq_data[-1][idx] = scan_df.freq.values.flatten()
-
-            self.state.db_data = np.roll(self.state.db_data, -1, axis=0)
-            self.state.db_data[-1][idx] = scan_df.db.values.flatten()
+            rows.append(
+                (idx, scan_df.freq.values.flatten(), scan_df.db.values.flatten())
+            )
 
             scan_time = scan_df.ts.iloc[-1]
+            row_times.append(scan_time)
             row_time = datetime.datetime.fromtimestamp(scan_time)
             if scan_time not in self.state.scan_config_history:
                 self.state.scan_times.append(scan_time)
@@ -452,6 +733,18 @@ class WaterfallPlot:
                     self.state.y_labels.pop(j)
 
             self.state.counter += 1
+            self.state.mesh_new_rows += 1
+
+        self.state.add_rows(rows)
+
+        if self.row_publisher is not None and rows:
+            new_rows = self.state.newest_rows(len(rows))
+            self.row_publisher.publish_rows(
+                new_rows,
+                row_times[-len(new_rows) :],
+                np.nanmin(self.state.bin_stats.min),
+                np.nanmax(self.state.bin_stats.max),
+            )
 
         if row_time is not None and self.state.counter % self.config.draw_rate == 0:
             now = time.time()
@@ -462,39 +755,34 @@ class WaterfallPlot:
             logging.info(
                 f"Plotting {row_time} (seconds since last plot {since_last_plot})"
             )
+            self.state.order_history()
 
-            self.state.db_min = np.nanmin(self.state.db_data)
-            self.state.db_max = np.nanmax(self.state.db_data)
+            self.state.db_min = np.nanmin(self.state.bin_stats.min)
+            self.state.db_max = np.nanmax(self.state.bin_stats.max)
 
             self.state.db_max += 0.10 * abs(self.state.db_max)
             if self.state.db_max - self.state.db_min < 20:
                 self.state.db_max = self.state.db_min + 20
 
-            data, _xedge, _yedge = np.histogram2d(
-                self.state.freq_data[~np.isnan(self.state.freq_data)].flatten(),
-                self.state.db_data[~np.isnan(self.state.db_data)].flatten(),
-                density=False,
-                bins=[self.state.psd_x_edges, self.state.psd_y_edges],
+            title_text = self.get_title_text(
+                scan_duration,
+                tune_step_hz,
+                tune_step_fft,
+                tune_rate_hz,
+                tune_dwell_ms,
+                self.config.sampling_rate,
+                self.config.freq_resolution,
             )
-            heatmap = gaussian_filter(data, sigma=2)
-            data = heatmap / np.max(heatmap)
 
-            db_norm = (self.state.db_data - self.state.db_min) / (
-                self.state.db_max - self.state.db_min
-            )
-            if self.config.plot_snr:
-                db_norm = (
-                    (self.state.db_data - np.nanmin(self.state.db_data, axis=0))
-                    - self.config.snr_min
-                ) / (self.config.snr_max - self.config.snr_min)
+            if self.renderer is not None:
+                self.draw_headless(scan_time, scan_configs, title_text)
+                self.save_fig(scan_time)
+                return
+
+            data = self.psd_heatmap()
 
             top_n_bins = self.state.freq_bins[
-                np.argsort(
-                    np.nanvar(
-                        self.state.db_data - np.nanmin(self.state.db_data, axis=0),
-                        axis=0,
-                    )
-                )[::-1][: self.config.top_n]
+                self.state.bin_stats.top_n(self.config.top_n)
             ]
 
             self.state.ax.set_yticks(self.state.y_ticks, labels=self.state.y_labels)
@@ -507,16 +795,22 @@ class WaterfallPlot:
 
             self.state.fig.canvas.blit(self.state.ax.yaxis.axes.figure.bbox)
 
-            self.reset_mesh_psd(data=self.state.cmap_psd(data.T))
+            self.reset_mesh_psd(
+                data=self.state.cmap_psd(data.T, bytes=True),
+                db_range=(
+                    self.state.psd_hist_db_edges[0],
+                    self.state.psd_hist_db_edges[-1],
+                ),
+            )
 
             self.state.ax_psd.set_ylim(self.state.db_min, self.state.db_max)
             self.state.current_psd_ln.set_ydata(self.state.db_data[-1])
-            for ln, ln_func in (
-                (self.state.min_psd_ln, np.nanmin),
-                (self.state.max_psd_ln, np.nanmax),
-                (self.state.mean_psd_ln, np.nanmean),
+            for ln, ydata in (
+                (self.state.min_psd_ln, self.state.bin_stats.min),
+                (self.state.max_psd_ln, self.state.bin_stats.max),
+                (self.state.mean_psd_ln, self.state.bin_stats.nanmean()),
             ):
-                ln.set_ydata(ln_func(self.state.db_data, axis=0))
+                ln.set_ydata(ydata.copy())
             self.state.ax_psd.draw_artist(self.state.mesh_psd)
 
             lns_to_draw = [
@@ -536,20 +830,10 @@ class WaterfallPlot:
             for ln in lns_to_draw:
                 self.state.ax_psd.draw_artist(ln)
 
-            self.reset_mesh(self.state.cmap(db_norm))
+            self.update_mesh()
             self.state.ax.draw_artist(self.state.mesh)
 
-            self.draw_title(
-                self.state.ax_psd,
-                self.state.psd_title,
-                scan_duration,
-                tune_step_hz,
-                tune_step_fft,
-                tune_rate_hz,
-                tune_dwell_ms,
-                self.config.sampling_rate,
-                self.config.freq_resolution,
-            )
+            self.draw_title(self.state.ax_psd, self.state.psd_title, title_text)
 
             self.state.sm.set_clim(vmin=self.state.db_min, vmax=self.state.db_max)
             self.state.cbar.update_normal(self.state.sm)
@@ -569,22 +853,66 @@ class WaterfallPlot:
             ):
                 self.state.fig.canvas.blit(bmap)
             self.state.fig.canvas.flush_events()
-            fig_path = None
-            if self.config.savefig_path:
-                fig_path = self.safe_savefig(self.config.savefig_path)
+            self.save_fig(scan_time)
 
-            if self.state.save_path:
-                self.save_waterfall(
-                    self.config.save_time,
-                    scan_time,
-                    fig_path=fig_path,
-                )
+    def save_fig(self, scan_time):
+        fig_path = None
+        if self.config.savefig_path:
+            fig_path = self.safe_savefig(self.config.savefig_path)
+        if self.frame_publisher is not None:
+            self.frame_publisher.publish(self.frame_image())
 
-    def draw_peaks(self, scan_time, scan_configs):
+        if self.state.save_path:
+            self.save_waterfall(
+                self.config.save_time,
+                scan_time,
+                fig_path=fig_path,
+            )
+
+    def psd_heatmap(self):
+        """Return the smoothed PSD histogram of history, normalized to [0, 1]."""
+        # the histogram is rebuilt only when the dB range outgrows it.
+        if self.state.psd_hist_stale(self.state.db_min, self.state.db_max):
+            self.state.reset_psd_hist(
+                self.state.db_min,
+                self.state.db_max,
+                self.config.psd_db_resolution,
+            )
+        heatmap = gaussian_filter(self.state.psd_hist, sigma=2)
+        return heatmap / np.max(heatmap)
+
+    def draw_headless(self, scan_time, scan_configs, title_text):
+        peaks = None
+        properties = None
+        if self.state.peak_finder:
+            peaks, properties = self.find_peaks(scan_time, scan_configs)
+        scale_range = (self.state.db_min, self.state.db_max)
+        if self.config.plot_snr:
+            scale_range = (self.config.snr_min, self.config.snr_max)
+        self.renderer.render(
+            self.db_norm(self.state.db_data),
+            self.state.X[0],
+            {
+                "max": self.state.bin_stats.max,
+                "min": self.state.bin_stats.min,
+                "mean": self.state.bin_stats.nanmean(),
+                "current": self.state.db_data[-1],
+            },
+            self.state.db_min,
+            self.state.db_max,
+            self.state.y_ticks,
+            self.state.y_labels,
+            str(title_text),
+            peaks=peaks,
+            properties=properties,
+            psd_heatmap=self.psd_heatmap(),
+            psd_db_edges=self.state.psd_hist_db_edges,
+            scale_range=scale_range,
+        )
+
+    def find_peaks(self, scan_time, scan_configs):
         peaks, properties = self.state.peak_finder.find_peaks(self.state.db_data[-1])
         peaks, properties = self.filter_peaks(peaks, properties)
-        left_ips = properties["left_ips"].astype(int)
-        right_ips = properties["right_ips"].astype(int)
 
         if self.state.save_path:
             self.save_detections(
@@ -593,6 +921,12 @@ class WaterfallPlot:
                 peaks,
                 properties,
             )
+        return peaks, properties
+
+    def draw_peaks(self, scan_time, scan_configs):
+        peaks, properties = self.find_peaks(scan_time, scan_configs)
+        left_ips = properties["left_ips"].astype(int)
+        right_ips = properties["right_ips"].astype(int)
 
         if self.state.peak_finder:
             self.state.peak_lns.set_xdata(self.state.psd_x_edges[peaks])
@@ -672,10 +1006,8 @@ class WaterfallPlot:
                     self.state.detection_text.append(txt)
                     self.state.ax_psd.draw_artist(txt)
 
-    def draw_title(
+    def get_title_text(
         self,
-        ax,
-        title,
         scan_duration,
         tune_step_hz,
         tune_step_fft,
@@ -694,27 +1026,30 @@ class WaterfallPlot:
             "Tune rate": "%.2fHz" % tune_rate_hz,
             "Tune dwell time": "%.2fms" % tune_dwell_ms,
         }
+        return title_text
+
+    def draw_title(self, ax, title, title_text):
         title.set_fontsize(8)
         title.set_text(str(title_text))
         ax.draw_artist(title)
 
     def filter_peaks(self, peaks, properties):
-        for i in range(len(peaks) - 1, -1, -1):  # start from end of list
-            for j in range(len(peaks)):
-                if i == j:
-                    continue
-                if (properties["left_ips"][i] > properties["left_ips"][j]) and (
-                    properties["right_ips"][i] < properties["right_ips"][j]
-                ):
-                    peaks = np.delete(peaks, i)
-                    for k in properties:
-                        properties[k] = np.delete(properties[k], i)
-
-                    break
-                    # properties["left_ips"] = np.delete(properties["left_ips"], i)
-                    # properties["right_ips"] = np.delete(properties["right_ips"], i)
-                    # properties["width_heights"] = np.delete(properties["width_heights"], i)
-        return peaks, properties
+        """Remove peaks whose interval is strictly inside another peak's interval."""
+        left_ips = properties["left_ips"]
+        right_ips = properties["right_ips"]
+        order = np.argsort(left_ips, kind="stable")
+        sorted_left = left_ips[order]
+        sorted_right = right_ips[order]
+        # the max right_ips of peaks starting strictly before each peak.
+        prior_right = np.concatenate(
+            ([-np.inf], np.maximum.accumulate(sorted_right)[:-1])
+        )
+        first = np.searchsorted(sorted_left, sorted_left, side="left")
+        keep = np.ones(len(peaks), dtype=bool)
+        keep[order] = prior_right[first] <= sorted_right
+        for k in properties:
+            properties[k] = properties[k][keep]
+        return peaks[keep], properties
 
     def save_detections(
         self,
@@ -828,7 +1163,17 @@ class WaterfallPlot:
             self.state.last_save_time = now
             logging.info(f"Saving {waterfall_save_path}")
 
+    def frame_image(self):
+        if self.renderer is not None:
+            return self.renderer.image
+        if not self.config.savefig_path:
+            self.state.fig.canvas.draw()
+        # otherwise, savefig() has just drawn the figure to the canvas.
+        return Image.fromarray(np.asarray(self.state.fig.canvas.buffer_rgba()))
+
     def safe_savefig(self, path):
+        if self.renderer is not None:
+            return self.renderer.save(path)
         basename = os.path.basename(path)
         dirname = os.path.dirname(path)
         tmp_path = os.path.join(dirname, "." + basename)
@@ -838,19 +1183,89 @@ class WaterfallPlot:
         return path
 
 
+class WaterfallPlotWorker:
+    """Run a WaterfallPlot in its own process, so that plots draw in parallel.
+
+    Methods are sent to the process with send() and their results returned
+    by wait(), or both with call().
+    """
+
+    def __init__(self, peak_finder, config, num):
+        self.config = config
+        # spawned rather than forked, as the parent has threads and ZMQ sockets.
+        mp_context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = mp_context.Pipe()
+        self.process = mp_context.Process(
+            target=self.run, args=(child_conn, peak_finder, config, num), daemon=True
+        )
+        self.process.start()
+        # so that wait() sees EOF if the process exits.
+        child_conn.close()
+
+    @staticmethod
+    def run(conn, peak_finder, config, num):
+        plot = WaterfallPlot(peak_finder, config, num)
+        while True:
+            method, args = conn.recv()
+            try:
+                result = getattr(plot, method)(*args)
+            except Exception as err:
+                result = err
+            conn.send(result)
+            if method == "close":
+                break
+
+    def send(self, method, *args):
+        self.conn.send((method, args))
+
+    def wait(self):
+        result = self.conn.recv()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def call(self, method, *args):
+        self.send(method, *args)
+        return self.wait()
+
+    def close(self):
+        if self.process.is_alive():
+            self.call("close")
+            self.process.join()
+        self.conn.close()
+
+
 class WaterfallPlotManager:
-    def __init__(self, peak_finder):
+    """Manage the waterfall plot, and plots for each tuning range.
+
+    In batch mode, plots after the first are run in their own processes.
+    Results are resampled once per distinct plot resolution.
+    """
+
+    def __init__(self, peak_finder, row_publisher=None, frame_publisher=None):
         self.plots = []
         self.config = None
         self.peak_finder = peak_finder
+        self.row_publisher = row_publisher
+        self.frame_publisher = frame_publisher
 
     def config_changed(self, config):
         return self.config != config
 
     def add_plot(self, config, num):
+        if self.plots and config.batch:
+            self.plots.append(WaterfallPlotWorker(self.peak_finder, config, num))
+            return
+        plot = WaterfallPlot(self.peak_finder, config, num)
         if not self.plots:
             self.config = config
-        self.plots.append(WaterfallPlot(self.peak_finder, config, num))
+            # rows are streamed for the first plot only.
+            if self.row_publisher is not None:
+                self.row_publisher.set_config(config)
+                plot.row_publisher = self.row_publisher
+            # as are frames.
+            plot.frame_publisher = self.frame_publisher
+        self.plots.append(plot)
 
     def close(self):
         for plot in self.plots:
@@ -858,17 +1273,60 @@ class WaterfallPlotManager:
         self.plots = []
         self.config = None
 
-    def update_fig(self, results):
+    def call_plots(self, method, plot_args):
+        workers = []
+        for plot, args in zip(self.plots, plot_args):
+            if isinstance(plot, WaterfallPlotWorker):
+                plot.send(method, *args)
+                workers.append(plot)
+        for plot, args in zip(self.plots, plot_args):
+            if not isinstance(plot, WaterfallPlotWorker):
+                getattr(plot, method)(*args)
+        for worker in workers:
+            worker.wait()
+
+    def resample(self, results):
+        """Return results for each plot, resampled to its resolution and sliced to its range."""
+        resampled = {}
+        plot_results = []
         for plot in self.plots:
-            plot.update_fig(results)
+            config = plot.config
+            if config.freq_resolution not in resampled:
+                resampled[config.freq_resolution] = [
+                    (
+                        scan_configs,
+                        frame_resample(scan_df.copy(), config.freq_resolution * 1e6),
+                    )
+                    for scan_configs, scan_df in results
+                ]
+            sliced_results = []
+            for scan_configs, scan_df in resampled[config.freq_resolution]:
+                # resampled frequencies are sorted.
+                freqs = scan_df.freq.values
+                start = np.searchsorted(freqs, config.min_freq, "left")
+                end = np.searchsorted(freqs, config.max_freq, "right")
+                sliced_results.append((scan_configs, scan_df.iloc[start:end]))
+            plot_results.append(sliced_results)
+        return plot_results
+
+    def update_fig(self, results):
+        self.call_plots(
+            "update_fig",
+            [(plot_results, False) for plot_results in self.resample(results)],
+        )
 
     def reset_fig(self):
-        for plot in self.plots:
-            plot.reset_fig()
+        self.call_plots("reset_fig", [()] * len(self.plots))
 
     def init_fig(self, onresize):
-        for plot in self.plots:
-            plot.init_fig(onresize)
+        # workers are batch mode, which does not handle resizes.
+        self.call_plots(
+            "init_fig",
+            [
+                (None if isinstance(plot, WaterfallPlotWorker) else onresize,)
+                for plot in self.plots
+            ],
+        )
 
     def need_init(self):
         if self.plots:
@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from PIL import Image
+from gamutrfwaterfall.flask_handler import FlaskHandler
+from gamutrfwaterfall.frame_stream import (
+    FRAME_BOUNDARY,
+    FramePublisher,
+    Mp4Recorder,
+    encode_jpeg,
+    mjpeg_frames,
+)
+
+
+def parse_part(part):
+    headers, jpeg = part.split(b"\r\n\r\n", 1)
+    headers = headers.decode("ascii").split("\r\n")
+    return headers, jpeg[:-2]
+
+
+class FrameStreamTestCase(unittest.TestCase):
+    def test_mjpeg_frames(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            publisher = FramePublisher(tempdir)
+            frames = mjpeg_frames(tempdir, keepalive_secs=0.1)
+            published = []
+            stop = threading.Event()
+
+            def publish():
+                while not stop.is_set() and len(published) < 1000:
+                    image = Image.new("RGB", (32, 16), (len(published) % 256, 0, 0))
+                    published.append(publisher.publish(image))
+                    time.sleep(0.01)
+
+            thread = threading.Thread(target=publish)
+            thread.start()
+            headers, jpeg = parse_part(next(frames))
+            stop.set()
+            thread.join()
+            self.assertEqual(f"--{FRAME_BOUNDARY}", headers[0])
+            self.assertIn("Content-Type: image/jpeg", headers)
+            self.assertIn(f"Content-Length: {len(jpeg)}", headers)
+            self.assertIn(jpeg, published)
+            self.assertEqual((32, 16), Image.open(io.BytesIO(jpeg)).size)
+            # a viewer that is behind skips to the latest frame.
+            time.sleep(0.2)
+            self.assertEqual(published[-1], parse_part(next(frames))[1])
+            # which is resent, if there is no new frame.
+            self.assertEqual(published[-1], parse_part(next(frames))[1])
+            frames.close()
+            publisher.stop()
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg not installed")
+    def test_mp4_recorder(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            mp4_path = os.path.join(tempdir, "waterfall.mp4")
+            recorder = Mp4Recorder(mp4_path)
+            for i in range(5):
+                recorder.record(encode_jpeg(Image.new("RGB", (33, 17), (i, 0, 0))))
+                time.sleep(0.05)
+            recorder.stop()
+            self.assertEqual(0, recorder.process.returncode)
+            self.assertTrue(os.path.getsize(mp4_path))
+
+    @unittest.skipUnless(shutil.which("false"), "false not installed")
+    def test_mp4_recorder_ffmpeg_exits(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            # an ffmpeg that exits immediately.
+            recorder = Mp4Recorder(os.path.join(tempdir, "waterfall.mp4"), "false")
+            recorder.process.wait()
+            jpeg = encode_jpeg(Image.new("RGB", (33, 17)))
+            start_time = time.time()
+            while not recorder.stopped.is_set() and time.time() - start_time < 10:
+                recorder.record(jpeg)
+                time.sleep(0.01)
+            self.assertTrue(recorder.stopped.is_set())
+            # frames are no longer queued, or counted as dropped.
+            for _ in range(100):
+                recorder.record(jpeg)
+            self.assertEqual(0, recorder.dropped)
+            start_time = time.time()
+            recorder.stop()
+            self.assertLess(time.time() - start_time, 1)
+
+    def test_mp4_recorder_no_ffmpeg(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            self.assertRaises(
+                FileNotFoundError,
+                Mp4Recorder,
+                os.path.join(tempdir, "waterfall.mp4"),
+                ffmpeg="no-such-ffmpeg",
+            )
+
+    def test_waterfall_mjpeg(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            flask = FlaskHandler(
+                tempdir + "/waterfall.png",
+                tempdir,
+                1,
+                0,
+                1,
+                "127.0.0.1",
+                10002,
+                "127.0.0.1:9001",
+                {},
+                tempdir + "/config_vars.json",
+            )
+            publisher = FramePublisher(tempdir)
+            stop = threading.Event()
+
+            def publish():
+                while not stop.is_set():
+                    publisher.publish(Image.new("RGB", (32, 16)))
+                    time.sleep(0.01)
+
+            thread = threading.Thread(target=publish)
+            thread.start()
+            response = flask.app.test_client().get("/waterfall_mjpeg", buffered=False)
+            stop.set()
+            thread.join()
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(
+                f"multipart/x-mixed-replace; boundary={FRAME_BOUNDARY}",
+                response.headers["Content-Type"],
+            )
+            self.assertTrue(next(response.response).startswith(b"--frame\r\n"))
+            response.close()
+            publisher.stop()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+import time
+import unittest
+
+import numpy as np
+from gamutrfwaterfall.ingest import IngestReceiver
+from test_waterfall import FakeZmqReceiver
+
+
+class FakeReceiver(FakeZmqReceiver):
+    def __init__(self, scanners):
+        super().__init__(90, 1.5e6, 1.52e6, -10, 1e6, 2e6)
+        self.scanners = scanners
+
+    def read_buff(self, scan_fres=1e3):
+        time.sleep(0.01)
+        return super().read_buff(scan_fres=scan_fres)
+
+
+class IngestTestCase(unittest.TestCase):
+    def wait_for(self, condition, timeout=10):
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            if condition():
+                return True
+            time.sleep(0.1)
+        return False
+
+    def read_result(self, ingest):
+        start_time = time.time()
+        while time.time() - start_time < 10:
+            scan_configs, df = ingest.read_buff()
+            if df is not None:
+                return scan_configs, df
+            time.sleep(0.1)
+        return None, None
+
+    def test_ingest(self):
+        ingest = IngestReceiver([("127.0.0.1", 8001)], receiver=FakeReceiver)
+        self.assertTrue(ingest.healthy())
+        scan_configs, df = self.read_result(ingest)
+        zmqr = FakeReceiver([])
+        zmqr.read_buff()
+        expected_configs, expected_df = zmqr.read_buff()
+        self.assertEqual(expected_configs[0]["nfft"], scan_configs[0]["nfft"])
+        self.assertEqual(list(expected_df.columns), list(df.columns))
+        self.assertTrue(np.array_equal(expected_df.freq.values, df.freq.values))
+        self.assertTrue(np.array_equal(expected_df.db.values, df.db.values))
+        ingest.stop()
+        self.assertFalse(ingest.healthy())
+
+    def test_ingest_behind(self):
+        # room for a few results only, so results not read in time are dropped.
+        ingest = IngestReceiver(
+            [("127.0.0.1", 8001)], buffer_bytes=2**16, receiver=FakeReceiver
+        )
+        # wait for the ring to overwrite the first results.
+        self.assertTrue(self.wait_for(lambda: ingest.written.value > 2**17))
+        _, df = self.read_result(ingest)
+        self.assertIsNotNone(df)
+        self.assertTrue(ingest.dropped.value)
+        ingest.stop()
+
+    def test_ingest_queue(self):
+        # results not read are dropped by the ingest process once the queue is full.
+        ingest = IngestReceiver(
+            [("127.0.0.1", 8001)], frames_queue=2, receiver=FakeReceiver
+        )
+        self.assertTrue(self.wait_for(lambda: ingest.dropped.value > 0))
+        _, df = self.read_result(ingest)
+        self.assertIsNotNone(df)
+        ingest.stop()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
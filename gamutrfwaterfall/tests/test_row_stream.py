@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+import base64
+import json
+import tempfile
+import time
+import unittest
+
+import numpy as np
+from gamutrfwaterfall.flask_handler import FlaskHandler
+from gamutrfwaterfall.row_stream import (
+    ROW_LEVELS,
+    RowPublisher,
+    decode_row,
+    encode_row,
+    quantize_row,
+    row_events,
+)
+from gamutrfwaterfall.waterfall_plot import WaterfallPlotManager
+from test_waterfall import waterfall_config
+
+
+class RowStreamTestCase(unittest.TestCase):
+    def test_quantize_row(self):
+        row = quantize_row(np.array([-100, -50, np.nan, -200, 0]), -100, -50)
+        self.assertEqual([0, ROW_LEVELS - 1, ROW_LEVELS, 0, ROW_LEVELS - 1], list(row))
+        ts, db_min, db_max, decoded_row = decode_row(encode_row(1.5, -100, -50, row))
+        self.assertEqual((1.5, -100, -50), (ts, db_min, db_max))
+        self.assertEqual(list(row), list(decoded_row))
+
+    def test_row_events(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            config = waterfall_config()
+            publisher = RowPublisher(tempdir)
+            plot_manager = WaterfallPlotManager(None, row_publisher=publisher)
+            plot_manager.add_plot(config, 0)
+            plot_manager.add_plot(config, 1)
+            self.assertIs(publisher, plot_manager.plots[0].row_publisher)
+            self.assertIsNone(getattr(plot_manager.plots[1], "row_publisher", None))
+            plot_manager.close()
+
+            events = row_events(tempdir, keepalive_secs=0.1)
+            event, data = next(events).splitlines()[:2]
+            self.assertEqual("event: config", event)
+            stream_config = json.loads(data[len("data: ") :])
+            self.assertEqual(
+                (100, 10), (stream_config["width"], stream_config["height"])
+            )
+            self.assertEqual(
+                (ROW_LEVELS + 1) * 3, len(base64.b64decode(stream_config["lut"]))
+            )
+
+            dbs = np.linspace(-100, -50, 100)
+            row = None
+            start_time = time.time()
+            while row is None and time.time() - start_time < 5:
+                publisher.publish_rows([dbs], [time.time()], -100, -50)
+                event = next(events)
+                if event.startswith("event: row"):
+                    row = decode_row(base64.b64decode(event.splitlines()[1][6:]))[-1]
+            self.assertEqual(list(quantize_row(dbs, -100, -50)), list(row))
+            events.close()
+            publisher.stop()
+
+    def test_waterfall_stream_page(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            flask = FlaskHandler(
+                tempdir + "/waterfall.png",
+                tempdir,
+                1,
+                0,
+                1,
+                "127.0.0.1",
+                10002,
+                "127.0.0.1:9001",
+                {},
+                tempdir + "/config_vars.json",
+            )
+            response = flask.app.test_client().get("/waterfall_stream")
+            self.assertEqual(200, response.status_code)
+            self.assertIn(b"/waterfall_rows", response.data)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -7,10 +7,44 @@ import os
 import tempfile
 import time
 import unittest
+import numpy as np
 import pandas as pd
+from PIL import Image
 from gamutrfwaterfall.argparser import argument_parser
 from gamutrfwaterfall.waterfall import serve_waterfall
+from gamutrfwaterfall.waterfall_plot import (
+    WaterfallConfig,
+    WaterfallPlot,
+    WaterfallPlotManager,
+    WaterfallPlotWorker,
+    WaterfallState,
+)
 from gamutrflib.peak_finder import get_peak_finder
+from gamutrflib.zmqbucket import frame_resample
+
+
+def waterfall_config(**kwargs):
+    """Return a small WaterfallConfig, with any arguments overridden."""
+    config_args = {
+        "engine": "agg",
+        "plot_snr": False,
+        "savefig_path": None,
+        "sampling_rate": 1e6,
+        "fft_len": 256,
+        "min_freq": 1e6,
+        "max_freq": 2e6,
+        "top_n": 1,
+        "base_save_path": None,
+        "width": 10,
+        "height": 5,
+        "waterfall_height": 10,
+        "waterfall_width": 100,
+        "batch": True,
+        "rotate_secs": 0,
+        "save_time": 1,
+    }
+    config_args.update(kwargs)
+    return WaterfallConfig(**config_args)
 
 
 class FakeZmqReceiver:
@@ -67,10 +101,248 @@ class FakeZmqReceiver:
         return
 
 
+class FakeFramePublisher:
+    def __init__(self):
+        self.images = []
+
+    def publish(self, image):
+        self.images.append(image)
+
+
 class UtilsTestCase(unittest.TestCase):
     def test_arg_parser(self):
         self.assertTrue(argument_parser())
 
+    def test_waterfall_plot_mesh(self):
+        config = waterfall_config()
+        plot = WaterfallPlot(None, config, 1)
+        plot.init_fig(None)
+        plot.reset_fig()
+        mesh = plot.state.mesh
+        zmqr = FakeZmqReceiver(90, 1.5e6, 1.52e6, -10, 1e6, 2e6)
+        for _ in range(3):
+            zmqr.serve_results = None
+            zmqr.read_buff()
+            plot.update_fig([zmqr.read_buff()])
+        # the same image is updated in place.
+        self.assertIs(mesh, plot.state.mesh)
+        self.assertEqual((10, 100, 4), plot.state.mesh_rgba.shape)
+        self.assertEqual((1000, 500), plot.frame_image().size)
+        self.assertTrue(
+            np.array_equal(
+                plot.state.cmap(plot.db_norm(plot.state.db_data), bytes=True),
+                plot.state.mesh_rgba,
+            )
+        )
+        plot.close()
+
+    def test_waterfall_plot_headless(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            for savefig_file in ("waterfall.png", "waterfall.webp"):
+                savefig_path = os.path.join(tempdir, savefig_file)
+                config = waterfall_config(
+                    savefig_path=savefig_path, base_save_path=tempdir, headless=True
+                )
+                plot = WaterfallPlot(get_peak_finder("narrowband"), config, 1)
+                plot.frame_publisher = FakeFramePublisher()
+                plot.init_fig(None)
+                plot.reset_fig()
+                self.assertIsNone(plot.state.fig)
+                zmqr = FakeZmqReceiver(90, 1.5e6, 1.52e6, -10, 1e6, 2e6)
+                for _ in range(3):
+                    zmqr.serve_results = None
+                    zmqr.read_buff()
+                    plot.update_fig([zmqr.read_buff()])
+                with Image.open(savefig_path) as image:
+                    self.assertEqual((1000, 500), image.size)
+                renderer = plot.renderer
+                pixels = np.asarray(renderer.image)
+                for box, lut in (
+                    (renderer.psd_box, renderer.psd_lut),
+                    (renderer.colorbar_box, renderer.lut),
+                ):
+                    left, top, right, bottom = box
+                    colors = np.unique(
+                        pixels[top + 1 : bottom, left + 1 : right].reshape(-1, 3),
+                        axis=0,
+                    )
+                    # the PSD heatmap, and the colorbar, are colored by their LUTs.
+                    lut_colors = colors[
+                        [np.any(np.all(lut == color, axis=1)) for color in colors]
+                    ]
+                    self.assertGreater(len(lut_colors), 1)
+                self.assertEqual(3, len(plot.frame_publisher.images))
+                self.assertIs(plot.renderer.image, plot.frame_publisher.images[-1])
+                self.assertTrue(
+                    glob.glob(os.path.join(tempdir, "detections/detections*csv"))
+                )
+                plot.close()
+
+    def test_waterfall_plot_manager(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            plot_manager = WaterfallPlotManager(None)
+            for num, (min_freq, max_freq) in enumerate(
+                ((1e6, 2e6), (1e6, 1.5e6), (1.5e6, 2e6))
+            ):
+                config = waterfall_config(
+                    savefig_path=os.path.join(tempdir, f"{num}-waterfall.png"),
+                    min_freq=min_freq,
+                    max_freq=max_freq,
+                )
+                plot_manager.add_plot(config, num)
+            self.assertIsInstance(plot_manager.plots[0], WaterfallPlot)
+            self.assertIsInstance(plot_manager.plots[1], WaterfallPlotWorker)
+            zmqr = FakeZmqReceiver(90, 1.5e6, 1.52e6, -10, 1e6, 2e6)
+            zmqr.serve_results = None
+            zmqr.read_buff()
+            results = [zmqr.read_buff()]
+            plot_results = plot_manager.resample(results)
+            for plot, (_, scan_df) in zip(
+                plot_manager.plots, [plot_results[0] for plot_results in plot_results]
+            ):
+                config = plot.config
+                expected_df = frame_resample(
+                    results[0][1].copy(), config.freq_resolution * 1e6
+                )
+                expected_df = expected_df[
+                    (expected_df.freq >= config.min_freq)
+                    & (expected_df.freq <= config.max_freq)
+                ]
+                self.assertTrue(expected_df.equals(scan_df))
+            plot_manager.init_fig(None)
+            plot_manager.reset_fig()
+            for _ in range(3):
+                plot_manager.update_fig(results)
+            for num in range(3):
+                self.assertTrue(
+                    os.path.exists(os.path.join(tempdir, f"{num}-waterfall.png"))
+                )
+            plot_manager.close()
+
+    def test_waterfall_state_ring(self):
+        X, Y = np.meshgrid(np.linspace(0, 1, 8), np.arange(4))
+        state = WaterfallState(None, None, X, Y)
+        db_data = np.full(X.shape, np.nan)
+        rng = np.random.default_rng(0)
+        for n_rows in (1, 3, 0, 6, 2):
+            rows = []
+            for _ in range(n_rows):
+                idx = rng.choice(8, size=rng.integers(1, 8), replace=False)
+                dbs = rng.random(idx.size)
+                rows.append((idx, dbs * 1e6, dbs))
+                db_data = np.roll(db_data, -1, axis=0)
+                db_data[-1][idx] = dbs
+            state.add_rows(rows)
+            state.order_history()
+            self.assertTrue(np.array_equal(db_data, state.db_data, equal_nan=True))
+            self.assertTrue(
+                np.array_equal(db_data * 1e6, state.freq_data, equal_nan=True)
+            )
+
+    def test_waterfall_state_psd_hist(self):
+        X, Y = np.meshgrid(np.linspace(0, 1, 8), np.arange(4))
+        state = WaterfallState(None, None, X, Y)
+        rng = np.random.default_rng(0)
+        state.add_rows([(np.arange(8), np.linspace(0, 1, 8), rng.random(8))])
+        self.assertTrue(state.psd_hist_stale(0, 1))
+        state.reset_psd_hist(0, 1, 10)
+        self.assertFalse(state.psd_hist_stale(0, 1))
+        self.assertTrue(state.psd_hist_stale(-1, 1))
+        self.assertTrue(state.psd_hist_stale(0.5, 0.6))
+        for n_rows in (1, 3, 6):
+            rows = []
+            for _ in range(n_rows):
+                idx = rng.integers(0, 8, size=6)
+                rows.append((idx, X[0][idx], rng.random(idx.size) * 1.5))
+            state.add_rows(rows)
+            valid = ~np.isnan(state.db_ring)
+            hist, _, _ = np.histogram2d(
+                state.freq_ring[valid],
+                state.db_ring[valid],
+                bins=[state.freq_bins, state.psd_hist_db_edges],
+            )
+            self.assertTrue(np.array_equal(hist, state.psd_hist))
+
+    def test_waterfall_state_bin_stats(self):
+        X, Y = np.meshgrid(np.linspace(0, 1, 8), np.arange(4))
+        state = WaterfallState(None, None, X, Y)
+        rng = np.random.default_rng(0)
+        for n_rows in (1, 3, 6, 2, 9):
+            rows = []
+            for _ in range(n_rows):
+                idx = rng.integers(0, 7, size=6)
+                rows.append((idx, X[0][idx], rng.integers(-100, -90, idx.size)))
+            state.add_rows(rows)
+            stats = state.bin_stats
+            for stat, expected in (
+                (stats.min, np.fmin.reduce(state.db_ring[:, :7], axis=0)),
+                (stats.max, np.fmax.reduce(state.db_ring[:, :7], axis=0)),
+                (stats.nanmean(), np.nanmean(state.db_ring[:, :7], axis=0)),
+                (stats.nanvar(), np.nanvar(state.db_ring[:, :7], axis=0)),
+            ):
+                self.assertTrue(np.allclose(expected, stat[:7], equal_nan=True))
+            # the last bin never has a value.
+            self.assertTrue(np.isnan(stats.nanvar()[7]))
+            var = np.nanvar(state.db_ring[:, :7], axis=0)
+            self.assertEqual(
+                sorted(var, reverse=True)[:3], var[stats.top_n(3)].tolist()
+            )
+
+    def test_waterfall_state_bin_stats_drift(self):
+        # non integer values, with occasional outliers, over many ring wraps.
+        X, Y = np.meshgrid(np.linspace(0, 1, 8), np.arange(4))
+        state = WaterfallState(None, None, X, Y)
+        rng = np.random.default_rng(0)
+        for _ in range(5000):
+            idx = rng.integers(0, 8, size=6)
+            dbs = -150 + rng.normal(0, 1e-3, idx.size)
+            if rng.random() < 0.01:
+                dbs += rng.random() * 1e2
+            state.add_rows([(idx, X[0][idx], dbs)])
+            stats = state.bin_stats
+            for stat, expected in (
+                (stats.nanmean(), np.nanmean(state.db_ring, axis=0)),
+                (stats.nanvar(), np.nanvar(state.db_ring, axis=0)),
+            ):
+                self.assertTrue(
+                    np.allclose(expected, stat, rtol=1e-4, atol=1e-14, equal_nan=True)
+                )
+
+    def test_filter_peaks(self):
+        def loop_filter_peaks(peaks, properties):
+            for i in range(len(peaks) - 1, -1, -1):
+                for j in range(len(peaks)):
+                    if i == j:
+                        continue
+                    if (properties["left_ips"][i] > properties["left_ips"][j]) and (
+                        properties["right_ips"][i] < properties["right_ips"][j]
+                    ):
+                        peaks = np.delete(peaks, i)
+                        for k in properties:
+                            properties[k] = np.delete(properties[k], i)
+                        break
+            return peaks, properties
+
+        config = waterfall_config()
+        plot = WaterfallPlot(None, config, 1)
+        rng = np.random.default_rng(0)
+        for n_peaks in (0, 1, 2, 10, 100, 300):
+            # integer ips so that intervals share ends.
+            left_ips = rng.integers(0, 50, n_peaks).astype(float)
+            properties = {
+                "left_ips": left_ips,
+                "right_ips": left_ips + rng.integers(1, 20, n_peaks),
+                "prominences": rng.random(n_peaks),
+            }
+            peaks = rng.integers(0, 100, n_peaks)
+            expected_peaks, expected_properties = loop_filter_peaks(
+                peaks.copy(), {k: v.copy() for k, v in properties.items()}
+            )
+            peaks, properties = plot.filter_peaks(peaks, properties)
+            self.assertEqual(expected_peaks.tolist(), peaks.tolist())
+            for k, v in expected_properties.items():
+                self.assertEqual(v.tolist(), properties[k].tolist())
+
     def test_run_waterfall(self):
         with tempfile.TemporaryDirectory() as tempdir:
             peak_min = 1.50e6
@@ -0,0 +1,33 @@
+#!/usr/bin/python3
+import unittest
+
+from gamutrf.adaptive_sweep import (
+    AdaptiveSweep,
+    get_segments,
+    parse_tuning_ranges,
+)
+
+
+class AdaptiveSweepTestCase(unittest.TestCase):
+    def test_get_segments(self):
+        self.assertEqual(
+            [(100e6, 200e6), (200e6, 300e6), (1e9, 1.1e9)],
+            get_segments(parse_tuning_ranges("100e6-300e6,1e9-1.1e9"), 3),
+        )
+
+    def test_adaptive_sweep(self):
+        sweep = AdaptiveSweep([(100e6, 500e6)], 4, 10, 60, 10)
+        # nothing seen yet, so sweep everything.
+        self.assertEqual("100000000-500000000", sweep.plan(now=0))
+        buckets = {str(freq): -50 for freq in range(int(100e6), int(500e6), int(1e6))}
+        buckets[str(int(350e6))] = -20
+        sweep.update_record({"ts": 100, "buckets": buckets})
+        # only the active segment.
+        self.assertEqual("300000000-400000000", sweep.plan(now=110))
+        # quiet segments are revisited before max_revisit_secs.
+        self.assertEqual("100000000-500000000", sweep.plan(now=150))
+        sweep.update_record({})
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
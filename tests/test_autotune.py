@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+import os
+import tempfile
+import unittest
+
+from gamutrf.autotune import (
+    apply_autotune,
+    autotune_batch_sizes,
+    autotune_key,
+    read_autotune_cache,
+    select_autotune,
+    write_autotune_cache,
+)
+
+
+class AutotuneTestCase(unittest.TestCase):
+    def test_select_autotune(self):
+        measurements = [
+            {"engine": "software", "fft_batch_size": 16, "fft_rate": 1e3},
+            {"engine": "software", "fft_batch_size": 64, "fft_rate": 4e3},
+            {"engine": "vkfft", "fft_batch_size": 64, "fft_rate": 8e3},
+            {"engine": "vkfft", "fft_batch_size": 256, "fft_rate": 16e3},
+        ]
+        best = select_autotune(measurements, 2e3, 512)
+        self.assertEqual(("vkfft", 64), (best["engine"], best["fft_batch_size"]))
+        best = select_autotune(measurements, 10e3, 512)
+        self.assertEqual(("vkfft", 256), (best["engine"], best["fft_batch_size"]))
+        best = select_autotune(measurements, 10e3, 128)
+        self.assertEqual(("vkfft", 64), (best["engine"], best["fft_batch_size"]))
+
+    def test_apply_autotune(self):
+        scan_args = {
+            "samp_rate": 1.024e6,
+            "nfft": 1024,
+            "freq_start": 100e6,
+            "freq_end": 200e6,
+            "tuneoverlap": 0.5,
+            "sweep_sec": 10,
+            "tune_dwell_ms": 0,
+            "tune_step_fft": 0,
+            "pretune": True,
+            "fft_batch_size": 256,
+            "vkfft": True,
+        }
+        tuned_args = {"fft_batch_size": 16, "vkfft": False}
+        tuned_scan_args = apply_autotune(scan_args, tuned_args)
+        self.assertEqual(
+            (16, False), (tuned_scan_args["fft_batch_size"], tuned_scan_args["vkfft"])
+        )
+        self.assertEqual(48, tuned_scan_args["tune_step_fft"])
+        # user options are not changed, and tune_step_fft follows sweep_sec.
+        self.assertEqual(0, scan_args["tune_step_fft"])
+        scan_args["sweep_sec"] = 30
+        self.assertEqual(144, apply_autotune(scan_args, tuned_args)["tune_step_fft"])
+        scan_args["tune_step_fft"] = 100
+        self.assertEqual(100, apply_autotune(scan_args, tuned_args)["tune_step_fft"])
+        scan_args["tune_step_fft"] = 0
+        scan_args["pretune"] = False
+        self.assertEqual(0, apply_autotune(scan_args, tuned_args)["tune_step_fft"])
+
+    def test_autotune_key(self):
+        scan_args = {
+            "nfft": 1024,
+            "pretune": True,
+            "samp_rate": 1.024e6,
+            "dc_block_len": 0,
+            "dc_block_long": False,
+            "correct_iq": False,
+            "fused_db": False,
+            "fft_average": 1,
+        }
+        key = autotune_key(scan_args, "software", 16)
+        self.assertNotEqual(key, autotune_key(scan_args, "software", 32))
+        for k, v in (
+            ("samp_rate", 2.048e6),
+            ("dc_block_len", 1024),
+            ("dc_block_long", True),
+            ("correct_iq", True),
+            ("fused_db", True),
+            ("fft_average", 4),
+        ):
+            changed_args = dict(scan_args)
+            changed_args[k] = v
+            self.assertNotEqual(key, autotune_key(changed_args, "software", 16))
+
+    def test_autotune_batch_sizes(self):
+        self.assertEqual([16, 32, 64, 128, 256, 512], autotune_batch_sizes(1))
+        self.assertEqual([32, 64, 128, 256, 512], autotune_batch_sizes(32))
+        self.assertEqual([18, 33, 66, 129, 258, 513], autotune_batch_sizes(3))
+
+    def test_autotune_cache(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            cache_path = os.path.join(tempdir, "cache", "autotune.json")
+            self.assertEqual({}, read_autotune_cache(cache_path))
+            write_autotune_cache(cache_path, {"host:software:1024:16:True": 1e3})
+            self.assertEqual(
+                {"host:software:1024:16:True": 1e3}, read_autotune_cache(cache_path)
+            )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
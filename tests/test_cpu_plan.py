@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+import unittest
+
+from gamutrf.cpu_plan import apply_cpu_plan, parse_cpu_plan
+
+
+class FakeBlock:
+    def __init__(self, name):
+        self._name = name
+        self.cpus = None
+        self.priority = None
+
+    def name(self):
+        return self._name
+
+    def set_processor_affinity(self, cpus):
+        self.cpus = cpus
+
+    def set_thread_priority(self, priority):
+        self.priority = priority
+
+
+class CpuPlanTestCase(unittest.TestCase):
+    def test_parse_cpu_plan(self):
+        available_cpus = set(range(8))
+        self.assertEqual({}, parse_cpu_plan("", available_cpus))
+        self.assertEqual(
+            {
+                "source": ([0], None),
+                "fft": ([1, 2, 5], 99),
+                "db": ([3], None),
+                "inference": ([4, 5, 6, 7], None),
+            },
+            parse_cpu_plan("source:0,fft:1-2+5@99,db:3,inference:4-7", available_cpus),
+        )
+        for bad_plan in ("source:8", "fft", "bogus:1", "fft:a-b", "fft:1@x"):
+            self.assertRaises(ValueError, parse_cpu_plan, bad_plan, available_cpus)
+
+    def test_apply_cpu_plan(self):
+        fft = FakeBlock("fft")
+        db = FakeBlock("db")
+        apply_cpu_plan(
+            parse_cpu_plan("fft:1-2@99", set(range(8))), {"fft": [fft], "db": [db]}
+        )
+        self.assertEqual(([1, 2], 99), (fft.cpus, fft.priority))
+        self.assertEqual((None, None), (db.cpus, db.priority))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
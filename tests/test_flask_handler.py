@@ -1,4 +1,6 @@
 #!/usr/bin/python3
+import json
+import time
 import unittest
 
 from gamutrf.flask_handler import FlaskHandler
@@ -16,6 +18,12 @@ class FakeRequest:
         self.args = args
 
 
+def reconf_path(handler):
+    result = handler.reconf()
+    status, code = handler.reconf_status()
+    return result, json.loads(status)["path"], code
+
+
 class FlaskHandlerTestCase(unittest.TestCase):
     def test_flask_handler(self):
         def good_check_options(new_options):
@@ -35,6 +43,78 @@ class FlaskHandlerTestCase(unittest.TestCase):
         self.assertEqual(("reconf", 200), handler.reconf())
         self.assertNotEqual(handler.options, options)
 
+    def test_flask_handler_live(self):
+        def good_check_options(new_options):
+            return ""
+
+        live_changes = []
+
+        def live_reconf(new_options, changed):
+            live_changes.append(changed)
+            return new_options.foo != 666
+
+        options = FakeOptions(apiport=2048, foo=123, bar=None)
+        handler = FlaskHandler(
+            options,
+            good_check_options,
+            [],
+            live_options=["foo"],
+            live_reconf=live_reconf,
+        )
+        handler.request = FakeRequest(args={"foo": "999"})
+        self.assertEqual((("reconf", 200), "live", 200), reconf_path(handler))
+        self.assertEqual(999, handler.options.foo)
+        self.assertEqual(1, handler.live_reconfigures)
+        self.assertEqual(0, handler.reconfigures)
+        # live reconfiguration refused, so rebuild.
+        handler.request = FakeRequest(args={"foo": "666"})
+        self.assertEqual((("reconf", 200), "rebuild", 200), reconf_path(handler))
+        self.assertEqual(1, handler.reconfigures)
+        # not a live option, so rebuild without asking.
+        handler.request = FakeRequest(args={"bar": "1"})
+        self.assertEqual((("reconf", 200), "rebuild", 200), reconf_path(handler))
+        self.assertEqual(2, handler.reconfigures)
+        self.assertEqual([["foo"], ["foo"]], live_changes)
+
+    def test_flask_handler_reconf_status(self):
+        def good_check_options(new_options):
+            return ""
+
+        def live_reconf(new_options, changed):
+            time.sleep(0.1)
+            return True
+
+        def status(handler):
+            result, code = handler.reconf_status()
+            self.assertEqual(200, code)
+            return json.loads(result)
+
+        options = FakeOptions(apiport=2048, foo=123, bar=None)
+        handler = FlaskHandler(
+            options,
+            good_check_options,
+            [],
+            live_options=["foo"],
+            live_reconf=live_reconf,
+        )
+        self.assertEqual({"path": None, "secs": None}, status(handler))
+        handler.request = FakeRequest(args={"foo": "999"})
+        self.assertEqual(("reconf", 200), handler.reconf())
+        result = status(handler)
+        self.assertEqual("live", result["path"])
+        self.assertGreaterEqual(result["secs"], 0.1)
+        # the rebuild is not waited for, and reports its downtime when done.
+        handler.request = FakeRequest(args={"bar": "1"})
+        self.assertEqual(("reconf", 200), handler.reconf())
+        self.assertEqual({"path": "rebuild", "secs": None}, status(handler))
+        handler.rebuilt(handler.reconfigures, 1.5)
+        self.assertEqual({"path": "rebuild", "secs": 1.5}, status(handler))
+        # a rebuild superseded by a later reconfiguration is not reported.
+        handler.request = FakeRequest(args={"bar": "2"})
+        handler.reconf()
+        handler.rebuilt(handler.reconfigures - 1, 2.5)
+        self.assertEqual({"path": "rebuild", "secs": None}, status(handler))
+
 
 if __name__ == "__main__":  # pragma: no cover
     unittest.main()
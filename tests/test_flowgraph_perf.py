@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+import unittest
+
+from prometheus_client import CollectorRegistry
+
+from gamutrf.flowgraph_perf import FlowgraphPerfMonitor
+
+
+class FakeBlock:
+    def __init__(self):
+        self.work_time_total = 0
+
+    def pc_work_time_avg(self):
+        return 500
+
+    def pc_work_time_total(self):
+        return self.work_time_total
+
+    def pc_throughput_avg(self):
+        return 1e3
+
+    def pc_input_buffers_full_avg(self):
+        return [0.25]
+
+    def pc_output_buffers_full_avg(self):
+        return [0.5, 0.75]
+
+
+class FlowgraphPerfTestCase(unittest.TestCase):
+    def test_sample(self):
+        registry = CollectorRegistry()
+        monitor = FlowgraphPerfMonitor(1, registry=registry, ticks_per_sec=1e3)
+        block = FakeBlock()
+        monitor.set_blocks({"pipeline0_fft": block})
+        monitor.sample(now=10)
+        block.work_time_total = 1e3
+        monitor.sample(now=12)
+
+        def get(name, **labels):
+            return registry.get_sample_value(
+                name, dict(block="pipeline0_fft", **labels)
+            )
+
+        self.assertEqual(0.5, get("gr_block_work_time_seconds"))
+        self.assertEqual(0.5, get("gr_block_busy_ratio"))
+        self.assertEqual(1e3, get("gr_block_items_per_sec"))
+        self.assertEqual(0.25, get("gr_block_input_buffer_full_ratio", port="0"))
+        self.assertEqual(0.75, get("gr_block_output_buffer_full_ratio", port="1"))
+        self.assertEqual(2, get("gr_block_work_time_sample_seconds_count"))
+
+        monitor.set_blocks({})
+        self.assertIsNone(get("gr_block_work_time_seconds"))
+        self.assertIsNone(get("gr_block_work_time_sample_seconds_count"))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
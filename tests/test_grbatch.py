@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+import unittest
+from collections import deque
+
+import numpy as np
+
+from gamutrf.grbatch import (
+    batch_block,
+    batch_correctiq,
+    batch_dc_blocker,
+    batch_pwr_squelch,
+)
+
+
+def ref_correctiq(x, ratio):
+    out = []
+    avg = 0j
+    for s in x:
+        avg = ratio * (s - avg) + avg
+        out.append(s - avg)
+    return np.array(out)
+
+
+class RefMovingAverager:
+    def __init__(self, length):
+        self.length = length
+        self.delay_line = deque([0j] * (length - 1))
+        self.out_d1 = 0j
+        self.delayed = 0j
+
+    def filter(self, x):
+        self.delayed = self.delay_line.popleft()
+        self.delay_line.append(x)
+        y = x - self.delayed + self.out_d1
+        self.out_d1 = y
+        return y / self.length
+
+
+def ref_dc_blocker(x, length, long_form):
+    stages = 4 if long_form else 2
+    mas = [RefMovingAverager(length) for _ in range(stages)]
+    delay_line = deque([0j] * (length - 1))
+    out = []
+    for s in x:
+        y = s
+        for ma in mas:
+            y = ma.filter(y)
+        if long_form:
+            delay_line.append(mas[0].delayed)
+            out.append(delay_line.popleft() - y)
+        else:
+            out.append(mas[0].delayed - y)
+    return np.array(out)
+
+
+def ref_pwr_squelch(x, db, alpha):
+    threshold = 10 ** (db / 10)
+    pwr = 0
+    out = []
+    for s in x:
+        pwr = alpha * abs(s) ** 2 + (1 - alpha) * pwr
+        out.append(s if pwr >= threshold else 0)
+    return np.array(out)
+
+
+class BatchTestCase(unittest.TestCase):
+    def process(self, block, x, batches):
+        out = np.zeros_like(x)
+        for x_batch, out_batch in zip(
+            np.array_split(x, batches), np.array_split(out, batches)
+        ):
+            block.process(x_batch, out_batch)
+        return out
+
+    def samples(self, n=4096):
+        return (np.random.randn(n) + 0.5 + 1j * (np.random.randn(n) - 0.25)).astype(
+            np.complex64
+        )
+
+    def test_batch_block_abstract(self):
+        self.assertRaises(TypeError, batch_block, "batch_block", 8)
+
+    def test_correctiq(self):
+        x = self.samples()
+        block = batch_correctiq(1024, ratio=1e-2)
+        out = self.process(block, x, 4)
+        self.assertTrue(np.allclose(ref_correctiq(x, 1e-2), out, atol=1e-4))
+        block.reset()
+        self.assertTrue(np.allclose(out, self.process(block, x, 3), atol=1e-4))
+
+    def test_dc_blocker(self):
+        x = self.samples()
+        for length in (2, 32):
+            for long_form in (False, True):
+                block = batch_dc_blocker(1024, length, long_form)
+                out = self.process(block, x, 4)
+                self.assertTrue(
+                    np.allclose(ref_dc_blocker(x, length, long_form), out, atol=1e-4)
+                )
+        self.assertRaises(ValueError, batch_dc_blocker, 1024, 1, False)
+
+    def test_pwr_squelch(self):
+        x = self.samples()
+        x[2048:] *= 1e-3
+        block = batch_pwr_squelch(1024, 0, 1e-2)
+        out = self.process(block, x, 4)
+        self.assertTrue(np.allclose(ref_pwr_squelch(x, 0, 1e-2), out))
+        self.assertTrue(np.any(out[:2048]))
+        self.assertFalse(np.any(out[-1024:]))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
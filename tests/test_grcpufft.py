@@ -0,0 +1,33 @@
+#!/usr/bin/python3
+import unittest
+
+import numpy as np
+
+from gamutrf.grcpufft import cpufft
+
+
+class CpufftTestCase(unittest.TestCase):
+    def test_cpufft(self):
+        fft_batch_size = 8
+        for nfft in (1024, 1023):
+            fft_window = np.hanning(nfft)
+            x = (
+                np.random.randn(2, fft_batch_size * nfft)
+                + 1j * np.random.randn(2, fft_batch_size * nfft)
+            ).astype(np.complex64)
+            expected = np.fft.fftshift(
+                np.fft.fft(x.reshape(-1, nfft) * fft_window), axes=-1
+            ).reshape(x.shape)
+            results = []
+            for workers in (1, 3):
+                block = cpufft(fft_batch_size, nfft, fft_window, workers)
+                out = np.zeros_like(x)
+                self.assertEqual(2, block.work([x], [out]))
+                self.assertTrue(np.allclose(expected, out, rtol=1e-4, atol=1e-3))
+                results.append(out)
+            # output must not depend on the number of workers.
+            self.assertTrue(np.array_equal(results[0], results[1]))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,32 @@
+#!/usr/bin/python3
+import unittest
+
+import numpy as np
+
+from gamutrf.grdb import db
+
+
+class DbTestCase(unittest.TestCase):
+    def test_db(self):
+        nfft = 1024
+        scale = 1e-3
+        x = (
+            np.random.randn(16, nfft) * 100 + 1j * np.random.randn(16, nfft) * 100
+        ).astype(np.complex64)
+        x[0][0] = 0
+        block = db(nfft, scale, -200, 50)
+        out = np.zeros(x.shape, dtype=np.float32)
+        self.assertEqual(16, block.work([x], [out]))
+        with np.errstate(divide="ignore"):
+            expected = np.clip(10 * np.log10(scale * np.abs(x) ** 2), -200, 50)
+        self.assertTrue(np.allclose(expected, out, atol=1e-3))
+        self.assertEqual(-200, out[0][0])
+        self.assertLessEqual(np.max(out), 50)
+        power_block = db(nfft, scale, -200, 50, power_input=True)
+        power_out = np.zeros(x.shape, dtype=np.float32)
+        power_block.work([(np.abs(x) ** 2).astype(np.float32)], [power_out])
+        self.assertTrue(np.allclose(out, power_out, atol=1e-3))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,29 @@
+#!/usr/bin/python3
+import unittest
+
+import numpy as np
+
+from gamutrf.grfftaverage import fftaverage
+
+
+class FftAverageTestCase(unittest.TestCase):
+    def test_fftaverage(self):
+        nfft = 64
+        fft_average = 4
+        x = (np.random.randn(16, nfft) + 1j * np.random.randn(16, nfft)).astype(
+            np.complex64
+        )
+        power = (np.abs(x) ** 2).reshape(4, fft_average, nfft)
+        for method, expected in (
+            ("mean", power.mean(axis=1)),
+            ("max", power.max(axis=1)),
+        ):
+            block = fftaverage(nfft, fft_average, method)
+            out = np.zeros((4, nfft), dtype=np.float32)
+            self.assertEqual(4, block.work([x], [out]))
+            self.assertTrue(np.allclose(expected, out, rtol=1e-5))
+        self.assertRaises(ValueError, fftaverage, nfft, fft_average, "median")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
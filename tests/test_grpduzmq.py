@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+import json
+import unittest
+
+import pmt
+import zstandard
+
+from gamutrf.grpduzmq import pduzmq
+
+
+class FakePub:
+    def __init__(self):
+        self.items = []
+
+    def send(self, data, flags=0):
+        self.items.append(zstandard.ZstdDecompressor().decompress(data))
+
+    def close(self):
+        return
+
+
+class FakeScanMetrics:
+    def __init__(self):
+        self.records = []
+
+    def fft_record(self, item_bytes, compressed_bytes, record=None, scanner=None):
+        self.records.append(record)
+
+
+def json_pdu(item):
+    data = item.encode("utf8")
+    return pmt.cons(pmt.PMT_NIL, pmt.init_u8vector(len(data), list(data)))
+
+
+class PduZmqTestCase(unittest.TestCase):
+    def test_pduzmq_scanner(self):
+        block = pduzmq("tcp://127.0.0.1:0", scanners=['sdr"0\\'], bind=False)
+        block.stop()
+        block.zmq_pub = FakePub()
+        block.receive_pdu(json_pdu("{}"), 'sdr"0\\')
+        block.receive_pdu(json_pdu('{"config": {}, "buckets": {}}'), 'sdr"0\\')
+        block.receive_pdu(json_pdu("{}"))
+        records = [json.loads(item) for item in block.zmq_pub.items]
+        self.assertEqual(
+            [
+                {"scanner": 'sdr"0\\'},
+                {"scanner": 'sdr"0\\', "config": {}, "buckets": {}},
+                {},
+            ],
+            records,
+        )
+        self.assertEqual("scanner", next(iter(records[1])))
+
+    def test_pduzmq_record(self):
+        callback_records = []
+        scan_metrics = FakeScanMetrics()
+        block = pduzmq(
+            "tcp://127.0.0.1:0",
+            record_callback=lambda record, scanner: callback_records.append(record),
+            scan_config={"fft_average": 4},
+            scan_metrics=scan_metrics,
+            bind=False,
+        )
+        block.stop()
+        block.zmq_pub = FakePub()
+        block.receive_pdu(json_pdu('{"ts": 1, "config": {"nfft": 1024}}'))
+        block.receive_pdu(json_pdu("not json"))
+        record = {"ts": 1, "config": {"nfft": 1024, "fft_average": 4}}
+        self.assertEqual(record, json.loads(block.zmq_pub.items[0]))
+        # the record is parsed once, for the callback and metrics.
+        self.assertEqual([record], callback_records)
+        self.assertIs(callback_records[0], scan_metrics.records[0])
+        self.assertIsNone(scan_metrics.records[1])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
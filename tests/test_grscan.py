@@ -13,7 +13,7 @@ from gnuradio.fft import window  # pytype: disable=import-error
 from gnuradio import uhd
 
 from gamutrf.grsource import get_source
-from gamutrf.grscan import grscan
+from gamutrf.grscan import get_radio_specs, grscan
 
 
 class FakeWaveLearner:
@@ -180,6 +180,126 @@ class GrscanTestCase(unittest.TestCase):
                 for write_samples in (0, 1):
                     self.run_grscan_smoke(pretune, wavelearner, write_samples, False)
 
+    def test_get_radio_specs(self):
+        self.assertEqual(
+            [("ettus", "", 100e6, 1e9)], get_radio_specs("ettus", "", 100e6, 1e9, "")
+        )
+        self.assertEqual(
+            [("ettus", "a", 100e6, 550e6), ("SoapyAIRT", "b", 550e6, 1e9)],
+            get_radio_specs("ettus,SoapyAIRT", "a;b", 100e6, 1e9, ""),
+        )
+        self.assertEqual(
+            [("ettus", "a", 1e9, 2e9), ("ettus", "a", 3e9, 4e9)],
+            get_radio_specs("ettus,ettus", "a", 100e6, 1e9, "1e9-2e9,3e9-4e9"),
+        )
+        self.assertRaises(
+            ValueError, get_radio_specs, "ettus,ettus", "a;b;c", 100e6, 1e9, ""
+        )
+        self.assertRaises(
+            ValueError, get_radio_specs, "ettus,ettus", "", 100e6, 1e9, "1e9-2e9"
+        )
+
+    def test_grscan_multi_sdr_smoke(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            tb = grscan(
+                freq_start=1e9,
+                freq_end=2e9,
+                sdr="tuneable_test_source,tuneable_test_source",
+                samp_rate=int(1.024e6),
+                tune_step_fft=512,
+                write_samples=1,
+                sample_dir=tempdir,
+                iqtlabs=iqtlabs,
+                rotate_secs=900,
+                db_clamp_floor=-1e6,
+                pretune=True,
+                fft_batch_size=4,
+                iq_zmq_port=0,
+            )
+            self.assertEqual(2, len(tb.radios))
+            self.assertEqual(1.5e9, tb.radios[1].retune_args["freq_start"])
+            tb.start()
+            time.sleep(3)
+            tb.stop()
+            tb.wait()
+            del tb
+            for scanner in ("sdr0", "sdr1"):
+                self.assertTrue(
+                    [x for x in glob.glob(f"{tempdir}/{scanner}/*/*zst")], scanner
+                )
+
+    def test_grscan_live_reconf(self):
+        for pretune in (True, False):
+            with tempfile.TemporaryDirectory() as tempdir:
+                scan_args = {
+                    "freq_start": 1e9,
+                    "freq_end": 2e9,
+                    "sdr": "tuneable_test_source",
+                    "samp_rate": int(1.024e6),
+                    "tune_step_fft": 512,
+                    "sample_dir": tempdir,
+                    "iqtlabs": iqtlabs,
+                    "rotate_secs": 900,
+                    "db_clamp_floor": -1e6,
+                    "pretune": pretune,
+                    "fft_batch_size": 4,
+                    "nfft": 1024,
+                    "igain": 0,
+                    "sweep_sec": 30,
+                    "tune_dwell_ms": 0,
+                    "tuneoverlap": 0.5,
+                    "tuning_ranges": "",
+                    "description": "",
+                }
+                tb = grscan(**scan_args)
+                tb.start()
+                time.sleep(1)
+                old_retune_fft = tb.retune_fft
+                scan_args.update({"freq_start": 1.5e9, "tune_step_fft": 1024})
+                self.assertTrue(
+                    tb.live_reconf(["freq_start", "tune_step_fft"], **scan_args)
+                )
+                self.assertNotEqual(old_retune_fft, tb.retune_fft)
+                self.assertEqual(1024, tb.tune_step_fft)
+                time.sleep(1)
+                # stare mode requires a rebuild.
+                scan_args.update({"freq_end": 0})
+                self.assertFalse(tb.live_reconf(["freq_end"], **scan_args))
+                tb.stop()
+                tb.wait()
+                del tb
+
+    def test_grscan_standby(self):
+        scan_args = {
+            "freq_start": 1e9,
+            "freq_end": 2e9,
+            "sdr": "tuneable_test_source",
+            "samp_rate": int(1.024e6),
+            "tune_step_fft": 512,
+            "iqtlabs": iqtlabs,
+            "db_clamp_floor": -1e6,
+            "pretune": True,
+            "fft_batch_size": 4,
+            "iq_zmq_port": 10002,
+        }
+        tb = grscan(**scan_args)
+        tb.start()
+        time.sleep(1)
+        # build a new flowgraph while the old one still has the ports.
+        new_tb = grscan(standby=True, **scan_args)
+        self.assertFalse(new_tb.attached)
+        self.assertEqual([], new_tb.radios[0].sources)
+        tb.stop()
+        tb.wait()
+        del tb
+        new_tb.attach()
+        self.assertTrue(new_tb.sources)
+        new_tb.start()
+        time.sleep(1)
+        new_tb.stop()
+        new_tb.wait()
+        del new_tb
+
 
 if __name__ == "__main__":  # pragma: no cover
     logging.basicConfig(level=logging.DEBUG, format="%(asctime)s %(message)s")
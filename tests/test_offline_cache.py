@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+import json
+import os
+import tempfile
+import unittest
+
+from gamutrf.offline_cache import (
+    OfflineCache,
+    cache_key,
+    move_outputs,
+    options_key,
+    recording_key,
+    run_dir,
+)
+
+
+class OfflineCacheTestCase(unittest.TestCase):
+    def test_recording_key(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            recording = os.path.join(tempdir, "test.raw")
+            with open(recording, "wb") as f:
+                f.write(b"\x00" * 1024)
+            raw_key = recording_key(recording)
+            self.assertTrue(raw_key.startswith("sha256:"))
+            with open(recording, "wb") as f:
+                f.write(b"\x01" * 1024)
+            self.assertNotEqual(raw_key, recording_key(recording))
+
+            meta = os.path.join(tempdir, "test.sigmf-meta")
+            data = os.path.join(tempdir, "test.sigmf-data")
+            with open(data, "wb") as f:
+                f.write(b"\x00" * 1024)
+            with open(meta, "w", encoding="utf8") as f:
+                json.dump({"global": {}}, f)
+            self.assertTrue(recording_key(meta).startswith("sha256:"))
+            with open(meta, "w", encoding="utf8") as f:
+                json.dump({"global": {"core:sha512": "abc"}}, f)
+            self.assertTrue(recording_key(meta).startswith("sigmf:1024:"))
+            self.assertTrue(recording_key(meta).endswith(":abc"))
+
+    def test_options_key(self):
+        self.assertEqual(
+            options_key({"a": 1, "b": "x", "lib": object()}),
+            options_key({"b": "x", "a": 1}),
+        )
+        self.assertNotEqual(options_key({"a": 1}), options_key({"a": 2}))
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            recording = os.path.join(tempdir, "test.raw")
+            with open(recording, "wb") as f:
+                f.write(b"\x00" * 1024)
+            key = cache_key(recording, {"nfft": 1024})
+            cache = OfflineCache(tempdir)
+            self.assertIsNone(cache.lookup(key))
+            output_dir = run_dir(tempdir, recording, key)
+            self.assertEqual(os.path.join(tempdir, ".test.raw." + key[:12]), output_dir)
+            os.makedirs(output_dir)
+            self.assertFalse(
+                cache.record(key, recording, move_outputs(output_dir, tempdir))
+            )
+            self.assertIsNone(OfflineCache(tempdir).lookup(key))
+            os.makedirs(os.path.join(output_dir, "out"))
+            with open(os.path.join(output_dir, "out", "image.png"), "wb") as f:
+                f.write(b"png")
+            with open(os.path.join(tempdir, "other.png"), "wb") as f:
+                f.write(b"png")
+            output = os.path.join(tempdir, "out", "image.png")
+            outputs = move_outputs(output_dir, tempdir)
+            self.assertEqual([os.path.realpath(output)], outputs)
+            self.assertFalse(os.path.exists(output_dir))
+            self.assertTrue(cache.record(key, recording, outputs))
+            cache = OfflineCache(tempdir)
+            self.assertEqual(outputs, cache.lookup(key)["outputs"])
+            self.assertIsNone(cache.lookup(cache_key(recording, {"nfft": 2048})))
+            os.remove(output)
+            self.assertIsNone(cache.lookup(key))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -44,6 +44,10 @@ class ReadRecordingTestCase(unittest.TestCase):
             data_filename, _samples, parsed_meta = get_samples(meta)
             self.assertEqual(data, data_filename)
             self.assertEqual(1690987701.988, parsed_meta["timestamp"])
+            data_filename, samples, meta_only = get_samples(meta, read_samples=False)
+            self.assertEqual(data, data_filename)
+            self.assertIsNone(samples)
+            self.assertEqual(parsed_meta, meta_only)
 
     def test_read_recording(self):
         with tempfile.TemporaryDirectory() as tempdir:
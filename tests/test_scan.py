@@ -52,6 +52,17 @@ def test_bad_freq_start(monkeypatch):
     assert pytest_wrapped_e.value.code == 1
 
 
+def test_bad_dc_block_len(monkeypatch):
+    monkeypatch.setattr(
+        "sys.argv",
+        ["scan.py", "--dc_block_len=1"],
+    )
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        main()
+    assert pytest_wrapped_e.type == SystemExit
+    assert pytest_wrapped_e.value.code == 1
+
+
 def test_scan_main(monkeypatch):
     monkeypatch.setattr(
         "sys.argv",
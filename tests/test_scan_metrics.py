@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+import unittest
+
+from prometheus_client import CollectorRegistry
+
+from gamutrf.scan_metrics import ScanMetrics
+
+
+class ScanMetricsTestCase(unittest.TestCase):
+    def test_scan_metrics(self):
+        registry = CollectorRegistry()
+        metrics = ScanMetrics(registry=registry)
+        metrics.set_sweep_sec(10)
+
+        def get(name, **labels):
+            return registry.get_sample_value(name, labels)
+
+        for sweep_start, tune_count in ((100, 0), (100, 10), (112, 20), (124, 44)):
+            metrics.fft_record(
+                1000,
+                250,
+                {"sweep_start": sweep_start, "total_tune_count": tune_count},
+                "sdr0",
+            )
+        metrics.fft_record(1000, 500)
+        self.assertEqual(4, get("gamutrf_fft_messages_total", scanner="sdr0"))
+        self.assertEqual(4e3, get("gamutrf_fft_bytes_total", scanner="sdr0"))
+        self.assertEqual(4, get("gamutrf_fft_compression_ratio", scanner="sdr0"))
+        self.assertEqual(2, get("gamutrf_fft_compression_ratio", scanner=""))
+        self.assertEqual(2, get("gamutrf_sweeps_total", scanner="sdr0"))
+        self.assertEqual(12, get("gamutrf_sweep_seconds", scanner="sdr0"))
+        self.assertEqual(1.2, get("gamutrf_sweep_time_ratio", scanner="sdr0"))
+        self.assertEqual(2, get("gamutrf_tune_rate_hz", scanner="sdr0"))
+        self.assertIsNone(get("gamutrf_sweeps_total", scanner=""))
+
+        metrics.sample(now=10)
+        for _ in range(6):
+            metrics.inference_item()
+        metrics.sample(now=12)
+        self.assertEqual(6, get("gamutrf_inference_items_total"))
+        self.assertEqual(3, get("gamutrf_inference_items_per_sec"))
+
+        metrics.reconfigured(0.5)
+        metrics.reconfigured(0.05, live=True)
+        self.assertEqual(
+            0.5, get("gamutrf_reconfigure_downtime_seconds_sum", live="false")
+        )
+        self.assertEqual(
+            1, get("gamutrf_reconfigure_downtime_seconds_count", live="true")
+        )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,28 @@
+#!/usr/bin/python3
+import unittest
+
+from gamutrf.startup_profile import NULL_STARTUP_PROFILE, StartupProfile
+
+
+class StartupProfileTestCase(unittest.TestCase):
+    def test_startup_profile(self):
+        profile = StartupProfile()
+        profile.add("imports", 0.25)
+        with profile.stage("build flowgraph"):
+            pass
+        self.assertEqual(
+            ["imports", "build flowgraph"], [name for name, _ in profile.stages]
+        )
+        report = profile.report()
+        self.assertIn("imports            0.250s", report)
+        self.assertIn("total", report)
+
+        with NULL_STARTUP_PROFILE.stage("build flowgraph"):
+            pass
+        NULL_STARTUP_PROFILE.add("imports", 1)
+        self.assertEqual([], NULL_STARTUP_PROFILE.stages)
+        self.assertEqual("", NULL_STARTUP_PROFILE.report())
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()